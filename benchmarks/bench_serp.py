@@ -0,0 +1,62 @@
+"""
+Benchmark de los parsers de SERP de Google sobre fixtures locales
+
+Uso:
+    python benchmarks/bench_serp.py [--repeat 50]
+
+No realiza ninguna petición de red: parsea una vez cada fixture y mide el
+tiempo de extracción de productos sobre el árbol ya construido.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdp_checker.shopping import GoogleShoppingAnalyzer
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# (nombre, fixture, método del analizador)
+CASES = [
+    ('shopping', 'google_shopping.html', '_parse_shopping_results'),
+    ('shopping_generic', 'google_shopping_generic.html', '_parse_shopping_results'),
+    ('organic', 'google_organic.html', '_parse_organic_results'),
+]
+
+
+def run_case(analyzer, fixture, method, repeat, num_results=100):
+    """Devuelve (ms por iteración, productos extraídos)"""
+    with open(os.path.join(FIXTURES_DIR, fixture), encoding='utf-8') as f:
+        soup = BeautifulSoup(f.read(), 'html.parser')
+    
+    parse = getattr(analyzer, method)
+    products = parse(soup, num_results)
+    
+    start = time.perf_counter()
+    for _ in range(repeat):
+        parse(soup, num_results)
+    elapsed = time.perf_counter() - start
+    
+    return elapsed / repeat * 1000, len(products)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de parsers de SERP")
+    parser.add_argument('--repeat', type=int, default=50, help="Iteraciones por caso")
+    args = parser.parse_args()
+    
+    analyzer = GoogleShoppingAnalyzer()
+    
+    print(f"{'caso':<20}{'ms/página':>12}{'productos':>12}")
+    for name, fixture, method in CASES:
+        ms, count = run_case(analyzer, fixture, method, args.repeat)
+        print(f"{name:<20}{ms:>12.2f}{count:>12}")
+
+
+if __name__ == '__main__':
+    main()
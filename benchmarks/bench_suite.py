@@ -0,0 +1,229 @@
+"""
+Suite de benchmarks offline: extracción de fichas, análisis y parsers de SERP
+
+Uso:
+    python benchmarks/bench_suite.py --out resultados.json
+    python benchmarks/bench_suite.py --baseline benchmarks/baseline.json --tolerance 0.25
+    python benchmarks/bench_suite.py --only extract --repeat 50
+
+Mide la mediana de tiempo (y de ahí el throughput) y el pico de memoria de cada
+caso con las páginas de `benchmarks/fixtures/` (sin red). Con `--baseline` compara
+contra un JSON guardado y termina con código 1 si algún caso es más lento o usa
+más memoria de la tolerada; `--save-baseline` reescribe ese fichero.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_serp import CASES as SERP_CASES
+from pdp_checker.analyzer import ProductBenchmarkAnalyzer
+from pdp_checker.fingerprint import page_fingerprint
+from pdp_checker.shopping import GoogleShoppingAnalyzer
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# (nombre, fixture) de las fichas de producto; ver make_fixtures.py
+PDP_CASES = [
+    ('large', 'pdp_marketplace_large.html'),
+    ('medium', 'pdp_auction_medium.html'),
+    ('small', 'pdp_crossborder_small.html'),
+]
+
+# Fichas del corpus de los análisis de texto (variantes de las tres fixtures)
+CORPUS_SIZE = 30
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), 'rb') as f:
+        return f.read()
+
+
+def measure(run, repeat, setup=None, items=1, size=None):
+    """
+    Mediana de `repeat` ejecuciones de `run()` y pico de memoria de una más
+    
+    `setup()` se llama antes de cada ejecución, fuera del cronómetro. `items` y
+    `size` (bytes) por ejecución dan el throughput en elementos/s y MB/s.
+    """
+    if setup:
+        setup()
+    run()
+    
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    
+    if setup:
+        setup()
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    
+    median = statistics.median(times)
+    result = {
+        'ms': round(median * 1000, 3),
+        'min_ms': round(min(times) * 1000, 3),
+        'items_per_s': round(items / median, 1),
+        'peak_kb': round(peak / 1024, 1)
+    }
+    if size:
+        result['mb_per_s'] = round(size / median / 1e6, 2)
+    return result
+
+
+def build_cases():
+    """Lista de (nombre, kwargs de `measure`) de todos los casos"""
+    analyzer = ProductBenchmarkAnalyzer()
+    cases = []
+    
+    pages = {}
+    for name, fixture in PDP_CASES:
+        html = read_fixture(fixture)
+        url = f"https://tienda.example/p/{name}"
+        pages[name] = analyzer.extract_from_html(url, html)
+        cases.append((f"extract.{name}", {
+            'run': lambda url=url, html=html: analyzer.extract_from_html(url, html),
+            'size': len(html)
+        }))
+        text = html.decode('utf-8')
+        cases.append((f"fingerprint.{name}", {
+            'run': lambda text=text: page_fingerprint(text),
+            'size': len(html)
+        }))
+    
+    # Corpus con contenido distinto por ficha, para que el memo por contenido no las junte
+    base = list(pages.values())
+    corpus = []
+    for i in range(CORPUS_SIZE):
+        data = dict(base[i % len(base)])
+        data['url'] = f"https://tienda{i % 7}.example/p/{i}"
+        data['title'] = f"{data['title']} v{i}"
+        data['features'] = data.get('features', [])[i % 3:]
+        corpus.append(data)
+    
+    def cold():
+        with ProductBenchmarkAnalyzer._partials_lock:
+            ProductBenchmarkAnalyzer._partials.clear()
+    
+    cases.append(('analyze_terms', {
+        'run': lambda: analyzer.analyze_terms(corpus),
+        'setup': cold,
+        'items': len(corpus)
+    }))
+    cases.append(('analyze_terms.warm', {
+        'run': lambda: analyzer.analyze_terms(corpus),
+        'items': len(corpus)
+    }))
+    cases.append(('analyze_gaps', {
+        'run': lambda: analyzer.analyze_gaps(corpus[0], corpus[1:]),
+        'setup': cold,
+        'items': len(corpus) - 1
+    }))
+    
+    shopping = GoogleShoppingAnalyzer()
+    for name, fixture, method in SERP_CASES:
+        html = read_fixture(fixture)
+        soup = BeautifulSoup(html, 'html.parser')
+        parse = getattr(shopping, method)
+        cases.append((f"serp.{name}", {
+            'run': lambda parse=parse, soup=soup: parse(soup, 100),
+            'items': len(parse(soup, 100))
+        }))
+        cases.append((f"serp.{name}.parse", {
+            'run': lambda html=html: BeautifulSoup(html, 'html.parser'),
+            'size': len(html)
+        }))
+    
+    return cases
+
+
+def compare(results, baseline, tolerance, memory_tolerance):
+    """Filas (caso, métrica, base, actual, cambio) que superan la tolerancia"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        for metric, limit in (('ms', tolerance), ('peak_kb', memory_tolerance)):
+            if previous.get(metric) and current[metric] > previous[metric] * (1 + limit):
+                change = current[metric] / previous[metric] - 1
+                regressions.append((name, metric, previous[metric], current[metric], change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks offline de extracción, análisis y SERP")
+    parser.add_argument('--repeat', type=int, default=10, help="Iteraciones por caso")
+    parser.add_argument('--only', help="Solo los casos cuyo nombre contenga este texto")
+    parser.add_argument('--out', help="Guardar los resultados en este JSON")
+    parser.add_argument('--baseline', help="JSON de referencia contra el que comparar")
+    parser.add_argument('--save-baseline', action='store_true', help="Sobrescribir --baseline con estos resultados")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Empeoramiento de tiempo tolerado (fracción)")
+    parser.add_argument('--memory-tolerance', type=float, default=0.10, help="Aumento de memoria tolerado (fracción)")
+    args = parser.parse_args()
+    
+    results = {}
+    print(f"{'caso':<28}{'ms':>10}{'elem/s':>12}{'MB/s':>8}{'pico KB':>10}")
+    for name, kwargs in build_cases():
+        if args.only and args.only not in name:
+            continue
+        result = measure(repeat=args.repeat, **kwargs)
+        results[name] = result
+        print(f"{name:<28}{result['ms']:>10.2f}{result['items_per_s']:>12.1f}"
+              f"{result.get('mb_per_s', ''):>8}{result['peak_kb']:>10.1f}")
+    
+    report = {
+        'meta': {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeat': args.repeat
+        },
+        'results': results
+    }
+    
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    
+    if not args.baseline:
+        return 0
+    
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Baseline guardada en {args.baseline}")
+        return 0
+    
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)['results']
+    
+    regressions = compare(results, baseline, args.tolerance, args.memory_tolerance)
+    if not regressions:
+        print(f"Sin regresiones frente a {args.baseline}")
+        return 0
+    
+    print(f"\nRegresiones frente a {args.baseline}:")
+    for name, metric, previous, current, change in regressions:
+        print(f"  {name:<28}{metric:<8}{previous:>10.2f} -> {current:>10.2f} ({change:+.0%})")
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,170 @@
+"""
+Generador de carga para el camino real de descarga y extracción, contra la tienda local
+
+Uso:
+    python benchmarks/load_test.py --urls 2000 --workers 16 --per-domain 4 --domains 4 \\
+        --rate-403 0.02 --rate-429 0.03 --rate-captcha 0.01 --rate-slow 0.01 --out carga.json
+    python benchmarks/load_test.py --urls 500 --zenrow      # todo a través de la API emulada
+
+Arranca `mock_shop` en un hilo (o usa `--target` con una tienda ya en marcha) y
+pasa las URLs por `ProductBenchmarkAnalyzer.extract_content_from_url` con un pool
+de hilos y un límite por dominio, como el planificador: un reintento con
+User-Agent rotado si la primera extracción falla. Las URLs se reparten entre
+`--domains` hosts 127.0.0.x para ejercitar el límite por dominio. Informa de
+throughput, resultados por tipo de error y latencias p50/p95/p99.
+
+La extracción es CPU (ver bench_suite.py: más de un segundo por ficha grande),
+así que con `--fixtures small` la prueba se centra en el camino de red.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pdp_checker.analyzer as analyzer_module
+from mock_shop import add_config_arguments, config_from_args, start_server
+from pdp_checker.analyzer import ExtractionCache, ProductBenchmarkAnalyzer
+from pdp_checker.events import EventSink
+from pdp_checker.throttle import DomainLimiter
+from pdp_checker.trace import Tracer, percentile
+
+
+class CountingEventSink(EventSink):
+    """Cuenta los avisos del motor por tipo en lugar de mostrarlos"""
+    
+    def __init__(self):
+        self.counts = Counter()
+    
+    def warning(self, message):
+        if 'Acceso denegado' in message:
+            self.counts['403'] += 1
+        elif 'Error HTTP' in message:
+            self.counts['http_' + message.split('Error HTTP ')[1].split()[0]] += 1
+        elif 'conexión' in message:
+            self.counts['connection'] += 1
+        else:
+            self.counts['other'] += 1
+    
+    def info(self, message):
+        pass
+
+
+def fetch(analyzer, limiter, url, retry, use_zenrow):
+    """(url, ms, datos o None, intentos) por el mismo camino que el planificador"""
+    domain = urlparse(url).netloc
+    start = time.perf_counter()
+    attempts = 1
+    with limiter.slot(domain):
+        data = analyzer.extract_content_from_url(url, use_zenrow=use_zenrow)
+    if not data and retry:
+        attempts += 1
+        with limiter.slot(domain):
+            data = analyzer.extract_content_from_url(url, rotate_headers=True, use_zenrow=use_zenrow)
+    return url, (time.perf_counter() - start) * 1000, data, attempts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga local del camino de descarga")
+    parser.add_argument('--urls', type=int, default=1000, help="URLs a procesar")
+    parser.add_argument('--unique', type=int, help="Productos distintos (por defecto, tantos como URLs)")
+    parser.add_argument('--workers', type=int, default=16, help="Hilos en total")
+    parser.add_argument('--per-domain', type=int, default=4, help="Peticiones simultáneas por dominio")
+    parser.add_argument('--delay', type=float, default=0.0, help="Segundos entre peticiones al mismo dominio")
+    parser.add_argument('--domains', type=int, default=4, help="Hosts 127.0.0.x entre los que repartir las URLs")
+    parser.add_argument('--no-retry', action='store_true', help="No reintentar URLs fallidas")
+    parser.add_argument('--cache', action='store_true', help="Usar la caché compartida de extracciones")
+    parser.add_argument('--zenrow', action='store_true', help="Pasar todo por la API de ZenRows emulada")
+    parser.add_argument('--trace', action='store_true', help="Incluir p50/p95 por etapa en el informe")
+    parser.add_argument('--target', help="Tienda ya en marcha (p. ej. http://127.0.0.1:8765); si no, se arranca una")
+    parser.add_argument('--out', help="Guardar el informe en este JSON")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    
+    server = None
+    if args.target:
+        base = urlparse(args.target)
+        port = base.port
+    else:
+        server = start_server(config_from_args(args), host='0.0.0.0' if args.domains > 1 else '127.0.0.1')
+        port = server.server_address[1]
+    
+    hosts = [f"127.0.0.{i + 1}" for i in range(max(1, args.domains))]
+    unique = args.unique or args.urls
+    # Cada producto vive siempre en el mismo host, para que las repeticiones coincidan en la caché
+    urls = [f"http://{hosts[i % unique % len(hosts)]}:{port}/p/{i % unique}" for i in range(args.urls)]
+    
+    analyzer_module.ZENROW_ENDPOINT = f"http://127.0.0.1:{port}/v1/"
+    events = CountingEventSink()
+    tracer = Tracer() if args.trace else None
+    analyzer = ProductBenchmarkAnalyzer(
+        use_zenrow=args.zenrow,
+        zenrow_api_key='local-test' if args.zenrow else None,
+        events=events,
+        cache=ExtractionCache(max_entries=max(1000, unique)) if args.cache else None,
+        tracer=tracer
+    )
+    limiter = DomainLimiter(args.per_domain, rate=1.0 / args.delay if args.delay else None)
+    
+    latencies = []
+    outcomes = Counter()
+    retried = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = [executor.submit(fetch, analyzer, limiter, url, not args.no_retry, args.zenrow) for url in urls]
+        for done, future in enumerate(as_completed(futures), 1):
+            url, ms, data, attempts = future.result()
+            latencies.append(ms)
+            retried += attempts > 1
+            if not data:
+                outcomes['failed'] += 1
+            elif '#' not in data.get('title', '') and not data.get('price'):
+                # Página de captcha extraída como si fuera una ficha
+                outcomes['captcha_as_product'] += 1
+            else:
+                outcomes['ok'] += 1
+            if done % max(1, args.urls // 10) == 0:
+                print(f"  {done}/{args.urls}...", file=sys.stderr)
+    elapsed = time.perf_counter() - start
+    
+    latencies.sort()
+    report = {
+        'urls': args.urls,
+        'workers': args.workers,
+        'per_domain': args.per_domain,
+        'domains': len(hosts),
+        'elapsed_s': round(elapsed, 2),
+        'urls_per_s': round(args.urls / elapsed, 1),
+        'outcomes': dict(outcomes),
+        'retried': retried,
+        'engine_warnings': dict(events.counts),
+        'cache_hits': analyzer.cache_hits,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50), 1),
+            'p95': round(percentile(latencies, 95), 1),
+            'p99': round(percentile(latencies, 99), 1),
+            'max': round(latencies[-1], 1) if latencies else 0.0
+        }
+    }
+    if server is not None:
+        with server.RequestHandlerClass.config.lock:
+            report['server'] = dict(server.RequestHandlerClass.config.stats)
+        server.shutdown()
+    if tracer is not None:
+        report['stages'] = tracer.summary()
+    
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
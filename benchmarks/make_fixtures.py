@@ -0,0 +1,197 @@
+"""
+Genera las fichas de producto de `benchmarks/fixtures/` (anonimizadas y deterministas)
+
+Uso:
+    python benchmarks/make_fixtures.py
+
+Reproduce la estructura de tres tipos de tienda con tamaños distintos:
+- pdp_marketplace_large.html: estilo Amazon (navegación enorme, carruseles,
+  reseñas, scripts en línea), ~300 KB.
+- pdp_auction_medium.html: estilo eBay (especificaciones en listas de definición,
+  descripción larga), ~120 KB.
+- pdp_crossborder_small.html: estilo AliExpress (poco HTML y un JSON de estado
+  grande en un <script>), ~30 KB.
+Marcas, tiendas, dominios y textos son inventados.
+"""
+
+import json
+import os
+import random
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+BRANDS = ['Marca A', 'Marca B', 'Marca C', 'Marca D']
+PRODUCTS = [
+    'Auriculares inalámbricos con cancelación de ruido',
+    'Altavoz bluetooth resistente al agua',
+    'Cargador USB-C rápido 65W',
+    'Ratón ergonómico inalámbrico',
+    'Teclado mecánico compacto',
+]
+WORDS = (
+    'batería autonomía sonido graves conexión bluetooth micrófono llamadas carga rápida '
+    'diseño ligero plegable almohadillas cómodo estuche viaje latencia baja aplicación '
+    'ecualizador resistente agua sudor deporte potencia puertos compatible portátil '
+    'teléfono tableta aluminio acabado mate silencioso precisión sensor ajustable'
+).split()
+SPEC_KEYS = [
+    'Peso', 'Dimensiones', 'Color', 'Autonomía', 'Tiempo de carga', 'Conectividad',
+    'Versión Bluetooth', 'Alcance', 'Impedancia', 'Respuesta en frecuencia', 'Micrófono',
+    'Resistencia al agua', 'Material', 'Garantía', 'Modelo', 'Potencia', 'Puertos',
+    'Compatibilidad', 'Sensor', 'Batería'
+]
+CATEGORIES = ['Electrónica', 'Audio', 'Auriculares', 'Inalámbricos']
+
+
+def sentence(rng, words=12):
+    text = ' '.join(rng.choice(WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + '.'
+
+
+def paragraph(rng, sentences=5):
+    return ' '.join(sentence(rng, rng.randint(8, 16)) for _ in range(sentences))
+
+
+def specs(rng, count):
+    return [(key, f"{rng.randint(1, 999)} {rng.choice(['g', 'mm', 'h', 'm', 'W', 'Ω'])}") for key in SPEC_KEYS[:count]]
+
+
+def nav(rng, links):
+    items = ''.join(
+        f'<li><a href="/c/{i}">{rng.choice(WORDS).capitalize()} {rng.choice(WORDS)}</a></li>'
+        for i in range(links)
+    )
+    return f'<nav class="nav-menu"><ul>{items}</ul></nav>'
+
+
+def carousel(rng, title, cards):
+    items = ''.join(
+        f'<li class="carousel-card"><a href="/p/{rng.randint(1000, 9999)}">'
+        f'<img class="carousel-img" src="https://img.example/r/{rng.randint(1, 10 ** 6)}.jpg" alt="">'
+        f'<span class="card-title">{rng.choice(BRANDS)} {rng.choice(PRODUCTS)}</span>'
+        f'<span class="card-price">{rng.randint(9, 300)},{rng.randint(0, 99):02d} €</span></a></li>'
+        for _ in range(cards)
+    )
+    return f'<div class="carousel"><h2>{title}</h2><ol>{items}</ol></div>'
+
+
+def reviews(rng, count):
+    return ''.join(
+        f'<div class="review" data-hook="review"><span class="review-rating">{rng.randint(1, 5)} de 5</span>'
+        f'<p class="review-text">{paragraph(rng, rng.randint(1, 4))}</p></div>'
+        for _ in range(count)
+    )
+
+
+def breadcrumb():
+    links = ''.join(f'<li><a href="/c/{i}">{name}</a></li>' for i, name in enumerate(['Inicio'] + CATEGORIES))
+    return f'<div class="breadcrumb"><ul>{links}</ul></div>'
+
+
+def filters(rng, count):
+    links = ''.join(f'<li><a href="?f={i}">{rng.choice(WORDS).capitalize()} {rng.choice(WORDS)}</a></li>' for i in range(count))
+    return f'<div class="filter-panel"><ul>{links}</ul></div>'
+
+
+def marketplace_large(rng):
+    """Estilo Amazon: mucho HTML alrededor de la ficha"""
+    title = f"{BRANDS[0]} {PRODUCTS[0]} - Modelo X1, 30 h de batería"
+    bullets = ''.join(f'<li><span class="a-list-item">{sentence(rng, 18)}</span></li>' for _ in range(8))
+    table = ''.join(f'<tr><th class="prodDetSectionEntry">{k}</th><td>{v}</td></tr>' for k, v in specs(rng, 18))
+    gallery = ''.join(f'<li><img class="product-image" src="https://img.example/p/{i}.jpg" alt=""></li>' for i in range(9))
+    scripts = ''.join(
+        f'<script>window.__state_{i} = {json.dumps({"k": [sentence(rng, 10) for _ in range(30)]}, ensure_ascii=False)};</script>'
+        for i in range(30)
+    )
+    return f"""<!DOCTYPE html><html lang="es"><head><meta charset="utf-8">
+<title>{title} : Electrónica</title>
+<meta name="description" content="{paragraph(rng, 2)}">
+{scripts}</head><body>
+<header class="nav-header">{nav(rng, 900)}</header>
+{breadcrumb()}
+<div id="dp-container">
+<div class="image-gallery"><ul>{gallery}</ul></div>
+<div id="centerCol">
+<h1 id="title" class="product-title-word-break"><span id="productTitle">{title}</span></h1>
+<div class="a-section price-block"><span class="a-price"><span class="a-offscreen">89,99 €</span></span></div>
+<div id="feature-bullets" class="a-section feature-bullets"><ul class="a-unordered-list">{bullets}</ul></div>
+</div></div>
+<div id="productDescription" class="product-description"><p>{paragraph(rng, 12)}</p></div>
+<table class="prodDetTable tech-specs">{table}</table>
+{carousel(rng, 'Productos relacionados', 120)}
+{carousel(rng, 'Los clientes también compraron', 120)}
+<div id="reviews">{reviews(rng, 250)}</div>
+<footer class="nav-footer">{nav(rng, 600)}</footer>
+</body></html>"""
+
+
+def auction_medium(rng):
+    """Estilo eBay: especificaciones en <dl> y descripción larga del vendedor"""
+    title = f"{BRANDS[1]} {PRODUCTS[1]} - Nuevo, envío 24h"
+    dl = ''.join(f'<dt>{k}</dt><dd>{v}</dd>' for k, v in specs(rng, 14))
+    features = ''.join(f'<li>{sentence(rng, 14)}</li>' for _ in range(6))
+    images = ''.join(f'<img src="https://img.example/e/{i}.jpg" alt="">' for i in range(6))
+    description = ''.join(f'<p>{paragraph(rng, 6)}</p>' for _ in range(110))
+    return f"""<!DOCTYPE html><html lang="es"><head><meta charset="utf-8">
+<title>{title} | Subastas</title>
+<meta name="description" content="{paragraph(rng, 2)}">
+</head><body>
+<header>{nav(rng, 300)}</header>
+<nav aria-label="breadcrumb" class="seo-breadcrumb">{breadcrumb()}</nav>
+<div class="x-item-title"><h1 class="x-item-title__mainTitle">{title}</h1></div>
+<div class="x-price-primary"><span class="ux-textspans">EUR 54,50</span></div>
+<div class="ux-image-carousel image-gallery">{images}</div>
+<div class="highlights-panel"><ul>{features}</ul></div>
+<div class="ux-layout-section-evo"><dl class="spec-list">{dl}</dl></div>
+<div class="item-description product-description">{description}</div>
+{filters(rng, 40)}
+{carousel(rng, 'Artículos similares', 80)}
+<footer>{nav(rng, 200)}</footer>
+</body></html>"""
+
+
+def crossborder_small(rng):
+    """Estilo AliExpress: HTML mínimo y el estado de la página en JSON"""
+    title = f"{BRANDS[2]} {PRODUCTS[2]} GaN 3 puertos"
+    state = {
+        'productInfo': {'subject': title, 'images': [f"https://img.example/a/{i}.jpg" for i in range(8)]},
+        'skuModule': {'skus': [{'id': i, 'price': rng.randint(900, 4000) / 100, 'props': [rng.choice(WORDS) for _ in range(6)]} for i in range(100)]},
+        'specsModule': {'props': [{'attrName': k, 'attrValue': v} for k, v in specs(rng, 12)]},
+        'feedback': [sentence(rng, 20) for _ in range(60)],
+    }
+    props = ''.join(f'<li class="specification--prop"><span class="title">{k}</span><span class="value">{v}</span></li>' for k, v in specs(rng, 12))
+    table = ''.join(f'<tr><td>{k}</td><td>{v}</td></tr>' for k, v in specs(rng, 8))
+    features = ''.join(f'<div class="product-feature">{sentence(rng, 12)}</div>' for _ in range(5))
+    return f"""<!DOCTYPE html><html lang="es"><head><meta charset="utf-8">
+<title>{title} - Envío desde el extranjero</title>
+<script>window.runParams = {{"data": {json.dumps(state, ensure_ascii=False)}}};</script>
+</head><body>
+<div class="breadcrumb">{breadcrumb()}</div>
+<h1 data-pl="product-title" data-testid="product-title">{title}</h1>
+<div class="product-price"><span class="price--current">19,99€</span></div>
+<div class="image-view"><img class="magnifier--image product-img" src="https://img.example/a/0.jpg" alt=""></div>
+{features}
+<ul class="specification--list">{props}</ul>
+<table class="specification-table">{table}</table>
+<div class="description--product-description">{paragraph(rng, 8)}</div>
+</body></html>"""
+
+
+FIXTURES = {
+    'pdp_marketplace_large.html': marketplace_large,
+    'pdp_auction_medium.html': auction_medium,
+    'pdp_crossborder_small.html': crossborder_small,
+}
+
+
+def main():
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    for name, build in FIXTURES.items():
+        html = build(random.Random(name))
+        with open(os.path.join(FIXTURES_DIR, name), 'w', encoding='utf-8') as f:
+            f.write(html)
+        print(f"{name:<32}{len(html.encode('utf-8')) // 1024:>6} KB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,268 @@
+"""
+Tienda de pruebas local: sirve las fichas de `benchmarks/fixtures/` con fallos inyectados
+
+Uso:
+    python benchmarks/mock_shop.py --port 8765 --latency-ms 50 --rate-403 0.02 --rate-429 0.02
+
+Rutas:
+    /p/<id>          ficha de producto (una de las fixtures PDP de `--fixtures` según el id)
+    /c/<id>?page=N   listado de la categoría <id>: tarjetas con precio, un destacado
+                     con parámetros de seguimiento y paginación (`--category-pages`)
+    /v1/?url=...     emulación de la API de ZenRows (requiere `apikey`); sirve la
+                     ficha de la URL pedida sin bloqueos, con algo más de latencia
+    /stats           contadores de peticiones y fallos inyectados (JSON)
+
+Cada petición a /p/ puede recibir, según las tasas configuradas: un 403, un 429
+con Retry-After, una página de captcha, una redirección 302, una página enorme o
+un cuerpo enviado poco a poco. Todo es local: no hay ninguna petición saliente.
+"""
+
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+PDP_FIXTURES = {
+    'large': 'pdp_marketplace_large.html',
+    'medium': 'pdp_auction_medium.html',
+    'small': 'pdp_crossborder_small.html',
+}
+
+CAPTCHA_PAGE = (
+    b'<!DOCTYPE html><html><head><title>Verificaci\xc3\xb3n</title></head><body>'
+    b'<div id="recaptcha" class="g-recaptcha"></div><p>Completa el captcha para continuar</p>'
+    b'</body></html>'
+)
+
+# Fallos inyectables, en el orden en que se sortean
+FAULTS = ('403', '429', 'captcha', 'redirect', 'huge', 'slow')
+
+
+class ShopConfig:
+    """Latencias y tasas (0..1) de cada fallo"""
+    
+    def __init__(self, latency_ms=0, jitter_ms=0, rates=None, huge_mb=5, drip_ms=20,
+                 zenrow_latency_ms=300, seed=0, fixtures=None, category_pages=5, per_page=24):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rates = {fault: 0.0 for fault in FAULTS}
+        self.rates.update(rates or {})
+        self.huge_mb = huge_mb
+        self.drip_ms = drip_ms
+        self.zenrow_latency_ms = zenrow_latency_ms
+        self.category_pages = category_pages
+        self.per_page = per_page
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = Counter()
+        self.pages = []
+        for name in fixtures or PDP_FIXTURES:
+            with open(os.path.join(FIXTURES_DIR, PDP_FIXTURES[name]), 'rb') as f:
+                self.pages.append(f.read())
+    
+    def draw(self):
+        """Fallo de esta petición (o None) y latencia añadida en segundos"""
+        with self.lock:
+            roll = self.random.random()
+            jitter = self.random.uniform(0, self.jitter_ms)
+        delay = (self.latency_ms + jitter) / 1000
+        threshold = 0.0
+        for fault in FAULTS:
+            threshold += self.rates[fault]
+            if roll < threshold:
+                return fault, delay
+        return None, delay
+    
+    def page(self, product_id):
+        """HTML de la ficha `product_id`, con el id en el título para que cada URL sea distinta"""
+        html = self.pages[product_id % len(self.pages)]
+        return html.replace(b'</title>', f' #{product_id}</title>'.encode('utf-8'), 1)
+    
+    def listing(self, category_id, page):
+        """HTML de una página de listado; los ids de producto no se repiten entre categorías"""
+        first_id = category_id * 10000 + (page - 1) * self.per_page
+        cards = ''.join(
+            f'<li class="product-card"><a href="/p/{product_id}"><img src="/img/{product_id}.jpg"></a>'
+            f'<a href="/p/{product_id}">Producto {product_id}</a><span class="price">{10 + product_id % 90},99 €</span></li>'
+            for product_id in range(first_id, first_id + self.per_page)
+        )
+        pagination = f'<a rel="next" href="/c/{category_id}?page={page + 1}">Siguiente</a>' if page < self.category_pages else ''
+        return (
+            f'<!DOCTYPE html><html><head><title>Categoría {category_id} - página {page}</title></head><body>'
+            f'<header><a href="/cart">Carrito</a><a href="/login">Mi cuenta</a></header>'
+            f'<div class="featured"><a href="/p/{category_id * 10000}?utm_source=destacado">Más vendido</a></div>'
+            f'<ul class="product-grid">{cards}</ul><nav class="pagination">{pagination}</nav>'
+            f'</body></html>'
+        ).encode('utf-8')
+    
+    def count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+
+class ShopHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    config = None
+    
+    def log_message(self, format, *args):
+        pass
+    
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        if parsed.path == '/stats':
+            with self.config.lock:
+                body = json.dumps(dict(self.config.stats)).encode('utf-8')
+            return self._send(200, body, 'application/json')
+        if parsed.path.startswith('/v1'):
+            return self._zenrow(parse_qs(parsed.query))
+        if parsed.path.startswith('/p/'):
+            return self._product(parsed)
+        if parsed.path.startswith('/c/'):
+            return self._category(parsed)
+        self.config.count('404')
+        return self._send(404, b'Not found')
+    
+    def _product(self, parsed):
+        try:
+            product_id = int(parsed.path.rstrip('/').rsplit('/', 1)[-1])
+        except ValueError:
+            self.config.count('404')
+            return self._send(404, b'Not found')
+        
+        self.config.count('requests')
+        fault, delay = self.config.draw()
+        time.sleep(delay)
+        
+        # Las redirecciones llevan `r=1` y no se vuelven a redirigir
+        if fault == 'redirect' and 'r=1' in parsed.query:
+            fault = None
+        if fault:
+            self.config.count(fault)
+        
+        if fault == '403':
+            return self._send(403, b'<html><body>Access denied</body></html>')
+        if fault == '429':
+            return self._send(429, b'Too many requests', headers={'Retry-After': '1'})
+        if fault == 'captcha':
+            return self._send(200, CAPTCHA_PAGE)
+        if fault == 'redirect':
+            return self._send(302, b'', headers={'Location': f"/p/{product_id}?r=1"})
+        
+        html = self.config.page(product_id)
+        if fault == 'huge':
+            padding = b'<div class="filler">' + b'x' * 1024 + b'</div>'
+            html = html.replace(b'</body>', padding * (self.config.huge_mb * 1024) + b'</body>', 1)
+        if fault == 'slow':
+            return self._drip(html)
+        self.config.count('ok')
+        return self._send(200, html)
+    
+    def _category(self, parsed):
+        try:
+            category_id = int(parsed.path.rstrip('/').rsplit('/', 1)[-1])
+            page = int((parse_qs(parsed.query).get('page') or ['1'])[0])
+        except ValueError:
+            page = 0
+        if not 1 <= page <= self.config.category_pages:
+            self.config.count('404')
+            return self._send(404, b'Not found')
+        self.config.count('listings')
+        time.sleep(self.config.draw()[1])
+        return self._send(200, self.config.listing(category_id, page))
+    
+    def _zenrow(self, query):
+        self.config.count('zenrow')
+        if not query.get('apikey'):
+            return self._send(401, b'{"error": "missing apikey"}', 'application/json')
+        target = urlparse((query.get('url') or [''])[0])
+        try:
+            product_id = int(target.path.rstrip('/').rsplit('/', 1)[-1])
+        except ValueError:
+            return self._send(422, b'{"error": "invalid url"}', 'application/json')
+        time.sleep(self.config.zenrow_latency_ms / 1000)
+        return self._send(200, self.config.page(product_id))
+    
+    def _drip(self, html, chunk=4096):
+        """Cuerpo enviado en trozos con una pausa entre cada uno"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(html)))
+        self.end_headers()
+        for start in range(0, len(html), chunk):
+            self.wfile.write(html[start:start + chunk])
+            self.wfile.flush()
+            time.sleep(self.config.drip_ms / 1000)
+    
+    def _send(self, status, body, content_type='text/html; charset=utf-8', headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_server(config, host='127.0.0.1', port=0):
+    """Arranca el servidor en un hilo; devuelve el servidor (ver `server.server_address`)"""
+    handler = type('ConfiguredShopHandler', (ShopHandler,), {'config': config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def add_config_arguments(parser):
+    """Opciones de la tienda, compartidas con el generador de carga"""
+    parser.add_argument('--latency-ms', type=float, default=20, help="Latencia base por petición")
+    parser.add_argument('--jitter-ms', type=float, default=30, help="Latencia aleatoria añadida (0..jitter)")
+    for fault in FAULTS:
+        parser.add_argument(f"--rate-{fault}", type=float, default=0.0, help=f"Fracción de respuestas '{fault}'")
+    parser.add_argument('--huge-mb', type=int, default=5, help="Tamaño añadido a las páginas enormes")
+    parser.add_argument('--drip-ms', type=float, default=20, help="Pausa entre trozos de 4 KB en los cuerpos lentos")
+    parser.add_argument('--seed', type=int, default=0, help="Semilla del sorteo de fallos")
+    parser.add_argument('--category-pages', type=int, default=5, help="Páginas de cada listado /c/<id>")
+    parser.add_argument('--per-page', type=int, default=24, help="Productos por página de listado")
+    parser.add_argument('--fixtures', default=','.join(PDP_FIXTURES),
+                        help="Fichas a servir, separadas por comas (large, medium, small)")
+
+
+def config_from_args(args):
+    return ShopConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        rates={fault: getattr(args, f"rate_{fault}") for fault in FAULTS},
+        huge_mb=args.huge_mb,
+        drip_ms=args.drip_ms,
+        seed=args.seed,
+        category_pages=args.category_pages,
+        per_page=args.per_page,
+        fixtures=[name.strip() for name in args.fixtures.split(',') if name.strip()]
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tienda de pruebas local con fallos inyectados")
+    parser.add_argument('--host', default='127.0.0.1', help="Interfaz (0.0.0.0 para todas las 127.0.0.x)")
+    parser.add_argument('--port', type=int, default=8765, help="Puerto")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    
+    server = start_server(config_from_args(args), args.host, args.port)
+    print(f"Tienda de pruebas en http://{args.host}:{server.server_address[1]}/p/1 (Ctrl+C para salir)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,5 @@
+"""Motor de extracción y análisis competitivo de productos"""
+
+from pdp_checker.analyzer import ExtractionCache, ProductBenchmarkAnalyzer, fetch_html_via_zenrow
+from pdp_checker.events import EventSink, LoggingEventSink
+from pdp_checker.shopping import GoogleShoppingAnalyzer, QueryResultCache
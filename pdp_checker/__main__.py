@@ -0,0 +1,5 @@
+import sys
+
+from pdp_checker.cli import main
+
+sys.exit(main())
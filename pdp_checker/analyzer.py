@@ -0,0 +1,1023 @@
+"""Extracción de contenido de páginas de producto y análisis competitivo"""
+
+from collections import Counter, OrderedDict
+import json
+import os
+import random
+import re
+import threading
+import time
+from datetime import datetime
+from urllib.parse import quote_plus, urlparse
+
+import nltk
+import requests
+from bs4 import BeautifulSoup
+
+from pdp_checker.canonical import canonical_url
+from pdp_checker.events import LoggingEventSink
+from pdp_checker.fingerprint import DEFAULT_THRESHOLD, content_hash, is_unchanged, page_signature
+from pdp_checker.metrics import NULL_METRICS
+from pdp_checker.trace import NULL_TRACER, traced
+
+# Endpoint de la API de ZenRows (configurable para pruebas con un servidor local)
+ZENROW_ENDPOINT = os.environ.get('ZENROW_ENDPOINT', 'https://api.zenrows.com/v1/')
+
+
+def fetch_html_via_zenrow(url, api_key, events=None):
+    """Obtiene el HTML de una página utilizando la API de Zenrow."""
+    if not api_key:
+        return None
+    events = events or LoggingEventSink()
+
+    zenrow_url = (
+        f"{ZENROW_ENDPOINT}?url={quote_plus(url)}&apikey={api_key}"
+        "&render=true&autoparse=false"
+    )
+    try:
+        response = requests.get(zenrow_url, timeout=30)
+        response.raise_for_status()
+        return response.text
+    except requests.exceptions.HTTPError:
+        events.warning(
+            f"Zenrow status {response.status_code} for {url[:50]}..."
+        )
+    except requests.RequestException as e:
+        events.warning(f"Error usando Zenrow: {e}")
+    return None
+
+
+# Campos de `product_data` y el extractor de cada uno, en orden
+EXTRACTORS = {
+    'title': '_extract_title',
+    'description': '_extract_description',
+    'features': '_extract_features',
+    'specifications': '_extract_specifications',
+    'price': '_extract_price',
+    'filters': '_extract_filters',
+    'categories': '_extract_categories',
+    'images': '_extract_images',
+}
+
+# Campos que necesita cada análisis
+ANALYSIS_FIELDS = {
+    'terms': ('title', 'description', 'features', 'specifications'),
+    'filters': ('filters', 'categories'),
+    'features': ('features', 'specifications'),
+    'gaps': ('features', 'specifications', 'filters', 'price'),
+    'pricing': ('price',),
+}
+
+# Campos que se extraen siempre (resumen y comparación)
+BASE_FIELDS = ('title', 'price', 'images')
+
+
+def release_soup(soup):
+    """
+    Libera el árbol de `soup` sin esperar al recolector de ciclos
+    
+    Cada nodo apunta a su padre y el padre a sus hijos: sin romper esos ciclos,
+    el árbol de una ficha grande (varios MB) sigue ocupando memoria hasta la
+    siguiente pasada de `gc`, y con muchas URLs en paralelo eso se acumula. El
+    objeto raíz sigue en un ciclo consigo mismo, pero ya vacío.
+    """
+    for child in list(soup.contents):
+        child.decompose()
+
+
+def extraction_plan(analyses):
+    """Campos a extraer para una lista de análisis activos (ver `ANALYSIS_FIELDS`)"""
+    fields = set(BASE_FIELDS)
+    for analysis in analyses:
+        fields.update(ANALYSIS_FIELDS[analysis])
+    return frozenset(fields)
+
+
+def missing_fields(product_data, fields):
+    """Campos de `fields` que no se extrajeron en `product_data`"""
+    return set(fields or ()) & set(product_data.get('not_extracted', ()))
+
+
+class ExtractionCache:
+    """Caché en memoria de `product_data` por URL, compartida entre sesiones
+    
+    Solo guarda extracciones correctas, nunca HTML. Las entradas caducan tras
+    `ttl` segundos y, al superar `max_entries`, se expulsa la menos usada (LRU).
+    Si dos hilos piden a la vez la misma URL, solo el primero la descarga y el
+    otro espera su resultado.
+    """
+    
+    def __init__(self, ttl=900, max_entries=1000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+    
+    @staticmethod
+    def make_key(url):
+        """Key por URL canónica (ver `canonical.py`)"""
+        return canonical_url(url)
+    
+    def get_or_extract(self, url, extract, fields=None):
+        """
+        Devuelve (product_data, from_cache) para la URL
+        
+        `extract()` solo se llama si no hay entrada válida ni otra extracción en
+        curso de la misma URL. Una entrada a la que le falta alguno de `fields`
+        no cuenta como válida y se sustituye por la nueva extracción. Los
+        resultados se devuelven como copia.
+        """
+        key = self.make_key(url)
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            if (entry is not None and time.time() - entry[0] <= self.ttl
+                    and not missing_fields(entry[1], fields)):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._copy(entry[1], url), True
+            
+            pending = self._in_flight.get(key)
+            owner = pending is None
+            if owner:
+                pending = self._in_flight[key] = {'done': threading.Event(), 'data': None}
+                self.misses += 1
+            else:
+                self.shared += 1
+        
+        if not owner:
+            pending['done'].wait()
+            data = pending['data']
+            if data is None or not missing_fields(data, fields):
+                return self._copy(data, url), data is not None
+            
+            # La extracción en curso no cubre los campos pedidos: extraer aparte
+            data = extract()
+            self._store(key, data)
+            return self._copy(data, url), False
+        
+        data = None
+        try:
+            data = extract()
+        finally:
+            self._store(key, data)
+            with self._lock:
+                del self._in_flight[key]
+            pending['data'] = data or None
+            pending['done'].set()
+        
+        return self._copy(data, url), False
+    
+    def clear(self):
+        """Vacía la caché"""
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def _store(self, key, data):
+        if not data:
+            return
+        with self._lock:
+            self._entries[key] = (time.time(), data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    @staticmethod
+    def _copy(data, url):
+        if not data:
+            return None
+        data = dict(data)
+        data['url'] = url
+        return data
+
+
+class ProductBenchmarkAnalyzer:
+    # Resultados parciales de análisis por contenido de ficha, compartidos entre runs
+    _partials = OrderedDict()
+    _partials_lock = threading.Lock()
+    MAX_PARTIALS = 4096
+    
+    def __init__(self, use_zenrow=False, zenrow_api_key=None, events=None,
+                 fingerprints=None, fingerprint_threshold=DEFAULT_THRESHOLD, cache=None,
+                 fields=None, tracer=None, metrics=None):
+        """Inicializa el analizador con stopwords mejoradas
+        
+        `events` recibe los avisos de extracción (por defecto, `logging`).
+        `fingerprints` (p. ej. un `SnapshotStore`) permite reutilizar la extracción
+        anterior de las páginas cuya huella no ha cambiado.
+        `cache` (un `ExtractionCache`) comparte las extracciones entre sesiones.
+        `fields` limita los campos extraídos (ver `extraction_plan`); por defecto, todos.
+        `tracer` (un `Tracer`) registra la duración de cada etapa; por defecto, ninguno.
+        `metrics` (un `ScrapeMetrics`) acumula peticiones, bloqueos y latencias por dominio.
+        """
+        try:
+            # Stopwords básicas en español e inglés
+            spanish_stopwords = set([
+                'el', 'la', 'de', 'que', 'y', 'a', 'en', 'un', 'es', 'se', 'no', 'te', 'lo', 
+                'le', 'da', 'su', 'por', 'son', 'con', 'para', 'al', 'del', 'las', 'una', 
+                'su', 'me', 'si', 'tu', 'más', 'muy', 'pero', 'como', 'son', 'los', 'este',
+                'esta', 'esto', 'ese', 'esa', 'esos', 'esas', 'tiene', 'ser', 'hacer',
+                'estar', 'todo', 'todos', 'toda', 'todas', 'cuando', 'donde', 'como',
+                'porque', 'aunque', 'desde', 'hasta', 'entre', 'sobre', 'bajo', 'sin'
+            ])
+            
+            english_stopwords = set([
+                'the', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 
+                'by', 'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 
+                'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should', 'may', 
+                'might', 'must', 'can', 'this', 'that', 'these', 'those', 'all', 'any', 
+                'some', 'each', 'every', 'both', 'either', 'neither', 'one', 'two', 'three'
+            ])
+            
+            # Palabras relacionadas con e-commerce que NO queremos analizar
+            ecommerce_stopwords = set([
+                'añadir', 'carrito', 'comprar', 'compra', 'pedido', 'envio', 'envío', 
+                'entrega', 'prevista', 'generado', 'stock', 'disponible', 'agotado',
+                'precio', 'oferta', 'descuento', 'rebaja', 'promocion', 'promoción',
+                'gratis', 'gratuito', 'iva', 'incluido', 'excluido', 'gastos',
+                'valoracion', 'valoración', 'opinion', 'opinión', 'comentario',
+                'puntuacion', 'puntuación', 'estrella', 'estrellas', 'valorar',
+                'recomendar', 'recomiendo', 'cliente', 'clientes', 'usuario', 'usuarios',
+                'cada', 'solo', 'sólo', 'solamente', 'únicamente', 'también', 'además',
+                'producto', 'productos', 'articulo', 'artículo', 'item', 'items',
+                'marca', 'modelo', 'referencia', 'codigo', 'código', 'sku',
+                'categoria', 'categoría', 'seccion', 'sección', 'departamento',
+                'buscar', 'busqueda', 'búsqueda', 'filtrar', 'filtro', 'filtros',
+                'ordenar', 'clasificar', 'mostrar', 'ver', 'todos', 'todas',
+                'inicio', 'home', 'tienda', 'shop', 'store', 'online',
+                'web', 'website', 'pagina', 'página', 'sitio', 'portal',
+                'cookies', 'politica', 'política', 'privacidad', 'terminos', 'términos',
+                'condiciones', 'legal', 'aviso', 'contacto', 'ayuda', 'soporte'
+            ])
+            
+            try:
+                nltk_spanish = set(nltk.corpus.stopwords.words('spanish'))
+                nltk_english = set(nltk.corpus.stopwords.words('english'))
+                self.stop_words = spanish_stopwords | english_stopwords | ecommerce_stopwords | nltk_spanish | nltk_english
+            except:
+                self.stop_words = spanish_stopwords | english_stopwords | ecommerce_stopwords
+                
+        except:
+            # Fallback mínimo
+            self.stop_words = set(['el', 'la', 'de', 'que', 'y', 'a', 'en', 'the', 'and', 'or', 'añadir', 'carrito', 'entrega', 'envio'])
+
+        self.use_zenrow = use_zenrow
+        self.zenrow_api_key = zenrow_api_key or os.environ.get("ZENROW_API_KEY")
+        self.events = events or LoggingEventSink()
+        self.fingerprints = fingerprints
+        self.fingerprint_threshold = fingerprint_threshold
+        self.cache = cache
+        self.cache_hits = 0
+        self.fields = frozenset(fields) if fields else frozenset(EXTRACTORS)
+        self.tracer = tracer or NULL_TRACER
+        self.metrics = metrics or NULL_METRICS
+        
+        self.results = []
+        self.headers_options = [
+            {
+                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
+                'Accept-Language': 'es-ES,es;q=0.9,en;q=0.8',
+                'Accept-Encoding': 'gzip, deflate, br',
+                'DNT': '1',
+                'Connection': 'keep-alive',
+                'Upgrade-Insecure-Requests': '1'
+            },
+            {
+                'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.0 Safari/605.1.15',
+                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+                'Accept-Language': 'es-es',
+                'Accept-Encoding': 'gzip, deflate, br',
+                'Connection': 'keep-alive'
+            },
+            {
+                'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+                'Accept-Language': 'es,en-US;q=0.7,en;q=0.3',
+                'Accept-Encoding': 'gzip, deflate',
+                'Connection': 'keep-alive'
+            }
+        ]
+        
+    def extract_content_from_url(self, url, rotate_headers=False, use_zenrow=False):
+        """Extrae contenido relevante de una URL de producto
+        
+        Con `cache`, una URL extraída hace poco (en esta u otra sesión) no se
+        vuelve a descargar. Se descarga siempre la URL canónica, que es también
+        la `url` del resultado.
+        """
+        url = canonical_url(url)
+        started = time.perf_counter()
+        from_cache = False
+        with self.tracer.span('url.total', url):
+            if self.cache is None:
+                data = self._extract_content_from_url(url, rotate_headers, use_zenrow)
+            else:
+                data, from_cache = self.cache.get_or_extract(
+                    url,
+                    lambda: self._extract_content_from_url(url, rotate_headers, use_zenrow),
+                    fields=self.fields
+                )
+        if from_cache:
+            self.cache_hits += 1
+        
+        if not data:
+            result = 'failed'
+        elif from_cache:
+            result = 'cached'
+        else:
+            result = 'ok' if data.get('changed', True) else 'unchanged'
+        self.metrics.record_extraction(url, result, time.perf_counter() - started)
+        return data
+    
+    def _extract_content_from_url(self, url, rotate_headers=False, use_zenrow=False):
+        """Descarga y extrae una URL de producto (sin caché)"""
+        try:
+            if use_zenrow is None:
+                use_zenrow = self.use_zenrow
+
+            # Seleccionar headers
+            if rotate_headers:
+                headers = random.choice(self.headers_options)
+            else:
+                headers = self.headers_options[0]
+
+            # Usar session para mantener cookies
+            session = requests.Session()
+            session.headers.update(headers)
+
+            if use_zenrow and self.zenrow_api_key:
+                zenrow_url = f"{ZENROW_ENDPOINT}?url={quote_plus(url)}&apikey={self.zenrow_api_key}"
+                response = self._get(session, url, zenrow_url)
+            else:
+                response = self._get(session, url)
+
+                # Si obtenemos 403, intentamos estrategias adicionales
+                if response.status_code == 403:
+                    # Estrategia 1: Headers mínimos
+                    minimal_headers = {
+                        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/121.0'
+                    }
+                    session.headers.clear()
+                    session.headers.update(minimal_headers)
+                    time.sleep(3)
+                    self.metrics.record_escalation(url, 'minimal_headers')
+                    response = self._get(session, url)
+
+                    # Estrategia 2: Si sigue fallando, probar con otro user-agent
+                    if response.status_code == 403:
+                        session.headers.update({
+                            'User-Agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.0 Mobile/15E148 Safari/604.1'
+                        })
+                        time.sleep(5)
+                        self.metrics.record_escalation(url, 'mobile_user_agent')
+                        response = self._get(session, url)
+
+            response.raise_for_status()
+
+            # Si la página no ha cambiado desde el último snapshot, reutilizar su extracción
+            with self.tracer.span('fingerprint', url):
+                fingerprint, numbers = page_signature(response.text)
+                previous = self._previous_extraction(url, fingerprint, numbers)
+            if previous is not None:
+                return previous
+            
+            return self.extract_from_html(url, response.content, fingerprint, numbers)
+            
+        except requests.exceptions.HTTPError as e:
+            if e.response.status_code == 403:
+                domain = urlparse(url).netloc
+                self.events.warning(f"🚫 Acceso denegado a {domain}")
+                self._suggest_alternatives(domain)
+            else:
+                self.events.warning(f"⚠️ Error HTTP {e.response.status_code} con {url[:50]}...")
+            return None
+        except requests.exceptions.RequestException as e:
+            self.events.warning(f"⚠️ Error de conexión con {url[:50]}...: {str(e)}")
+            return None
+        except Exception as e:
+            self.events.warning(f"⚠️ Error procesando {url[:50]}...: {str(e)}")
+            return None   
+    
+    def fetch_page(self, url, rotate_headers=False, use_zenrow=False):
+        """HTML de una página que no es ficha (listados, categorías), o None si falla
+        
+        Sin caché ni huella ni reintentos con otras cabeceras; registra traza y métricas.
+        """
+        session = requests.Session()
+        session.headers.update(random.choice(self.headers_options) if rotate_headers else self.headers_options[0])
+        try:
+            if use_zenrow and self.zenrow_api_key:
+                response = self._get(session, url, f"{ZENROW_ENDPOINT}?url={quote_plus(url)}&apikey={self.zenrow_api_key}")
+            else:
+                response = self._get(session, url)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            self.events.warning(f"⚠️ No se pudo descargar el listado {url[:50]}...: {str(e)}")
+            return None
+        return response.text
+    
+    def extract_from_html(self, url, html, fingerprint=None, numbers_hash=None):
+        """Extrae el `product_data` de una página ya descargada (sin red)
+        
+        `fingerprint` y `numbers_hash` (ver `page_signature`) se guardan con la
+        ficha para detectar en el siguiente crawl si la página ha cambiado.
+        """
+        with self.tracer.span('parse', url) as span:
+            span.bytes = len(html)
+            soup = BeautifulSoup(html, 'html.parser')
+        
+        # Extraer información del producto
+        product_data = {
+            'url': url,
+            'domain': urlparse(url).netloc
+        }
+        
+        # Solo los extractores que necesitan los análisis activos
+        for field, extractor in EXTRACTORS.items():
+            if field in self.fields:
+                with self.tracer.span(f"extract.{field}", url):
+                    product_data[field] = getattr(self, extractor)(soup)
+        
+        product_data.update({
+            'extracted_at': datetime.now().isoformat(),
+            'fingerprint': fingerprint,
+            'numbers_hash': numbers_hash,
+            'changed': True,
+            'not_extracted': [field for field in EXTRACTORS if field not in self.fields]
+        })
+        
+        # Los extractores devuelven texto, no nodos: el árbol ya no hace falta
+        self.tracer.watch(soup, url)
+        release_soup(soup)
+        return product_data
+    
+    def _get(self, session, url, target=None):
+        """GET de `target` (por defecto, la propia URL) registrando la traza y las métricas de `url`"""
+        started = time.perf_counter()
+        try:
+            response = session.get(target or url, timeout=20, allow_redirects=True)
+        except requests.exceptions.RequestException:
+            self.metrics.record_response(url, None, time.perf_counter() - started, zenrow=target is not None)
+            raise
+        self.tracer.record_response('fetch', url, response, started)
+        self.metrics.record_response(url, response, time.perf_counter() - started, zenrow=target is not None)
+        return response
+    
+    def covers(self, product_data):
+        """True si `product_data` tiene todos los campos que extrae este analizador"""
+        return not missing_fields(product_data, self.fields)
+    
+    def _previous_extraction(self, url, fingerprint, numbers_hash):
+        """
+        Devuelve la extracción anterior de la URL si su huella es casi idéntica
+        y sus números (precios incluidos) son exactamente los mismos
+        
+        La huella guardada es la de la última extracción real, de modo que muchos
+        cambios pequeños seguidos no se acumulan sin volver a extraer.
+        """
+        if self.fingerprints is None:
+            return None
+        
+        previous = self.fingerprints.latest_fingerprint(url)
+        if not previous:
+            return None
+        
+        previous_fingerprint, previous_data = previous
+        if not is_unchanged(fingerprint, previous_fingerprint, self.fingerprint_threshold):
+            return None
+        if numbers_hash is None or previous_data.get('numbers_hash') != numbers_hash:
+            # Cambio de precio u otro número, o snapshot anterior sin hash de números
+            return None
+        if not self.covers(previous_data):
+            # Se extrajo con otro plan: falta algún campo que ahora hace falta
+            return None
+    
+        data = dict(previous_data)
+        data.update({
+            'url': url,
+            'extracted_at': datetime.now().isoformat(),
+            'fingerprint': previous_fingerprint,
+            'changed': False
+        })
+        return data
+    
+    def _suggest_alternatives(self, domain):
+        """Sugiere alternativas para sitios bloqueados"""
+        alternatives = {
+            'mediamarkt': "💡 **Alternativa para MediaMarkt:** Busca el mismo producto en Amazon o eBay",
+            'pccomponentes': "💡 **Alternativa para PCComponentes:** Prueba con Amazon o tiendas especializadas",
+            'elcorteingles': "💡 **Alternativa para El Corte Inglés:** Busca en Amazon o tiendas del fabricante"
+        }
+        
+        for site, message in alternatives.items():
+            if site in domain.lower():
+                self.events.info(message)
+                break
+    
+    def _extract_title(self, soup):
+        """Extrae el título del producto"""
+        selectors = [
+            'h1[class*="title"]',
+            'h1[class*="product"]',
+            '[data-testid*="title"]',
+            '[class*="product-title"]',
+            '[class*="product-name"]',
+            '[id*="title"]',
+            'h1',
+            'title'
+        ]
+        
+        for selector in selectors:
+            elements = soup.select(selector)
+            for element in elements:
+                text = element.get_text().strip()
+                if text and len(text) > 5 and len(text) < 300:
+                    return text
+        return ""
+    
+    def _extract_description(self, soup):
+        """Extrae la descripción del producto enfocándose en contenido relevante"""
+        description = ""
+        
+        # Selectores específicos para descripciones de producto
+        description_selectors = [
+            '[class*="product-description"]',
+            '[class*="description"]',
+            '[class*="summary"]',
+            '[class*="overview"]',
+            '[class*="details"]',
+            '[data-testid*="description"]',
+            '[class*="product-info"]',
+            '[class*="caracteristicas"]',
+            'meta[name="description"]'
+        ]
+        
+        # Elementos a excluir
+        excluded_classes = [
+            'nav', 'menu', 'header', 'footer', 'sidebar', 'cart', 'carrito',
+            'checkout', 'payment', 'shipping', 'delivery', 'price', 'precio',
+            'review', 'opinion', 'rating', 'valoracion', 'breadcrumb'
+        ]
+        
+        for selector in description_selectors:
+            if 'meta' in selector:
+                element = soup.select_one(selector)
+                if element:
+                    desc = element.get('content', '')
+                    if desc and len(desc) > 30:
+                        description += desc + " "
+            else:
+                elements = soup.select(selector)
+                for element in elements:
+                    # Verificar que no sea un elemento excluido
+                    element_class = element.get('class', [])
+                    element_id = element.get('id', '')
+                    
+                    is_excluded = any(
+                        excluded in str(element_class).lower() or 
+                        excluded in element_id.lower() 
+                        for excluded in excluded_classes
+                    )
+                    
+                    if not is_excluded:
+                        text = element.get_text().strip()
+                        if text and len(text) > 30 and len(text) < 3000:
+                            if not self._is_ecommerce_text(text):
+                                description += text + " "
+        
+        return description.strip()
+    
+    def _is_ecommerce_text(self, text):
+        """Detecta si un texto es relacionado con e-commerce y no con producto"""
+        text_lower = text.lower()
+        
+        # Patrones que indican texto de e-commerce
+        ecommerce_patterns = [
+            'añadir al carrito', 'comprar ahora', 'envío gratis',
+            'opiniones de', 'valoraciones de', 'política de',
+            'mi cuenta', 'iniciar sesión', 'comparar producto',
+            'stock disponible', 'descuento del', 'gastos de envío'
+        ]
+        
+        pattern_count = sum(1 for pattern in ecommerce_patterns if pattern in text_lower)
+        
+        # Si más del 30% del texto son palabras de e-commerce, lo descartamos
+        words = text_lower.split()
+        ecommerce_word_count = sum(1 for word in words if word in self.stop_words)
+        ecommerce_ratio = ecommerce_word_count / len(words) if words else 0
+        
+        return pattern_count > 2 or ecommerce_ratio > 0.3
+    
+    def _extract_features(self, soup):
+        """Extrae características y features del producto"""
+        features = []
+        
+        # Buscar listas de características
+        feature_selectors = [
+            '[class*="feature"] li',
+            '[class*="benefit"] li',
+            '[class*="highlight"] li',
+            '[class*="spec"] li',
+            'ul[class*="feature"] li',
+            '.features li',
+            '.benefits li',
+            'div[class*="feature"]'
+        ]
+        
+        for selector in feature_selectors:
+            elements = soup.select(selector)
+            for element in elements:
+                text = element.get_text().strip()
+                if (text and 
+                    len(text) > 10 and 
+                    len(text) < 500 and 
+                    not re.match(r'^\d+$', text) and
+                    not text.lower().startswith(('http', 'www', 'mailto'))):
+                    features.append(text)
+        
+        # Eliminar duplicados manteniendo orden
+        seen = set()
+        unique_features = []
+        for feature in features:
+            if feature.lower() not in seen:
+                seen.add(feature.lower())
+                unique_features.append(feature)
+        
+        return unique_features[:50]
+    
+    def _extract_specifications(self, soup):
+        """Extrae especificaciones técnicas"""
+        specs = {}
+        
+        # Buscar tablas de especificaciones
+        spec_selectors = [
+            'table[class*="spec"]',
+            'table[class*="detail"]',
+            'table[class*="tech"]',
+            'dl[class*="spec"]',
+            'table'
+        ]
+        
+        for selector in spec_selectors:
+            elements = soup.select(selector)
+            for element in elements:
+                if element.name == 'table':
+                    rows = element.find_all('tr')
+                    for row in rows:
+                        cells = row.find_all(['td', 'th'])
+                        if len(cells) >= 2:
+                            key = cells[0].get_text().strip()
+                            value = cells[1].get_text().strip()
+                            if key and value and len(key) < 100 and len(value) < 200:
+                                specs[key] = value
+                elif element.name == 'dl':
+                    dts = element.find_all('dt')
+                    dds = element.find_all('dd')
+                    for dt, dd in zip(dts, dds):
+                        key = dt.get_text().strip()
+                        value = dd.get_text().strip()
+                        if key and value:
+                            specs[key] = value
+        
+        return specs
+    
+    def _extract_price(self, soup):
+        """Extrae información de precio"""
+        price_selectors = [
+            '[class*="price"]',
+            '[class*="cost"]',
+            '[class*="amount"]',
+            '[data-testid*="price"]',
+            '[id*="price"]',
+            'span[itemprop="price"]',
+            'meta[itemprop="price"]'
+        ]
+        
+        for selector in price_selectors:
+            elements = soup.select(selector)
+            for element in elements:
+                if element.name == 'meta':
+                    price = element.get('content', '')
+                    if price:
+                        return price
+                else:
+                    text = element.get_text().strip()
+                    # Buscar patrones de precio
+                    price_patterns = [
+                        r'[€$£¥]\s*[\d,]+\.?\d*',
+                        r'[\d,]+\.?\d*\s*[€$£¥]',
+                        r'[\d,]+\.?\d*\s*EUR?'
+                    ]
+                    
+                    for pattern in price_patterns:
+                        price_match = re.search(pattern, text, re.IGNORECASE)
+                        if price_match:
+                            return price_match.group().strip()
+        
+        return ""
+    
+    def _extract_filters(self, soup):
+        """Extrae filtros disponibles en la página"""
+        filters = []
+        
+        filter_selectors = [
+            '[class*="filter"] a',
+            '[class*="facet"] a',
+            'select option',
+            '[type="checkbox"] + label',
+            '[class*="refinement"]'
+        ]
+        
+        for selector in filter_selectors:
+            elements = soup.select(selector)
+            for element in elements:
+                text = element.get_text().strip()
+                if (text and 
+                    len(text) > 2 and 
+                    len(text) < 80 and
+                    not text.lower().startswith(('http', 'www')) and
+                    not re.match(r'^\d+$', text)):
+                    filters.append(text)
+        
+        return list(set(filters))[:100]
+    
+    def _extract_categories(self, soup):
+        """Extrae categorías del producto"""
+        categories = []
+        
+        category_selectors = [
+            '[class*="breadcrumb"] a',
+            '[class*="category"] a',
+            '.breadcrumb a',
+            'nav[aria-label*="breadcrumb"] a'
+        ]
+        
+        for selector in category_selectors:
+            elements = soup.select(selector)
+            for element in elements:
+                text = element.get_text().strip()
+                if (text and 
+                    text.lower() not in ['home', 'inicio', 'tienda'] and
+                    len(text) > 2 and 
+                    len(text) < 50):
+                    categories.append(text)
+        
+        return categories
+    
+    def _extract_images(self, soup):
+        """Extrae URLs de imágenes del producto"""
+        images = []
+        
+        image_selectors = [
+            'img[class*="product"]',
+            'img[data-testid*="product"]',
+            '[class*="gallery"] img',
+            '[class*="image"] img',
+            'picture img'
+        ]
+        
+        for selector in image_selectors:
+            elements = soup.select(selector)
+            for element in elements:
+                src = element.get('src') or element.get('data-src')
+                if src and not any(x in src.lower() for x in ['placeholder', 'loading', 'spinner']):
+                    images.append(src)
+        
+        return list(set(images))[:10]
+    
+    @traced('analyze.terms')
+    def analyze_terms(self, all_data):
+        """Analiza los términos más frecuentes enfocándose en características de producto"""
+        terms = Counter()
+        
+        for data in all_data:
+            terms.update(self._partial('terms', content_hash(data), lambda: self._product_terms(data)))
+            
+        return terms
+            
+    def _product_terms(self, data):
+        """Términos relevantes de una sola ficha"""
+        # Priorizar título y características
+        title_text = data.get('title', '')
+        features_text = " ".join(data.get('features', []))
+        specs_keys = " ".join(data.get('specifications', {}).keys())
+        specs_values = " ".join(data.get('specifications', {}).values())
+        
+        # Dar más peso a características técnicas
+        all_text = f" {title_text} {features_text} {features_text} {specs_keys} {specs_values} "
+        
+        # Agregar descripción filtrada
+        description = data.get('description', '')
+        if description:
+            sentences = description.split('.')
+            for sentence in sentences:
+                if self._is_product_relevant_sentence(sentence):
+                    all_text += sentence + " "
+        
+        # Limpiar y tokenizar texto
+        words = re.findall(r'\b[a-záéíóúñüA-ZÁÉÍÓÚÑÜ]{3,}\b', all_text.lower())
+        
+        # Filtrar palabras relevantes
+        filtered_words = []
+        for word in words:
+            if (word not in self.stop_words and 
+                len(word) >= 3 and 
+                not word.isdigit() and
+                self._is_product_term(word)):
+                filtered_words.append(word)
+        
+        return Counter(filtered_words)
+    
+    def _partial(self, kind, key, compute):
+        """
+        Memoiza un resultado parcial por contenido de ficha
+        
+        Las fichas reutilizadas de un crawl anterior conservan su hash, así que
+        solo las páginas que han cambiado se vuelven a analizar.
+        """
+        cache_key = (kind, key)
+        with self._partials_lock:
+            if cache_key in self._partials:
+                self._partials.move_to_end(cache_key)
+                return self._partials[cache_key]
+        
+        value = compute()
+        
+        with self._partials_lock:
+            self._partials[cache_key] = value
+            while len(self._partials) > self.MAX_PARTIALS:
+                self._partials.popitem(last=False)
+        return value
+    
+    def _is_product_relevant_sentence(self, sentence):
+        """Determina si una oración es relevante para el producto"""
+        sentence_lower = sentence.lower().strip()
+        
+        # Frases que indican características técnicas
+        positive_indicators = [
+            'características', 'especificaciones', 'incluye', 'cuenta con',
+            'tecnología', 'material', 'diseño', 'tamaño', 'dimensiones',
+            'memoria', 'procesador', 'pantalla', 'batería', 'compatible'
+        ]
+        
+        # Frases no relevantes
+        negative_indicators = [
+            'añadir', 'carrito', 'comprar', 'precio', 'envío',
+            'opinión', 'valoración', 'stock', 'oferta', 'cliente'
+        ]
+        
+        positive_score = sum(1 for indicator in positive_indicators if indicator in sentence_lower)
+        negative_score = sum(1 for indicator in negative_indicators if indicator in sentence_lower)
+        
+        return positive_score > negative_score and len(sentence.strip()) > 20
+    
+    def _is_product_term(self, word):
+        """Determina si una palabra es relevante para describir productos"""
+        irrelevant_terms = {
+            'página', 'sitio', 'web', 'usuario', 'cliente', 'cuenta',
+            'compra', 'pedido', 'pago', 'envío', 'precio', 'oferta',
+            'opinión', 'valoración', 'comentario', 'estrella'
+        }
+        
+        return word not in irrelevant_terms
+    
+    @traced('analyze.filters')
+    def analyze_filters(self, all_data):
+        """Analiza los filtros más comunes"""
+        all_filters = []
+        
+        for data in all_data:
+            all_filters.extend(data.get('filters', []))
+        
+        return Counter(all_filters)
+    
+    @traced('analyze.features')
+    def analyze_features(self, all_data):
+        """Analiza las características más mencionadas"""
+        all_features = []
+        
+        for data in all_data:
+            all_features.extend(data.get('features', []))
+        
+        # Extraer palabras clave de las características
+        feature_words = []
+        for feature in all_features:
+            words = re.findall(r'\b[a-záéíóúñüA-ZÁÉÍÓÚÑÜ]{3,}\b', feature.lower())
+            words = [word for word in words if word not in self.stop_words]
+            feature_words.extend(words)
+        
+        return Counter(feature_words)
+    
+    @traced('analyze.gaps')
+    def analyze_gaps(self, reference_data, comparison_data):
+        """Analiza gaps entre producto de referencia y competencia"""
+        gaps = {
+            'missing_features': [],
+            'missing_specs': [],
+            'missing_filters': [],
+            'unique_competitor_features': [],
+            'price_difference': None,
+            'category_differences': []
+        }
+        
+        if not reference_data or not comparison_data:
+            return gaps
+        
+        # Cada competidor aporta un parcial que solo se recalcula si cambia su ficha
+        ref_hash = content_hash(reference_data)
+        ref_filters = set(reference_data.get('filters', []))
+        all_comp_filters = set()
+        comp_prices = []
+        
+        for comp_data in comparison_data:
+            partial = self._partial(
+                'gaps',
+                (ref_hash, content_hash(comp_data), tuple(comp_data.get('filters', []))),
+                lambda: self._gap_partial(reference_data, comp_data)
+            )
+            gaps['unique_competitor_features'].extend(partial['unique_competitor_features'])
+            gaps['missing_features'].extend(partial['missing_features'])
+            gaps['missing_specs'].extend(partial['missing_specs'])
+            all_comp_filters.update(partial['filters'])
+            if partial['price']:
+                comp_prices.append(partial['price'])
+        
+        # Analizar filtros
+        gaps['missing_filters'] = list(all_comp_filters - ref_filters)
+        
+        # Analizar diferencias de precio
+        ref_price = self._extract_price_value(reference_data.get('price', ''))
+        if ref_price and comp_prices:
+            avg_comp_price = sum(comp_prices) / len(comp_prices)
+            gaps['price_difference'] = {
+                'reference': ref_price,
+                'competitors_avg': avg_comp_price,
+                'difference': ref_price - avg_comp_price,
+                'percentage': ((ref_price - avg_comp_price) / avg_comp_price) * 100
+            }
+        
+        # Eliminar duplicados
+        gaps['missing_features'] = list(set(gaps['missing_features']))
+        gaps['missing_specs'] = list(set(gaps['missing_specs']))
+        gaps['unique_competitor_features'] = list(set(gaps['unique_competitor_features']))
+        
+        return gaps
+    
+    def _gap_partial(self, reference_data, comp_data):
+        """Diferencias entre la referencia y un único competidor"""
+        ref_features = set([f.lower() for f in reference_data.get('features', [])])
+        comp_features = set([f.lower() for f in comp_data.get('features', [])])
+        
+        ref_specs = set(reference_data.get('specifications', {}).keys())
+        comp_specs = set(comp_data.get('specifications', {}).keys())
+        
+        return {
+            # Características que tiene la competencia pero no la referencia
+            'unique_competitor_features': list(comp_features - ref_features),
+            # Características que tiene la referencia pero no la competencia
+            'missing_features': list(ref_features - comp_features),
+            'missing_specs': list(ref_specs - comp_specs),
+            'filters': set(comp_data.get('filters', [])),
+            'price': self._extract_price_value(comp_data.get('price', ''))
+        }
+    
+    def _extract_price_value(self, price_text):
+        """Extrae el valor numérico del precio"""
+        if not price_text:
+            return None
+        
+        # Buscar números en el texto del precio
+        price_match = re.search(r'[\d,]+\.?\d*', price_text.replace(',', ''))
+        if price_match:
+            try:
+                return float(price_match.group())
+            except:
+                return None
+        return None
+
+
+def format_gaps_report(gaps, generated_at=None):
+    """Genera el informe de gaps en texto plano"""
+    generated_at = generated_at or datetime.now()
+    return f"""ANÁLISIS DE GAPS - {generated_at.strftime('%Y-%m-%d %H:%M')}
+                        
+CARACTERÍSTICAS ÚNICAS DE COMPETENCIA:
+{chr(10).join('• ' + f for f in gaps['unique_competitor_features'][:20])}
+
+ESPECIFICACIONES FALTANTES:
+{chr(10).join('• ' + s for s in gaps['missing_specs'][:20])}
+
+FILTROS ADICIONALES EN COMPETENCIA:
+{chr(10).join('• ' + f for f in gaps['missing_filters'][:20])}
+
+ANÁLISIS DE PRECIO:
+{json.dumps(gaps['price_difference'], indent=2) if gaps['price_difference'] else 'No disponible'}
+"""
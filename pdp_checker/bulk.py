@@ -0,0 +1,185 @@
+"""Modo catálogo: análisis de Google Shopping para una lista completa de queries/SKUs"""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import csv
+import io
+import json
+import os
+import threading
+from datetime import datetime
+
+from pdp_checker.shopping import GoogleShoppingAnalyzer
+from pdp_checker.throttle import RateLimiter
+
+# Columnas de la tabla combinada, en orden
+RESULT_COLUMNS = [
+    'query', 'sku', 'products', 'min_price', 'median_price', 'max_price',
+    'store_count', 'our_position', 'error', 'checked_at'
+]
+
+
+def parse_queries(text):
+    """
+    Convierte el contenido de un fichero de queries en una lista de dicts {query, sku}
+    
+    Acepta texto plano (una query por línea) o CSV con cabecera que incluya una
+    columna `query` y, opcionalmente, `sku`.
+    """
+    lines = [line for line in text.splitlines() if line.strip()]
+    if not lines:
+        return []
+    
+    header = [col.strip().lower() for col in next(csv.reader([lines[0]]))]
+    queries = []
+    
+    if 'query' in header:
+        for row in csv.DictReader(io.StringIO('\n'.join(lines))):
+            row = {k.strip().lower(): (v or '').strip() for k, v in row.items() if k}
+            if row.get('query'):
+                queries.append({'query': row['query'], 'sku': row.get('sku', '')})
+    else:
+        for line in lines:
+            query = line.strip()
+            if not query.startswith('#'):
+                queries.append({'query': query, 'sku': ''})
+    
+    # Eliminar duplicados manteniendo el orden
+    seen = set()
+    unique = []
+    for item in queries:
+        key = (item['query'].lower(), item['sku'])
+        if key not in seen:
+            seen.add(key)
+            unique.append(item)
+    
+    return unique
+
+
+def load_queries(path):
+    """Lee un fichero .txt o .csv de queries"""
+    with open(path, encoding='utf-8') as f:
+        return parse_queries(f.read())
+
+
+class BulkShoppingRunner:
+    """Ejecuta `search_products_free` + `analyze_shopping_data` para muchas queries
+    
+    Las queries se reparten en un pool de hilos que comparte un limitador de
+    ritmo y la caché de resultados. Cada resultado se añade a un fichero JSONL de
+    progreso en cuanto termina, de modo que una ejecución interrumpida se reanuda
+    saltando las queries ya completadas.
+    """
+    
+    def __init__(self, progress_path, our_store=None, num_results=20, country='es',
+                 max_workers=4, requests_per_second=1.0, cache=None, tracer=None, metrics=None):
+        self.progress_path = progress_path
+        self.our_store = (our_store or '').strip().lower()
+        self.num_results = num_results
+        self.country = country
+        self.max_workers = max_workers
+        self.rate_limiter = RateLimiter(requests_per_second)
+        self.cache = cache
+        self.tracer = tracer
+        self.metrics = metrics
+        self._lock = threading.Lock()
+    
+    def load_progress(self):
+        """Devuelve los resultados ya guardados, indexados por (query, sku)"""
+        done = {}
+        if not os.path.exists(self.progress_path):
+            return done
+        
+        with open(self.progress_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    # Línea truncada por una interrupción
+                    continue
+                done[(row.get('query', ''), row.get('sku', ''))] = row
+        
+        return done
+    
+    def run(self, queries, on_result=None):
+        """
+        Procesa las queries pendientes y devuelve la tabla combinada completa
+        
+        Las queries completadas sin error en una ejecución anterior no se repiten.
+        `on_result(row, completed, total)` se llama tras cada query nueva.
+        """
+        done = self.load_progress()
+        pending = [
+            item for item in queries
+            if (item['query'], item.get('sku', '')) not in done
+            or done[(item['query'], item.get('sku', ''))].get('error')
+        ]
+        
+        directory = os.path.dirname(self.progress_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        completed = len(queries) - len(pending)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self.check_query, item) for item in pending]
+            for future in as_completed(futures):
+                row = future.result()
+                self._save(row)
+                done[(row['query'], row['sku'])] = row
+                completed += 1
+                if on_result:
+                    on_result(row, completed, len(queries))
+        
+        return [done[(item['query'], item.get('sku', ''))] for item in queries
+                if (item['query'], item.get('sku', '')) in done]
+    
+    def check_query(self, item):
+        """Busca y analiza una query; nunca lanza excepción"""
+        # Un analizador por tarea: guarda estado (last_error) por búsqueda
+        analyzer = GoogleShoppingAnalyzer(
+            cache=self.cache, rate_limiter=self.rate_limiter, tracer=self.tracer, metrics=self.metrics
+        )
+        
+        try:
+            products, error = analyzer.search_products_free(item['query'], self.num_results, self.country)
+            analysis = analyzer.analyze_shopping_data(products)
+        except Exception as e:
+            products, error, analysis = [], f"Error general en búsqueda: {str(e)}", {}
+        
+        return self.summarize(item, products, analysis, error)
+    
+    def summarize(self, item, products, analysis, error=None):
+        """Construye la fila de la tabla combinada para una query"""
+        price_ranges = analysis.get('price_ranges') or {}
+        
+        return {
+            'query': item['query'],
+            'sku': item.get('sku', ''),
+            'products': len(products),
+            'min_price': price_ranges.get('min'),
+            'median_price': price_ranges.get('median'),
+            'max_price': price_ranges.get('max'),
+            'store_count': len(analysis.get('sources', {})),
+            'our_position': self._our_position(products),
+            'error': error if not products else None,
+            'checked_at': datetime.now().isoformat()
+        }
+    
+    def _our_position(self, products):
+        """Posición (1-based) del primer resultado de nuestra tienda, o None"""
+        if not self.our_store:
+            return None
+        
+        for position, product in enumerate(products, 1):
+            source = (product.get('source') or '').lower()
+            link = (product.get('link') or '').lower()
+            if self.our_store in source or self.our_store in link:
+                return position
+        
+        return None
+    
+    def _save(self, row):
+        """Añade una fila al fichero de progreso"""
+        with self._lock:
+            with open(self.progress_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(row, ensure_ascii=False) + '\n')
+                f.flush()
@@ -0,0 +1,105 @@
+"""
+URL canónica de una ficha de producto
+
+Las URLs pegadas por los usuarios traen parámetros de seguimiento, etiquetas de
+afiliado, hosts móviles y fragmentos de variante: dos URLs del mismo ASIN de
+Amazon o del mismo artículo de eBay se descargaban y contaban como dos
+competidores. `canonical_url` las reduce a una sola forma, que es la que se
+descarga y la clave de la caché de extracciones, el journal y el histórico.
+
+Reglas genéricas: esquema y host en minúsculas, sin puerto por defecto, sin
+fragmento, sin parámetros de seguimiento y con la query ordenada. En los
+marketplaces conocidos la ficha queda en su forma mínima (`/dp/ASIN`,
+`/itm/ID`, `/item/ID.html`) y el host móvil pasa a `www.`.
+"""
+
+import re
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+# Parámetros de seguimiento que no cambian el contenido de una página
+TRACKING_PARAM_PREFIXES = ('utm_', 'gclid', 'fbclid', 'msclkid', 'mc_cid', 'mc_eid', '_ga')
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+AMAZON_HOST_RE = re.compile(r'^(?:www\.|m\.|smile\.)?(amazon\.[a-z.]+)$')
+AMAZON_PATH_RE = re.compile(r'/(?:dp|gp/product|gp/aw/d|exec/obidos/asin)/([A-Z0-9]{10})(?:[/?]|$)', re.IGNORECASE)
+
+EBAY_HOST_RE = re.compile(r'^(?:www\.|m\.)?(ebay\.[a-z.]+)$')
+EBAY_PATH_RE = re.compile(r'/itm/(?:[^/]+/)?(\d{9,15})(?:[/?]|$)')
+# Selección de variación de un anuncio de eBay: sí cambia precio y stock
+EBAY_KEEP_PARAMS = ('var',)
+
+# Los subdominios de idioma (es., fr.) se mantienen: cambian idioma y moneda
+ALIEXPRESS_HOST_RE = re.compile(r'^(?:(?:m|www)\.)?(?:([a-z]{2})\.)?(aliexpress\.[a-z.]+)$')
+ALIEXPRESS_PATH_RE = re.compile(r'/(?:item|i)/(?:[^/]+/)?(\d{6,20})\.html')
+
+
+def _marketplace_url(host, path, query):
+    """(host, path, query) mínimos de una ficha de marketplace, o None si no lo es"""
+    match = AMAZON_HOST_RE.match(host)
+    if match:
+        asin = AMAZON_PATH_RE.search(path)
+        if asin:
+            return 'www.' + match.group(1), f"/dp/{asin.group(1).upper()}", []
+        return None
+    
+    match = EBAY_HOST_RE.match(host)
+    if match:
+        item = EBAY_PATH_RE.search(path)
+        if item:
+            return 'www.' + match.group(1), f"/itm/{item.group(1)}", [
+                (name, value) for name, value in query if name in EBAY_KEEP_PARAMS
+            ]
+        return None
+    
+    match = ALIEXPRESS_HOST_RE.match(host)
+    if match:
+        item = ALIEXPRESS_PATH_RE.search(path)
+        if item:
+            language, domain = match.groups()
+            return f"{language or 'www'}.{domain}", f"/item/{item.group(1)}.html", []
+    return None
+
+
+def canonical_url(url):
+    """URL canónica de `url` (ver el docstring del módulo)"""
+    parsed = urlparse(url.strip())
+    scheme = parsed.scheme.lower()
+    host = (parsed.hostname or '').rstrip('.')
+    port = parsed.port if parsed.port and parsed.port != DEFAULT_PORTS.get(scheme) else None
+    query = [
+        (name, value) for name, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if not name.lower().startswith(TRACKING_PARAM_PREFIXES)
+    ]
+    path = parsed.path or '/'
+    
+    marketplace = _marketplace_url(host, path, query)
+    if marketplace:
+        host, path, query = marketplace
+        scheme = 'https'
+    
+    netloc = f"{host}:{port}" if port else host
+    return urlunparse((scheme, netloc, path, parsed.params, urlencode(sorted(query)), ''))
+
+
+def dedupe_urls(all_urls):
+    """
+    Canonicaliza una lista de (role, url) y quita las URLs repetidas
+    
+    Se conserva la primera aparición de cada URL canónica; si una repetida es la
+    referencia, la entrada conservada pasa a serlo.
+    
+    Returns:
+        tuple: (lista de (role, url canónica), número de duplicadas descartadas)
+    """
+    positions = {}
+    unique = []
+    for role, url in all_urls:
+        url = canonical_url(url)
+        if url in positions:
+            if role == 'reference':
+                unique[positions[url]] = ('reference', url)
+            continue
+        positions[url] = len(unique)
+        unique.append((role, url))
+    return unique, len(all_urls) - len(unique)
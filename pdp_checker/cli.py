@@ -0,0 +1,706 @@
+"""
+Línea de comandos para ejecutar análisis sin Streamlit (cron, workers)
+
+Ejemplos:
+    python -m pdp_checker analyze urls.txt --out resultados.jsonl --gaps gaps.txt
+    python -m pdp_checker analyze --resume 20240101-120000-abc123 --out resultados.jsonl
+    python -m pdp_checker shopping-bulk queries.csv --our-store pccomponentes
+    python -m pdp_checker shopping-crawl "auriculares bluetooth" --top-per-store 2 --budget 20
+    python -m pdp_checker category-crawl https://tienda.com/auriculares --max-pages 20 --max-products 200
+    python -m pdp_checker schedule watchlist.json --workers 4 --per-domain 1 --metrics-port 9108
+    python -m pdp_checker queue enqueue urls.txt --batch auditoria-enero
+    python -m pdp_checker queue work --processes 8 --exit-when-empty
+    python -m pdp_checker queue collect auditoria-enero --out resultados.jsonl --gaps gaps.txt
+    python -m pdp_checker export 20240101-120000-abc123 --format parquet --out run.parquet
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+from pdp_checker.analyzer import ANALYSIS_FIELDS, ProductBenchmarkAnalyzer, extraction_plan, format_gaps_report
+from pdp_checker.bulk import BulkShoppingRunner, load_queries
+from pdp_checker.deepcrawl import DeepCrawler, select_targets
+from pdp_checker.events import LoggingEventSink
+from pdp_checker.export import EXPORT_FORMATS, available_formats, export_products
+from pdp_checker.frontier import CategoryFrontier
+from pdp_checker.journal import RunJournal, new_run_id
+from pdp_checker.metrics import ScrapeMetrics
+from pdp_checker.runner import iter_url_results, read_url_file, split_results
+from pdp_checker.scheduler import MonitorScheduler, load_watchlist
+from pdp_checker.shopping import GoogleShoppingAnalyzer, QueryResultCache
+from pdp_checker.store import SnapshotStore
+from pdp_checker.throttle import DomainLimiter
+from pdp_checker.trace import Tracer
+from pdp_checker.workqueue import SQLiteWorkQueue, collect_results, default_worker_id, enqueue_urls, run_worker
+
+logger = logging.getLogger('pdp_checker.cli')
+
+# Cada cuánto se reescribe --metrics-file mientras el proceso sigue en marcha
+METRICS_FLUSH_SECONDS = 15
+
+
+def cmd_analyze(args):
+    """Extrae y analiza las URLs de un fichero y escribe JSONL + informe de gaps"""
+    if args.resume:
+        try:
+            journal = RunJournal.load(args.runs_dir, args.resume)
+        except OSError:
+            logger.error("No existe el run %s en %s", args.resume, args.runs_dir)
+            return 1
+        all_urls = journal.all_urls
+        logger.info("Reanudando run %s: %d URLs pendientes", journal.run_id, len(journal.pending_urls()))
+    else:
+        if not args.urls:
+            logger.error("Indica un fichero de URLs o --resume RUN_ID")
+            return 1
+        all_urls = read_url_file(args.urls)
+        if not all_urls:
+            logger.error("No hay URLs válidas en %s", args.urls)
+            return 1
+        journal = RunJournal.create(args.runs_dir, all_urls)
+        logger.info("Run %s (journal en %s)", journal.run_id, journal.path)
+    
+    store = SnapshotStore(args.store) if args.store else None
+    tracer = Tracer(memory=args.memory) if args.trace or args.memory else None
+    metrics = _start_metrics(args)
+    
+    use_zenrow = bool(args.zenrow)
+    analyzer = ProductBenchmarkAnalyzer(
+        use_zenrow=use_zenrow,
+        zenrow_api_key=os.environ.get("ZENROW_API_KEY"),
+        events=LoggingEventSink(),
+        fingerprints=None if args.no_reuse else store,
+        fields=extraction_plan(args.analyses) if args.analyses else None,
+        tracer=tracer,
+        metrics=metrics
+    )
+    if use_zenrow and not analyzer.zenrow_api_key:
+        logger.error("--zenrow requiere la variable de entorno ZENROW_API_KEY")
+        return 1
+    
+    results = []
+    with open(args.out, 'w', encoding='utf-8') as out:
+        for result in iter_url_results(
+            analyzer,
+            all_urls,
+            delay=args.delay,
+            aggressive_mode=args.aggressive,
+            retry_403=not args.no_retry,
+            rotate_headers=args.rotate_headers,
+            use_zenrow=use_zenrow,
+            on_retry=lambda i, role, url: logger.info("Reintentando %s", url),
+            journal=journal
+        ):
+            results.append(result)
+            out.write(json.dumps({
+                'role': result['role'],
+                'url': result['url'],
+                'status': 'ok' if result['data'] else 'failed',
+                'changed': result['data'].get('changed') if result['data'] else None,
+                'product': result['data']
+            }, ensure_ascii=False) + '\n')
+            out.flush()
+            logger.info(
+                "[%d/%d] %s %s", result['index'] + 1, len(all_urls),
+                'REANUDADO' if result['resumed'] else
+                'SIN CAMBIOS' if result['data'] and result['data'].get('changed') is False else
+                'OK' if result['data'] else 'FALLO',
+                result['url']
+            )
+    
+    reference_data, competitor_data, all_data = split_results(results)
+    unchanged = sum(1 for data in all_data if data.get('changed') is False)
+    logger.info(
+        "Procesadas %d de %d URLs (%d con cambios, %d sin cambios)",
+        len(all_data), len(all_urls), len(all_data) - unchanged, unchanged
+    )
+    
+    if store is not None:
+        saved = store.save_products(all_data, run_id=journal.run_id)
+        store.close()
+        logger.info("%d snapshots nuevos en %s", saved, args.store)
+    
+    if args.gaps:
+        if reference_data and competitor_data:
+            gaps = analyzer.analyze_gaps(reference_data, competitor_data)
+            with open(args.gaps, 'w', encoding='utf-8') as f:
+                f.write(format_gaps_report(gaps))
+        else:
+            logger.warning("El informe de gaps necesita una URL de referencia y al menos un competidor")
+    
+    if tracer is not None:
+        _write_trace(tracer, args.trace)
+    _write_metrics(metrics, args)
+    
+    return 0 if all_data else 2
+
+
+def cmd_shopping_bulk(args):
+    """Analiza en Google Shopping todas las queries de un fichero"""
+    queries = load_queries(args.queries)
+    if not queries:
+        logger.error("No hay queries en %s", args.queries)
+        return 1
+    
+    progress_path = args.progress or os.path.splitext(args.queries)[0] + '.progress.jsonl'
+    tracer = Tracer(memory=args.memory) if args.trace or args.memory else None
+    metrics = _start_metrics(args)
+    runner = BulkShoppingRunner(
+        progress_path,
+        our_store=args.our_store,
+        num_results=args.num_results,
+        country=args.country,
+        max_workers=args.workers,
+        requests_per_second=args.rate,
+        cache=QueryResultCache(),
+        tracer=tracer,
+        metrics=metrics
+    )
+    
+    def log_progress(row, completed, total):
+        logger.info("[%d/%d] %s %s", completed, total, row['query'], row['error'] or 'OK')
+    
+    rows = runner.run(queries, on_result=log_progress)
+    failed = sum(1 for row in rows if row.get('error'))
+    logger.info("Catálogo completado: %d queries, %d con error. Progreso en %s", len(rows), failed, progress_path)
+    
+    if tracer is not None:
+        _write_trace(tracer, args.trace)
+    _write_metrics(metrics, args)
+    
+    return 0 if len(rows) > failed else 2
+
+
+def cmd_shopping_crawl(args):
+    """Busca en Google Shopping y extrae en paralelo las fichas de los resultados"""
+    metrics = _start_metrics(args)
+    shopping = GoogleShoppingAnalyzer(metrics=metrics)
+    products, error = shopping.search_products_free(args.query, args.num_results, args.country)
+    if error:
+        logger.warning("Google Shopping: %s", error)
+    
+    targets = select_targets(products, shopping._clean_link, args.top_per_store, args.budget, args.our_store)
+    if not targets:
+        logger.error("Ninguno de los %d resultados enlaza a una ficha de tienda", len(products))
+        return 2
+    logger.info("%d resultados, %d fichas a extraer", len(products), len(targets))
+    
+    journal = RunJournal.create(args.runs_dir, [(target['role'], target['url']) for target in targets])
+    store = SnapshotStore(args.store) if args.store else None
+    analyzer = ProductBenchmarkAnalyzer(events=LoggingEventSink(), fingerprints=store, metrics=metrics)
+    crawler = DeepCrawler(analyzer, max_workers=args.workers, per_domain=args.per_domain, delay=args.delay)
+    
+    results = []
+    with open(args.out, 'w', encoding='utf-8') as out:
+        for done, result in enumerate(crawler.iter_results(targets, journal=journal), 1):
+            results.append(result)
+            listing = result['listing']
+            out.write(json.dumps({
+                'role': result['role'],
+                'url': result['url'],
+                'status': 'ok' if result['data'] else 'failed',
+                'listing': {key: listing.get(key) for key in ('title', 'price', 'source')},
+                'product': result['data']
+            }, ensure_ascii=False) + '\n')
+            out.flush()
+            logger.info("[%d/%d] %s %s", done, len(targets), 'OK' if result['data'] else 'FALLO', result['url'])
+    
+    reference_data, competitor_data, all_data = split_results(results)
+    logger.info("Run %s: %d de %d fichas extraídas, resultados en %s", journal.run_id, len(all_data), len(targets), args.out)
+    
+    if store is not None:
+        store.save_products(all_data, run_id=journal.run_id)
+        store.close()
+    
+    if args.gaps:
+        if reference_data and competitor_data:
+            with open(args.gaps, 'w', encoding='utf-8') as f:
+                f.write(format_gaps_report(analyzer.analyze_gaps(reference_data, competitor_data)))
+        else:
+            logger.warning("El informe de gaps necesita --our-store y al menos un competidor")
+    
+    _write_metrics(metrics, args)
+    return 0 if all_data else 2
+
+
+def cmd_category_crawl(args):
+    """Recorre páginas de categoría y extrae las fichas que aparecen en ellas"""
+    seeds = []
+    for seed in args.seeds:
+        seeds.extend([seed] if seed.startswith(('http://', 'https://')) else [url for _, url in read_url_file(seed)])
+    if not seeds:
+        logger.error("No hay URLs de categoría")
+        return 1
+    
+    metrics = _start_metrics(args)
+    store = SnapshotStore(args.store) if args.store and not args.list_only else None
+    analyzer = ProductBenchmarkAnalyzer(events=LoggingEventSink(), fingerprints=store, metrics=metrics)
+    frontier = CategoryFrontier(
+        analyzer,
+        max_depth=args.max_depth,
+        max_pages=args.max_pages,
+        max_products=args.max_products,
+        subcategories=args.subcategories,
+        max_workers=args.workers,
+        per_domain=args.per_domain,
+        delay=args.delay
+    )
+    
+    if args.list_only:
+        # Salida válida como entrada de `analyze` o `queue enqueue`
+        with open(args.out, 'w', encoding='utf-8') as out:
+            for url, listing in frontier.iter_product_urls(seeds):
+                out.write(f"competitor,{url}\n")
+        logger.info("%d fichas en %d listados, guardadas en %s", frontier.stats['products'], frontier.stats['pages'], args.out)
+        _write_metrics(metrics, args)
+        return 0 if frontier.stats['products'] else 2
+    
+    run_id = new_run_id([('category', seed) for seed in seeds])
+    all_data = []
+    with open(args.out, 'w', encoding='utf-8') as out:
+        for result in frontier.iter_results(seeds):
+            if result['data']:
+                all_data.append(result['data'])
+            out.write(json.dumps({
+                'role': result['role'],
+                'url': result['url'],
+                'status': 'ok' if result['data'] else 'failed',
+                'listing': result['listing'],
+                'product': result['data']
+            }, ensure_ascii=False) + '\n')
+            out.flush()
+            logger.info("[%d] %s %s", result['index'] + 1, 'OK' if result['data'] else 'FALLO', result['url'])
+    
+    stats = frontier.stats
+    logger.info(
+        "Run %s: %d listados (%d fallidos), %d fichas (%d repetidas descartadas), %d extraídas",
+        run_id, stats['pages'], stats['failed_pages'], stats['products'], stats['duplicates'], len(all_data)
+    )
+    
+    if store is not None:
+        store.save_products(all_data, run_id=run_id)
+        store.close()
+    _write_metrics(metrics, args)
+    return 0 if all_data else 2
+
+
+def cmd_schedule(args):
+    """Ejecuta la watchlist de forma periódica (o una sola vez con --once)"""
+    try:
+        jobs = load_watchlist(args.watchlist)
+    except (OSError, ValueError) as e:
+        logger.error("No se pudo leer la watchlist %s: %s", args.watchlist, e)
+        return 1
+    if not jobs:
+        logger.error("La watchlist %s no tiene jobs", args.watchlist)
+        return 1
+    
+    store = SnapshotStore(args.store)
+    analyzer = ProductBenchmarkAnalyzer(events=LoggingEventSink(), fingerprints=store, metrics=_start_metrics(args))
+    scheduler = MonitorScheduler(
+        jobs,
+        store,
+        analyzer,
+        max_workers=args.workers,
+        per_domain=args.per_domain,
+        delay=args.delay,
+        jitter=args.jitter,
+        state_path=os.path.join(args.runs_dir, 'scheduler_state.json')
+    )
+    
+    try:
+        if args.once:
+            scheduler.run_once()
+        else:
+            logger.info("Monitorizando %d jobs (Ctrl+C para salir)", len(jobs))
+            scheduler.run_forever()
+    except KeyboardInterrupt:
+        logger.info("Planificador detenido")
+    finally:
+        store.close()
+        _write_metrics(analyzer.metrics, args)
+    
+    return 0
+
+
+def cmd_queue_enqueue(args):
+    """Encola las URLs de un fichero en un batch"""
+    all_urls = read_url_file(args.urls)
+    if not all_urls:
+        logger.error("No hay URLs válidas en %s", args.urls)
+        return 1
+    
+    queue = SQLiteWorkQueue(args.queue)
+    added = enqueue_urls(queue, all_urls, args.batch)
+    logger.info("%d URLs encoladas en el batch '%s' (%s)", added, args.batch, args.queue)
+    queue.close()
+    return 0
+
+
+def cmd_queue_work(args):
+    """Lanza N procesos worker sobre la cola"""
+    if args.processes <= 1:
+        return _worker_process(vars(args))
+    
+    processes = [
+        multiprocessing.Process(target=_worker_process, args=(dict(vars(args), worker_index=i),), name=f"worker-{i}")
+        for i in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        logger.info("Deteniendo workers")
+        for process in processes:
+            process.terminate()
+    
+    return 0
+
+
+def _worker_process(options):
+    """Cuerpo de un proceso worker: conexión, analizador y store propios"""
+    logging.basicConfig(
+        level=logging.DEBUG if options.get('verbose') else logging.INFO,
+        format='%(asctime)s %(levelname)s %(message)s'
+    )
+    queue = SQLiteWorkQueue(
+        options['queue'],
+        visibility_timeout=options['lease'],
+        max_attempts=options['max_attempts']
+    )
+    store = SnapshotStore(options['store']) if options['store'] else None
+    metrics = None
+    if options['metrics_port']:
+        # Un puerto por proceso: el worker i sirve en metrics_port + i
+        metrics = ScrapeMetrics()
+        port = options['metrics_port'] + options.get('worker_index', 0)
+        metrics.serve(port, options['metrics_host'])
+        logger.info("Métricas del worker en http://%s:%d/metrics", options['metrics_host'], port)
+    analyzer = ProductBenchmarkAnalyzer(events=LoggingEventSink(), fingerprints=store, metrics=metrics)
+    # El límite es por proceso: el ritmo por dominio se reparte entre los procesos de esta máquina
+    delay = options['delay'] * max(1, options['processes'])
+    domain_limiter = DomainLimiter(options['per_domain'], rate=1.0 / delay if delay else None)
+    
+    try:
+        processed = run_worker(
+            queue,
+            analyzer,
+            worker_id=default_worker_id(),
+            store=store,
+            exit_when_empty=options['exit_when_empty'],
+            lease_seconds=options['lease'],
+            domain_limiter=domain_limiter
+        )
+        logger.info("Worker %s: %d trabajos procesados", default_worker_id(), processed)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        queue.close()
+        if store is not None:
+            store.close()
+    return 0
+
+
+def cmd_queue_status(args):
+    """Muestra el estado de la cola y los trabajos descartados"""
+    queue = SQLiteWorkQueue(args.queue)
+    print(json.dumps(queue.stats(args.batch), ensure_ascii=False))
+    for job in queue.dead_letters(args.batch):
+        print(f"DEAD {job['batch']} {job['payload'].get('url')} ({job['attempts']} intentos): {job['last_error']}")
+    queue.close()
+    return 0
+
+
+def cmd_queue_requeue(args):
+    """Vuelve a encolar los trabajos descartados"""
+    queue = SQLiteWorkQueue(args.queue)
+    logger.info("%d trabajos reencolados", queue.requeue_dead(args.batch))
+    queue.close()
+    return 0
+
+
+def cmd_queue_collect(args):
+    """Escribe los resultados de un batch (JSONL + informe de gaps)"""
+    queue = SQLiteWorkQueue(args.queue)
+    results = collect_results(queue, args.batch)
+    stats = queue.stats(args.batch)
+    queue.close()
+    
+    with open(args.out, 'w', encoding='utf-8') as out:
+        for result in results:
+            out.write(json.dumps({
+                'role': result['role'],
+                'url': result['url'],
+                'status': 'ok',
+                'product': result['data']
+            }, ensure_ascii=False) + '\n')
+    logger.info(
+        "%d resultados de '%s' en %s (%d pendientes, %d descartados)",
+        len(results), args.batch, args.out, stats['pending'] + stats['leased'], stats['dead']
+    )
+    
+    if args.gaps:
+        reference_data, competitor_data, _ = split_results(results)
+        if reference_data and competitor_data:
+            analyzer = ProductBenchmarkAnalyzer(events=LoggingEventSink())
+            with open(args.gaps, 'w', encoding='utf-8') as f:
+                f.write(format_gaps_report(analyzer.analyze_gaps(reference_data, competitor_data)))
+        else:
+            logger.warning("El informe de gaps necesita una URL de referencia y al menos un competidor")
+    
+    return 0 if results else 2
+
+
+def cmd_export(args):
+    """Exporta por bloques los productos guardados de un run (CSV gzip, JSONL o Parquet)"""
+    if args.format not in available_formats():
+        logger.error("El formato %s necesita pyarrow", args.format)
+        return 1
+    
+    try:
+        references = {url for role, url in RunJournal.read_urls(args.runs_dir, args.run_id) if role == 'reference'}
+    except OSError:
+        logger.warning("Sin journal para %s: todos los productos se exportan como competencia", args.run_id)
+        references = set()
+    
+    out = args.out or f"run_{args.run_id}.{args.format}"
+    store = SnapshotStore(args.store)
+    products = store.iter_run_products(args.run_id, chunk_size=args.chunk_size)
+    count = export_products(
+        (('reference' if data.get('url') in references else 'competitor', data) for data in products),
+        out,
+        args.format,
+        chunk_size=args.chunk_size
+    )
+    store.close()
+    
+    if not count:
+        logger.error("No hay snapshots del run %s en %s", args.run_id, args.store)
+        os.remove(out)
+        return 2
+    logger.info("%d productos exportados a %s", count, out)
+    return 0
+
+
+def _start_metrics(args):
+    """`ScrapeMetrics` del proceso si se pide `--metrics-port` o `--metrics-file` (si no, None)"""
+    if not (args.metrics_port or args.metrics_file):
+        return None
+    
+    metrics = ScrapeMetrics()
+    if args.metrics_port:
+        metrics.serve(args.metrics_port, args.metrics_host)
+        logger.info("Métricas en http://%s:%d/metrics", args.metrics_host, args.metrics_port)
+    if args.metrics_file:
+        def flush():
+            while True:
+                time.sleep(METRICS_FLUSH_SECONDS)
+                metrics.write(args.metrics_file)
+        threading.Thread(target=flush, daemon=True).start()
+    return metrics
+
+
+def _write_metrics(metrics, args):
+    if metrics is not None and args.metrics_file:
+        metrics.write(args.metrics_file)
+        logger.info("Métricas en %s", args.metrics_file)
+
+
+def _add_metrics_arguments(parser, file=True):
+    parser.add_argument('--metrics-port', type=int, help="Servir métricas de Prometheus en este puerto (/metrics)")
+    parser.add_argument('--metrics-host', default='127.0.0.1', help="Interfaz del endpoint de métricas")
+    if file:
+        parser.add_argument('--metrics-file', help="Escribir las métricas en este fichero (textfile collector)")
+
+
+def _write_trace(tracer, path):
+    """Guarda la traza en JSON (si hay `path`) y resume p50/p95 y memoria por etapa en el log"""
+    tracer.stop_memory()
+    if path:
+        tracer.dump(path)
+    for row in tracer.summary():
+        logger.info(
+            "%-24s n=%-4d p50=%8.1f ms  p95=%8.1f ms", row['stage'], row['count'], row['p50_ms'], row['p95_ms']
+        )
+    
+    report = tracer.memory_report()
+    if report:
+        for row in tracer.summary():
+            if 'peak_kb' in row:
+                logger.info("%-24s pico=%9.1f KB  retenida=%9.1f KB", row['stage'], row['peak_kb'], row['retained_kb'])
+        logger.info(
+            "Pico de memoria %.1f MB; árboles HTML pendientes de gc: %d, retenidos tras gc: %d",
+            report['peak_kb'] / 1024, report['alive'], report['alive_after_gc']
+        )
+        for allocation in report['top_allocations']:
+            logger.info("  %9.1f KB  %6d bloques  %s", allocation['size_kb'], allocation['count'], allocation['site'])
+    if path:
+        logger.info("Traza de latencias en %s", path)
+
+
+def _analysis_list(value):
+    """`terms,gaps` -> ['terms', 'gaps'], validando los nombres"""
+    analyses = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in analyses if name not in ANALYSIS_FIELDS]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"análisis desconocidos: {', '.join(unknown)}")
+    return analyses
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='pdp_checker',
+        description="Análisis competitivo de productos sin interfaz"
+    )
+    parser.add_argument('-v', '--verbose', action='store_true', help="Log detallado")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    default_store = os.environ.get('PDP_STORE_PATH', os.path.join(os.environ.get('PDP_RUNS_DIR', 'runs'), 'snapshots.db'))
+    
+    analyze = subparsers.add_parser('analyze', help="Extraer y analizar URLs de producto")
+    analyze.add_argument('urls', nargs='?', help="Fichero con una URL por línea (opcional: 'reference,URL' / 'competitor,URL')")
+    analyze.add_argument('--runs-dir', default=os.environ.get('PDP_RUNS_DIR', 'runs'), help="Directorio de journals de runs")
+    analyze.add_argument('--resume', metavar='RUN_ID', help="Reanudar un run: solo procesa URLs pendientes o fallidas")
+    analyze.add_argument('--store', default=default_store, help="Base SQLite de snapshots ('' para desactivar)")
+    analyze.add_argument('--no-reuse', action='store_true', help="Volver a extraer también las páginas sin cambios")
+    analyze.add_argument(
+        '--analyses',
+        type=_analysis_list,
+        help=f"Extraer solo lo que necesitan estos análisis, separados por comas ({','.join(ANALYSIS_FIELDS)})"
+    )
+    analyze.add_argument('--out', default='resultados.jsonl', help="Fichero JSONL de salida")
+    analyze.add_argument('--gaps', help="Fichero TXT para el informe de gaps")
+    analyze.add_argument('--delay', type=float, default=2.0, help="Segundos entre requests")
+    analyze.add_argument('--aggressive', action='store_true', help="Modo agresivo (delays más largos)")
+    analyze.add_argument('--rotate-headers', action='store_true', help="Rotar User-Agents")
+    analyze.add_argument('--no-retry', action='store_true', help="No reintentar URLs bloqueadas")
+    analyze.add_argument('--zenrow', action='store_true', help="Usar ZenRows (clave en ZENROW_API_KEY)")
+    analyze.add_argument('--trace', metavar='FILE', help="Guardar los tiempos por etapa y URL en un JSON")
+    analyze.add_argument('--memory', action='store_true', help="Medir pico y memoria retenida por etapa (tracemalloc, más lento)")
+    _add_metrics_arguments(analyze)
+    analyze.set_defaults(func=cmd_analyze)
+    
+    bulk = subparsers.add_parser('shopping-bulk', help="Modo catálogo de Google Shopping")
+    bulk.add_argument('queries', help="Fichero .txt (una query por línea) o .csv con columnas query[,sku]")
+    bulk.add_argument('--progress', help="Fichero JSONL de progreso (permite reanudar)")
+    bulk.add_argument('--our-store', help="Nombre o dominio de nuestra tienda")
+    bulk.add_argument('--num-results', type=int, default=20, help="Resultados por query")
+    bulk.add_argument('--country', default='es', help="País de Google (es, com, mx)")
+    bulk.add_argument('--workers', type=int, default=3, help="Hilos en paralelo")
+    bulk.add_argument('--rate', type=float, default=1.0, help="Peticiones por segundo")
+    bulk.add_argument('--trace', metavar='FILE', help="Guardar los tiempos por etapa y búsqueda en un JSON")
+    bulk.add_argument('--memory', action='store_true', help="Medir pico y memoria retenida por etapa (tracemalloc, más lento)")
+    _add_metrics_arguments(bulk)
+    bulk.set_defaults(func=cmd_shopping_bulk)
+    
+    crawl = subparsers.add_parser('shopping-crawl', help="Buscar en Google Shopping y analizar las fichas de los resultados")
+    crawl.add_argument('query', help="Producto a buscar")
+    crawl.add_argument('--num-results', type=int, default=40, help="Resultados de Google Shopping a recorrer")
+    crawl.add_argument('--country', default='es', help="País de Google (es, com, mx)")
+    crawl.add_argument('--our-store', help="Nombre o dominio de nuestra tienda (su ficha es la referencia)")
+    crawl.add_argument('--top-per-store', type=int, default=2, help="Fichas por tienda como máximo")
+    crawl.add_argument('--budget', type=int, default=20, help="Fichas a descargar como máximo en total")
+    crawl.add_argument('--workers', type=int, default=4, help="Descargas simultáneas en total")
+    crawl.add_argument('--per-domain', type=int, default=1, help="Descargas simultáneas por dominio")
+    crawl.add_argument('--delay', type=float, default=2.0, help="Segundos entre requests al mismo dominio")
+    crawl.add_argument('--out', default='resultados.jsonl', help="Fichero JSONL de salida")
+    crawl.add_argument('--gaps', help="Fichero TXT para el informe de gaps (requiere --our-store)")
+    crawl.add_argument('--store', default=default_store, help="Base SQLite de snapshots ('' para desactivar)")
+    crawl.add_argument('--runs-dir', default=os.environ.get('PDP_RUNS_DIR', 'runs'), help="Directorio de journals de runs")
+    _add_metrics_arguments(crawl)
+    crawl.set_defaults(func=cmd_shopping_crawl)
+    
+    category = subparsers.add_parser('category-crawl', help="Descubrir y analizar fichas desde páginas de categoría")
+    category.add_argument('seeds', nargs='+', help="URLs de categoría o ficheros con una URL por línea")
+    category.add_argument('--max-depth', type=int, default=3, help="Saltos (página siguiente o subcategoría) desde cada semilla")
+    category.add_argument('--max-pages', type=int, default=20, help="Listados a descargar como máximo")
+    category.add_argument('--max-products', type=int, default=200, help="Fichas a descubrir como máximo")
+    category.add_argument('--subcategories', action='store_true', help="Seguir también las subcategorías")
+    category.add_argument('--workers', type=int, default=4, help="Descargas simultáneas en total")
+    category.add_argument('--per-domain', type=int, default=1, help="Descargas simultáneas por dominio")
+    category.add_argument('--delay', type=float, default=2.0, help="Segundos entre requests al mismo dominio")
+    category.add_argument('--list-only', action='store_true', help="Solo guardar las URLs de ficha (formato de `analyze`)")
+    category.add_argument('--out', default='resultados.jsonl', help="Fichero de salida (JSONL, o lista de URLs con --list-only)")
+    category.add_argument('--store', default=default_store, help="Base SQLite de snapshots ('' para desactivar)")
+    _add_metrics_arguments(category)
+    category.set_defaults(func=cmd_category_crawl)
+    
+    schedule = subparsers.add_parser('schedule', help="Monitorización periódica de una watchlist")
+    schedule.add_argument('watchlist', help="Fichero JSON con los jobs (URLs o queries e intervalo)")
+    schedule.add_argument('--store', default=default_store, help="Base SQLite de snapshots")
+    schedule.add_argument('--runs-dir', default=os.environ.get('PDP_RUNS_DIR', 'runs'), help="Directorio del estado del planificador")
+    schedule.add_argument('--workers', type=int, default=4, help="Peticiones simultáneas en total")
+    schedule.add_argument('--per-domain', type=int, default=1, help="Peticiones simultáneas por dominio")
+    schedule.add_argument('--delay', type=float, default=2.0, help="Segundos entre requests al mismo dominio")
+    schedule.add_argument('--jitter', type=float, default=0.1, help="Variación aleatoria del intervalo (fracción)")
+    schedule.add_argument('--once', action='store_true', help="Ejecutar todos los jobs una vez y salir")
+    _add_metrics_arguments(schedule)
+    schedule.set_defaults(func=cmd_schedule)
+    
+    queue = subparsers.add_parser('queue', help="Cola de trabajo para repartir URLs entre workers")
+    queue_commands = queue.add_subparsers(dest='queue_command', required=True)
+    default_queue = os.environ.get('PDP_QUEUE_PATH', os.path.join(os.environ.get('PDP_RUNS_DIR', 'runs'), 'queue.db'))
+    
+    enqueue = queue_commands.add_parser('enqueue', help="Encolar un fichero de URLs")
+    enqueue.add_argument('urls', help="Fichero de URLs (mismo formato que analyze)")
+    enqueue.add_argument('--batch', required=True, help="Nombre del lote")
+    enqueue.set_defaults(func=cmd_queue_enqueue)
+    
+    work = queue_commands.add_parser('work', help="Procesar trabajos de la cola")
+    work.add_argument('--processes', type=int, default=1, help="Procesos worker en esta máquina")
+    work.add_argument('--store', default=default_store, help="Base SQLite de snapshots ('' para desactivar)")
+    work.add_argument('--lease', type=float, default=300, help="Segundos de visibilidad de un trabajo reclamado")
+    work.add_argument('--max-attempts', type=int, default=3, help="Intentos antes de descartar un trabajo")
+    work.add_argument('--per-domain', type=int, default=1, help="Descargas simultáneas por dominio en cada proceso")
+    work.add_argument('--delay', type=float, default=2.0, help="Segundos entre requests al mismo dominio (entre todos los procesos)")
+    work.add_argument('--exit-when-empty', action='store_true', help="Terminar cuando no queden trabajos")
+    _add_metrics_arguments(work, file=False)
+    work.set_defaults(func=cmd_queue_work)
+    
+    status = queue_commands.add_parser('status', help="Estado de la cola y trabajos descartados")
+    status.add_argument('--batch', help="Solo este lote")
+    status.set_defaults(func=cmd_queue_status)
+    
+    requeue = queue_commands.add_parser('requeue-dead', help="Reencolar trabajos descartados")
+    requeue.add_argument('--batch', help="Solo este lote")
+    requeue.set_defaults(func=cmd_queue_requeue)
+    
+    collect = queue_commands.add_parser('collect', help="Exportar los resultados de un lote")
+    collect.add_argument('batch', help="Nombre del lote")
+    collect.add_argument('--out', default='resultados.jsonl', help="Fichero JSONL de salida")
+    collect.add_argument('--gaps', help="Fichero TXT para el informe de gaps")
+    collect.set_defaults(func=cmd_queue_collect)
+    
+    for command in (enqueue, work, status, requeue, collect):
+        command.add_argument('--queue', default=default_queue, help="Fichero SQLite de la cola")
+    
+    export = subparsers.add_parser('export', help="Exportar los productos guardados de un run")
+    export.add_argument('run_id', help="Id del run (ver runs/)")
+    export.add_argument('--format', choices=list(EXPORT_FORMATS), default='csv.gz', help="Formato de salida")
+    export.add_argument('--out', help="Fichero de salida (por defecto run_<id>.<formato>)")
+    export.add_argument('--store', default=default_store, help="Base SQLite de snapshots")
+    export.add_argument('--runs-dir', default=os.environ.get('PDP_RUNS_DIR', 'runs'), help="Directorio de journals de runs")
+    export.add_argument('--chunk-size', type=int, default=500, help="Productos por bloque")
+    export.set_defaults(func=cmd_export)
+    
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format='%(asctime)s %(levelname)s %(message)s'
+    )
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
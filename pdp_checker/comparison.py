@@ -0,0 +1,158 @@
+"""Métricas y agregados para comparar muchos productos a la vez (sin gráficos)"""
+
+from collections import Counter
+
+import pandas as pd
+
+from pdp_checker.store import normalize_price
+
+# Atributos de la matriz de comparación, en orden
+MATRIX_ATTRIBUTES = ['Precio', 'Descripción', 'Características', 'Especificaciones', 'Imágenes', 'Categorías']
+
+# Ejes del radar
+RADAR_ATTRIBUTES = ['Características', 'Especificaciones', 'Imágenes', 'Categorías', 'Filtros']
+
+
+# Campo de la ficha de cada columna de contadores
+METRIC_FIELDS = {
+    'Precio': 'price',
+    'Descripción': 'description',
+    'Características': 'features',
+    'Especificaciones': 'specifications',
+    'Imágenes': 'images',
+    'Categorías': 'categories',
+    'Filtros': 'filters'
+}
+
+# Elementos que cuentan como completos en la puntuación (1 = basta con que exista)
+COMPLETENESS_TARGETS = {
+    'title': 1,
+    'description': 1,
+    'price': 1,
+    'features': 5,
+    'specifications': 5,
+    'images': 3
+}
+
+FIELD_LABELS = {
+    'title': 'título',
+    'description': 'descripción',
+    'price': 'precio',
+    'features': 'características',
+    'specifications': 'especificaciones',
+    'images': 'imágenes',
+    'categories': 'categorías',
+    'filters': 'filtros'
+}
+
+
+def completeness_parts(data):
+    """
+    Fracción completada (0..1) de cada campo puntuable de una ficha
+    
+    Los campos de `not_extracted` (análisis desactivado) no aparecen: no se
+    sabe si la página los tiene.
+    """
+    not_extracted = set(data.get('not_extracted') or ())
+    parts = {}
+    for field, target in COMPLETENESS_TARGETS.items():
+        if field in not_extracted:
+            continue
+        value = data.get(field)
+        if target == 1:
+            parts[field] = 1.0 if value else 0.0
+        else:
+            parts[field] = min(len(value or ()) / target, 1)
+    return parts
+
+
+def completeness_score(data):
+    """Porcentaje de completitud de una ficha, solo sobre los campos extraídos"""
+    parts = completeness_parts(data)
+    return sum(parts.values()) / len(parts) * 100 if parts else 0.0
+
+
+def incomplete_fields(data):
+    """Nombres (para mostrar) de los campos extraídos que no llegan a completos"""
+    return [FIELD_LABELS[field] for field, part in completeness_parts(data).items() if part < 1]
+
+
+def product_metrics(all_data):
+    """
+    Una fila por producto con los contadores de la comparación
+    
+    Se calcula una vez por run; el resto de vistas (agregados, top-K, radares)
+    parten de esta tabla en lugar de recorrer las fichas otra vez. Los contadores de
+    campos no extraídos quedan vacíos (NaN), no a 0.
+    """
+    rows = []
+    titles = Counter()
+    for i, data in enumerate(all_data):
+        # El título es el índice del heatmap: los repetidos (variantes) se numeran
+        title = (data.get('title') or 'Sin título')[:50]
+        titles[title] += 1
+        counters = {
+            'Precio': 1 if data.get('price') else 0,
+            'Descripción': int(len(data.get('description', '')) > 100),
+            'Características': len(data.get('features', [])),
+            'Especificaciones': len(data.get('specifications', {})),
+            'Imágenes': len(data.get('images', [])),
+            'Categorías': len(data.get('categories', [])),
+            'Filtros': len(data.get('filters', []))
+        }
+        not_extracted = set(data.get('not_extracted') or ())
+        rows.append({
+            'Producto': f"Producto {i + 1}",
+            'Título': title if titles[title] == 1 else f"{title} ({titles[title]})",
+            'Dominio': data.get('domain', ''),
+            **{
+                column: None if METRIC_FIELDS[column] in not_extracted else value
+                for column, value in counters.items()
+            },
+            'Precio (€)': normalize_price(data.get('price')),
+            'Completitud': completeness_score(data)
+        })
+    return pd.DataFrame(rows)
+
+
+def price_buckets(metrics, buckets=6):
+    """Etiqueta de rango de precio por producto (cuantiles; 'Sin precio' si falta)"""
+    prices = metrics['Precio (€)']
+    labels = pd.Series('Sin precio', index=metrics.index, dtype=object)
+    known = prices.dropna()
+    if known.empty:
+        return labels.to_numpy()
+    
+    n_buckets = max(1, min(buckets, known.nunique()))
+    if n_buckets == 1:
+        labels[known.index] = f"{known.min():.0f}€"
+        return labels.to_numpy()
+    
+    ranges = pd.qcut(known, n_buckets, duplicates='drop')
+    names = [f"{interval.left:.0f}–{interval.right:.0f}€" for interval in ranges.cat.categories]
+    labels[known.index] = [names[code] for code in ranges.cat.codes]
+    
+    # Orden de los rangos por precio, no alfabético
+    return pd.Categorical(labels, categories=names + ['Sin precio'], ordered=True)
+
+
+def aggregate(metrics, by='Dominio', buckets=6):
+    """
+    Media de los atributos de la matriz por grupo (dominio o rango de precio)
+    
+    Devuelve un DataFrame indexado por grupo con una columna `Productos`.
+    """
+    groups = price_buckets(metrics, buckets) if by == 'Rango de precio' else metrics[by]
+    grouped = metrics.groupby(groups, sort=True, observed=True)
+    result = grouped[MATRIX_ATTRIBUTES + ['Completitud']].mean().round(1)
+    result.insert(0, 'Productos', grouped.size())
+    result.index.name = by
+    return result
+
+
+def top_k(metrics, k=6, keep_first=False):
+    """Los `k` productos más completos (opcionalmente, siempre con el primero: la referencia)"""
+    ranked = metrics.sort_values('Completitud', ascending=False)
+    if keep_first and not metrics.empty:
+        ranked = pd.concat([metrics.iloc[[0]], ranked.drop(index=metrics.index[0])])
+    return ranked.head(k)
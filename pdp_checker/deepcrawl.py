@@ -0,0 +1,128 @@
+"""
+Del listado de Google Shopping a las fichas de producto, en un solo paso
+
+`select_targets` limpia los enlaces de los resultados (`_clean_link`), descarta
+los que no llevan a una tienda, los deduplica por URL canónica y aplica los
+límites: N fichas por tienda y un presupuesto total de descargas. `DeepCrawler`
+extrae esas fichas en paralelo, con límite por dominio, y entrega cada resultado
+en cuanto termina con el formato de `iter_url_results`, así que con ellos se
+construye un `AnalysisRun` como el de la pestaña de URLs.
+"""
+
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+from pdp_checker.canonical import canonical_url
+from pdp_checker.runner import fetch_with_retry
+from pdp_checker.throttle import DomainLimiter, interleave_domains
+
+# Hosts que no son tiendas: comparadores y redirecciones de Google
+NON_STORE_LABELS = ('google', 'googleadservices', 'gstatic', 'doubleclick')
+
+
+def store_domain(url):
+    """Dominio de la tienda de `url`, sin `www.`"""
+    netloc = urlparse(url).netloc.lower()
+    return netloc[4:] if netloc.startswith('www.') else netloc
+
+
+def is_store_link(url):
+    """True si `url` es una página http(s) fuera de Google"""
+    parsed = urlparse(url or '')
+    if parsed.scheme not in ('http', 'https') or not parsed.netloc:
+        return False
+    labels = parsed.hostname.split('.') if parsed.hostname else []
+    return not any(label in NON_STORE_LABELS for label in labels)
+
+
+def select_targets(products, clean_link, top_per_store=2, budget=20, our_store=None):
+    """
+    Fichas a descargar a partir de los resultados de Shopping, en orden de ranking
+    
+    `clean_link` es `GoogleShoppingAnalyzer._clean_link`. Con `our_store` (nombre o
+    dominio), el primer resultado de nuestra tienda es la referencia del análisis
+    de gaps y el resto de sus productos se omiten.
+    
+    Returns:
+        list: dicts con role, url, store y listing (el producto de Shopping)
+    """
+    our_store = (our_store or '').strip().lower()
+    targets = []
+    seen = set()
+    per_store = Counter()
+    has_reference = False
+    
+    for product in products:
+        if len(targets) >= budget:
+            break
+        
+        url = clean_link(product.get('link'))
+        if not is_store_link(url):
+            continue
+        url = canonical_url(url)
+        if url in seen:
+            continue
+        
+        store = store_domain(url)
+        is_ours = bool(our_store) and (our_store in store or our_store in (product.get('source') or '').lower())
+        if is_ours and has_reference:
+            continue
+        if per_store[store] >= top_per_store:
+            continue
+        
+        seen.add(url)
+        per_store[store] += 1
+        role = 'reference' if is_ours else 'competitor'
+        has_reference = has_reference or is_ours
+        targets.append({'role': role, 'url': url, 'store': store, 'listing': product})
+    
+    return targets
+
+
+class DeepCrawler:
+    """Extrae en paralelo las fichas de `select_targets`
+    
+    `max_workers` descargas a la vez en total y `per_domain` por dominio, con
+    `delay` segundos entre peticiones al mismo dominio. Cada URL fallida se
+    reintenta una vez rotando cabeceras (como el planificador).
+    """
+    
+    def __init__(self, analyzer, max_workers=4, per_domain=1, delay=0.0, retry=True, use_zenrow=False):
+        self.analyzer = analyzer
+        self.max_workers = max_workers
+        self.domain_limiter = DomainLimiter(per_domain, rate=1.0 / delay if delay else None)
+        self.retry = retry
+        self.use_zenrow = use_zenrow
+    
+    def iter_results(self, targets, journal=None):
+        """
+        Entrega cada resultado en cuanto termina su extracción
+        
+        Yields:
+            dict: index, role, url, data (None si falló), resumed y listing
+        """
+        if not targets:
+            return
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(
+                    fetch_with_retry, self.analyzer, url, self.domain_limiter, self.retry, self.use_zenrow
+                ): i
+                for i, url in interleave_domains([(i, target['url']) for i, target in enumerate(targets)])
+            }
+            for future in as_completed(futures):
+                i = futures[future]
+                target = targets[i]
+                result = {
+                    'index': i,
+                    'role': target['role'],
+                    'url': target['url'],
+                    'data': future.result(),
+                    'resumed': False
+                }
+                if journal is not None:
+                    journal.record(result)
+                result['listing'] = target['listing']
+                yield result
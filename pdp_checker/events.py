@@ -0,0 +1,32 @@
+"""Destinos de eventos del motor (avisos e información para el usuario)
+
+Los analizadores no dependen de ninguna interfaz concreta: notifican a un
+sink, que en la app es Streamlit y en la línea de comandos es `logging`.
+"""
+
+import logging
+
+logger = logging.getLogger('pdp_checker')
+
+
+class EventSink:
+    """Interfaz mínima: cada método recibe un mensaje ya formateado"""
+    
+    def warning(self, message):
+        pass
+    
+    def info(self, message):
+        pass
+
+
+class LoggingEventSink(EventSink):
+    """Envía los eventos al logger `pdp_checker`"""
+    
+    def __init__(self, log=None):
+        self.log = log or logger
+    
+    def warning(self, message):
+        self.log.warning(message)
+    
+    def info(self, message):
+        self.log.info(message)
@@ -0,0 +1,169 @@
+"""
+Exportación de productos por lotes a CSV (gzip), JSONL y Parquet
+
+Los escritores reciben un iterable de (role, product_data) y lo vuelcan a disco
+en bloques de `CHUNK_SIZE` filas, de modo que la memoria no crece con el
+tamaño del run. Se escribe a un fichero temporal y se renombra al terminar.
+"""
+
+import csv
+import gzip
+import io
+import json
+import os
+from itertools import islice
+
+from pdp_checker.store import normalize_price
+
+# Parquet es opcional
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+# Formatos de exportación: extensión -> tipo MIME
+EXPORT_FORMATS = {
+    'csv.gz': 'application/gzip',
+    'jsonl': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+# Columnas del CSV (mismas que la exportación original de la interfaz)
+EXPORT_COLUMNS = [
+    'Tipo', 'URL', 'Dominio', 'Título', 'Descripción', 'Precio', 'Características',
+    'Especificaciones', 'Filtros', 'Categorías', 'Fecha_Extracción'
+]
+
+CHUNK_SIZE = 500
+
+
+def available_formats():
+    """Formatos que se pueden generar con las dependencias instaladas"""
+    return [fmt for fmt in EXPORT_FORMATS if fmt != 'parquet' or PARQUET_AVAILABLE]
+
+
+def export_row(role, data):
+    """Fila plana del CSV para un producto"""
+    return {
+        'Tipo': 'Referencia' if role == 'reference' else 'Competidor',
+        'URL': data.get('url', ''),
+        'Dominio': data.get('domain', ''),
+        'Título': data.get('title', ''),
+        'Descripción': data.get('description', '')[:500],
+        'Precio': data.get('price', ''),
+        'Características': ' | '.join(data.get('features', [])),
+        'Especificaciones': json.dumps(data.get('specifications', {}), ensure_ascii=False),
+        'Filtros': ' | '.join(data.get('filters', [])),
+        'Categorías': ' | '.join(data.get('categories', [])),
+        'Fecha_Extracción': data.get('extracted_at', '')
+    }
+
+
+def iter_chunks(items, size=CHUNK_SIZE):
+    """Listas de como mucho `size` elementos de un iterable"""
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def export_products(products, path, fmt, chunk_size=CHUNK_SIZE):
+    """Escribe (role, product_data) en `path` con el formato indicado; devuelve filas escritas"""
+    writers = {'csv.gz': _write_csv_gz, 'jsonl': _write_jsonl, 'parquet': _write_parquet}
+    if fmt not in writers:
+        raise ValueError(f"Formato de exportación desconocido: {fmt}")
+    if fmt == 'parquet' and not PARQUET_AVAILABLE:
+        raise ValueError("La exportación a Parquet necesita pyarrow")
+    
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    
+    tmp_path = path + '.tmp'
+    try:
+        count = writers[fmt](iter_chunks(products, chunk_size), tmp_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+    return count
+
+
+def _write_csv_gz(chunks, path):
+    count = 0
+    with gzip.open(path, 'wt', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=EXPORT_COLUMNS)
+        writer.writeheader()
+        for chunk in chunks:
+            writer.writerows(export_row(role, data) for role, data in chunk)
+            count += len(chunk)
+    return count
+
+
+def _write_jsonl(chunks, path):
+    """Una línea por producto con el `product_data` completo (sin recortar)"""
+    count = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        for chunk in chunks:
+            buffer = io.StringIO()
+            for role, data in chunk:
+                buffer.write(json.dumps({'role': role, 'product': data}, ensure_ascii=False) + '\n')
+            f.write(buffer.getvalue())
+            count += len(chunk)
+    return count
+
+
+def parquet_schema():
+    """Esquema Parquet: listas para características, filtros, categorías e imágenes y mapa para specs"""
+    return pa.schema([
+        ('role', pa.string()),
+        ('url', pa.string()),
+        ('domain', pa.string()),
+        ('title', pa.string()),
+        ('description', pa.string()),
+        ('price_text', pa.string()),
+        ('price', pa.float64()),
+        ('features', pa.list_(pa.string())),
+        ('specifications', pa.map_(pa.string(), pa.string())),
+        ('filters', pa.list_(pa.string())),
+        ('categories', pa.list_(pa.string())),
+        ('images', pa.list_(pa.string())),
+        ('extracted_at', pa.string()),
+        ('changed', pa.bool_()),
+    ])
+
+
+def _parquet_row(role, data):
+    return {
+        'role': role,
+        'url': data.get('url', ''),
+        'domain': data.get('domain', ''),
+        'title': data.get('title', ''),
+        'description': data.get('description', ''),
+        'price_text': data.get('price', ''),
+        'price': normalize_price(data.get('price')),
+        'features': [str(item) for item in data.get('features', [])],
+        'specifications': [(str(key), str(value)) for key, value in data.get('specifications', {}).items()],
+        'filters': [str(item) for item in data.get('filters', [])],
+        'categories': [str(item) for item in data.get('categories', [])],
+        'images': [str(item) for item in data.get('images', [])],
+        'extracted_at': data.get('extracted_at', ''),
+        'changed': data.get('changed'),
+    }
+
+
+def _write_parquet(chunks, path):
+    """Un row group por bloque"""
+    schema = parquet_schema()
+    count = 0
+    with pq.ParquetWriter(path, schema, compression='zstd') as writer:
+        for chunk in chunks:
+            rows = [_parquet_row(role, data) for role, data in chunk]
+            writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+            count += len(chunk)
+    return count
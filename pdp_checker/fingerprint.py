@@ -0,0 +1,112 @@
+"""Huellas de contenido (SimHash) para detectar páginas sin cambios entre crawls"""
+
+import hashlib
+import html
+import json
+import re
+
+# Bits de la huella y distancia de Hamming máxima para considerar "sin cambios"
+FINGERPRINT_BITS = 64
+DEFAULT_THRESHOLD = 3
+
+# Campos que definen el contenido de la ficha (para detectar cambios)
+CONTENT_FIELDS = ('title', 'description', 'features', 'specifications', 'price')
+
+_INVISIBLE_RE = re.compile(r'<(script|style|noscript|template)\b.*?</\1\s*>|<!--.*?-->', re.IGNORECASE | re.DOTALL)
+_TAG_RE = re.compile(r'<[^>]+>')
+
+# Tokens dinámicos que cambian en cada visita sin que cambie el producto
+_DYNAMIC_TOKEN_RES = [
+    re.compile(r'\b\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:?\d{2})?)?\b'),  # fechas ISO
+    re.compile(r'\b\d{1,2}[/.]\d{1,2}[/.]\d{2,4}\b'),  # fechas dd/mm/aaaa
+    re.compile(r'\b\d{1,2}:\d{2}(?::\d{2})?\b'),  # horas
+    re.compile(r'\b\d{10,13}\b'),  # timestamps unix
+    re.compile(r'\b(?=[a-z0-9_-]*\d)(?=[a-z0-9_-]*[a-z])[a-z0-9_-]{16,}\b', re.IGNORECASE),  # ids de sesión, tokens
+    re.compile(r'\b[0-9a-f]{8,}\b', re.IGNORECASE),  # hashes hex
+]
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+# Números del texto (precios, tallas, stock): "1.299,99", "49", "4.5"
+_NUMBER_RE = re.compile(r'\d+(?:[.,]\d+)*')
+# Etiquetas <meta> de precio (itemprop="price", product:price:amount): no son texto visible
+_PRICE_META_RE = re.compile(r'<meta\b[^>]*price[^>]*>', re.IGNORECASE)
+
+
+def visible_text(raw_html):
+    """Texto visible de un HTML sin construir el árbol (regex, barato)"""
+    text = _INVISIBLE_RE.sub(' ', raw_html)
+    text = _TAG_RE.sub(' ', text)
+    return html.unescape(text)
+
+
+def normalize_text(text):
+    """Texto en minúsculas sin tokens dinámicos (fechas, horas, ids de sesión)"""
+    for pattern in _DYNAMIC_TOKEN_RES:
+        text = pattern.sub(' ', text)
+    return text.lower()
+
+
+def simhash(text, bits=FINGERPRINT_BITS, shingle_size=3):
+    """SimHash de `text` sobre shingles de palabras"""
+    words = _WORD_RE.findall(text)
+    if not words:
+        return 0
+    
+    if len(words) < shingle_size:
+        shingles = [' '.join(words)]
+    else:
+        shingles = [' '.join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)]
+    
+    weights = [0] * bits
+    for shingle in shingles:
+        value = int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=bits // 8).digest(), 'big')
+        for bit in range(bits):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    
+    fingerprint = 0
+    for bit in range(bits):
+        if weights[bit] > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def page_fingerprint(raw_html):
+    """Huella de una página a partir de su HTML crudo"""
+    return simhash(normalize_text(visible_text(raw_html)))
+
+
+def numbers_hash(text):
+    """Hash de la secuencia de números de `text`"""
+    return hashlib.sha1(' '.join(_NUMBER_RE.findall(text)).encode('utf-8')).hexdigest()
+
+
+def page_signature(raw_html):
+    """
+    (huella, hash de números) de una página a partir de su HTML crudo
+    
+    Un cambio de precio mueve muy pocos bits del SimHash y queda dentro del
+    umbral, así que los números del texto visible y de las etiquetas <meta> de
+    precio se comparan aparte, de forma exacta. Ambos salen del mismo texto
+    normalizado (sin fechas, horas ni timestamps), sin construir el árbol.
+    """
+    text = normalize_text(visible_text(raw_html))
+    meta = ' '.join(_PRICE_META_RE.findall(raw_html))
+    return simhash(text), numbers_hash(text + ' ' + meta)
+
+
+def hamming_distance(a, b):
+    """Número de bits distintos entre dos huellas"""
+    return bin(a ^ b).count('1')
+
+
+def is_unchanged(fingerprint, previous, threshold=DEFAULT_THRESHOLD):
+    """True si ambas huellas están a `threshold` bits o menos"""
+    if fingerprint is None or previous is None:
+        return False
+    return hamming_distance(fingerprint, previous) <= threshold
+
+
+def content_hash(product):
+    """Hash estable del contenido relevante de una ficha"""
+    payload = json.dumps({field: product.get(field) for field in CONTENT_FIELDS}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
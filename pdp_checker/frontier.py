@@ -0,0 +1,243 @@
+"""
+Descubrimiento de fichas a partir de páginas de categoría de la competencia
+
+`parse_listing` saca de una página de listado los enlaces a fichas (por patrón
+de URL o por tarjeta de producto con precio), la página siguiente y, si se
+pide, las subcategorías. `CategoryFrontier` recorre esas páginas en anchura
+desde las URLs semilla con límites de profundidad, de páginas y de fichas, y un
+límite de peticiones por dominio compartido con las extracciones. Las fichas se
+deduplican por URL canónica y pasan a extraerse en cuanto aparecen, sin esperar
+a terminar el recorrido.
+"""
+
+import re
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urljoin, urlparse
+
+from bs4 import BeautifulSoup
+
+from pdp_checker.analyzer import release_soup
+from pdp_checker.canonical import canonical_url
+from pdp_checker.runner import fetch_with_retry
+from pdp_checker.throttle import DomainLimiter
+
+# Rutas típicas de ficha: /dp/ASIN, /itm/ID, /item/ID.html, /p/..., /producto/..., -p-12345
+PRODUCT_PATH_RE = re.compile(
+    r'/(?:dp|itm|item|p|product|products|producto|productos|articulo|articulos)/'
+    r'|[-_/]p[-_]?\d{4,}(?:\.html?)?$'
+    r'|\d{6,}\.html?$',
+    re.IGNORECASE
+)
+
+# Rutas que nunca son fichas ni listados
+SKIP_PATH_RE = re.compile(
+    r'/(?:cart|carrito|cesta|basket|checkout|login|signin|registro|account|cuenta|mi-cuenta|wishlist|'
+    r'help|ayuda|contacto|contact|legal|privacidad|cookies)(?:/|$)',
+    re.IGNORECASE
+)
+
+# Contenedores de tarjeta de producto en un listado
+CARD_SELECTORS = (
+    '[itemtype*="schema.org/Product"]',
+    '[data-product-id]',
+    '[data-sku]',
+    '[data-asin]',
+    '[class*="product"]',
+    '[class*="card"]',
+    '[class*="tile"]',
+    '[class*="item"]',
+    'article'
+)
+
+# Enlaces a la página siguiente del listado
+NEXT_SELECTORS = (
+    'link[rel="next"]',
+    'a[rel="next"]',
+    'a[aria-label*="next" i]',
+    'a[aria-label*="siguiente" i]',
+    '[class*="pagination"] a[class*="next"]',
+    '[class*="pager"] a[class*="next"]'
+)
+NEXT_TEXTS = ('siguiente', 'página siguiente', 'next', 'next page', '›', '»', '>')
+
+SUBCATEGORY_SELECTORS = ('[class*="subcat"] a', '[class*="categor"] a')
+
+PRICE_RE = re.compile(r'\d[\d.,]*\s?(?:€|\$|£|eur\b)|(?:€|\$|£)\s?\d', re.IGNORECASE)
+
+# Una tarjeta enlaza a su ficha (imagen y título) y poco más; si enlaza a más
+# URLs distintas es un contenedor de varias tarjetas
+MAX_CARD_LINKS = 2
+
+
+def _site(netloc):
+    return netloc[4:] if netloc.startswith('www.') else netloc
+
+
+def _same_site_url(href, page_url):
+    """URL canónica de `href` si es una página del mismo sitio que `page_url`, o None"""
+    if not href or href.startswith(('#', 'javascript:', 'mailto:', 'tel:')):
+        return None
+    url = urljoin(page_url, href)
+    parsed = urlparse(url)
+    if parsed.scheme not in ('http', 'https') or SKIP_PATH_RE.search(parsed.path):
+        return None
+    if _site(parsed.netloc.lower()) != _site(urlparse(page_url).netloc.lower()):
+        return None
+    return canonical_url(url)
+
+
+def is_product_url(url):
+    """True si la ruta de `url` tiene forma de ficha de producto"""
+    return bool(PRODUCT_PATH_RE.search(urlparse(url).path))
+
+
+def parse_listing(html, page_url, subcategories=False):
+    """
+    Enlaces de una página de listado o categoría
+    
+    Returns:
+        tuple: (fichas, páginas siguientes, subcategorías), listas de URLs canónicas
+        sin repetidas
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    products = {}
+    
+    for anchor in soup.select('a[href]'):
+        url = _same_site_url(anchor['href'], page_url)
+        if url and is_product_url(url):
+            products[url] = None
+    
+    # Tarjetas con precio cuyas fichas no tienen una ruta reconocible
+    for card in soup.select(', '.join(CARD_SELECTORS)):
+        if card.find_parent(['nav', 'header', 'footer']):
+            continue
+        links = {_same_site_url(anchor['href'], page_url) for anchor in card.select('a[href]')} - {None}
+        if 0 < len(links) <= MAX_CARD_LINKS and PRICE_RE.search(card.get_text(' ', strip=True)):
+            for url in links:
+                products[url] = None
+    
+    next_pages = {}
+    for element in soup.select(', '.join(NEXT_SELECTORS)):
+        url = _same_site_url(element.get('href'), page_url)
+        if url:
+            next_pages[url] = None
+    if not next_pages:
+        for anchor in soup.select('a[href]'):
+            if anchor.get_text(strip=True).lower() in NEXT_TEXTS:
+                url = _same_site_url(anchor['href'], page_url)
+                if url:
+                    next_pages[url] = None
+    
+    children = {}
+    if subcategories:
+        # Solo categorías por debajo de la actual: las migas de pan no suben
+        base_path = urlparse(page_url).path.rstrip('/') + '/'
+        for anchor in soup.select(', '.join(SUBCATEGORY_SELECTORS)):
+            url = _same_site_url(anchor['href'], page_url)
+            if url and url not in products and urlparse(url).path.startswith(base_path):
+                children[url] = None
+    
+    release_soup(soup)
+    page = canonical_url(page_url)
+    return (
+        [url for url in products if url != page],
+        [url for url in next_pages if url != page],
+        [url for url in children if url != page and url not in next_pages]
+    )
+
+
+class CategoryFrontier:
+    """Recorrido acotado de páginas de categoría que entrega las fichas encontradas
+    
+    `max_depth` saltos (página siguiente o subcategoría) desde cada semilla,
+    `max_pages` listados descargados y `max_products` fichas en total. `seen`
+    (cualquier contenedor con `in` y `add`, por defecto un `set`) guarda las URLs
+    canónicas ya vistas; pasar uno compartido evita repetir fichas entre
+    recorridos. Listados y fichas comparten el límite por dominio.
+    """
+    
+    def __init__(self, analyzer, max_depth=3, max_pages=20, max_products=200, subcategories=False,
+                 max_workers=4, per_domain=1, delay=0.0, retry=True, use_zenrow=False, seen=None):
+        self.analyzer = analyzer
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.max_products = max_products
+        self.subcategories = subcategories
+        self.max_workers = max_workers
+        self.domain_limiter = DomainLimiter(per_domain, rate=1.0 / delay if delay else None)
+        self.retry = retry
+        self.use_zenrow = use_zenrow
+        self.seen = set() if seen is None else seen
+        self.stats = {'pages': 0, 'failed_pages': 0, 'products': 0, 'duplicates': 0}
+    
+    def iter_product_urls(self, seeds):
+        """Entrega (URL canónica de ficha, listado donde apareció) según se descubren"""
+        queue = deque()
+        for url in seeds:
+            url = canonical_url(url)
+            if url not in self.seen:
+                self.seen.add(url)
+                queue.append((url, 0))
+        
+        while queue and self.stats['pages'] < self.max_pages and self.stats['products'] < self.max_products:
+            page_url, depth = queue.popleft()
+            self.stats['pages'] += 1
+            with self.domain_limiter.slot(urlparse(page_url).netloc):
+                html = self.analyzer.fetch_page(page_url, use_zenrow=self.use_zenrow)
+            if html is None:
+                self.stats['failed_pages'] += 1
+                continue
+            
+            with self.analyzer.tracer.span('listing.parse', page_url):
+                products, next_pages, children = parse_listing(html, page_url, self.subcategories)
+            
+            for url in products:
+                if url in self.seen:
+                    self.stats['duplicates'] += 1
+                    continue
+                if self.stats['products'] >= self.max_products:
+                    break
+                self.seen.add(url)
+                self.stats['products'] += 1
+                yield url, page_url
+            
+            if depth < self.max_depth:
+                for url in next_pages + children:
+                    if url not in self.seen:
+                        self.seen.add(url)
+                        queue.append((url, depth + 1))
+    
+    def iter_results(self, seeds):
+        """
+        Extrae en paralelo las fichas descubiertas mientras sigue el recorrido
+        
+        Yields:
+            dict: index, role ('competitor'), url, data (None si falló), resumed y
+            listing (la página donde apareció)
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = {}
+            
+            def finished(futures):
+                for future in futures:
+                    index, url, listing = pending.pop(future)
+                    yield {
+                        'index': index,
+                        'role': 'competitor',
+                        'url': url,
+                        'data': future.result(),
+                        'resumed': False,
+                        'listing': listing
+                    }
+            
+            for index, (url, listing) in enumerate(self.iter_product_urls(seeds)):
+                future = executor.submit(
+                    fetch_with_retry, self.analyzer, url, self.domain_limiter, self.retry, self.use_zenrow
+                )
+                pending[future] = (index, url, listing)
+                yield from finished([f for f in list(pending) if f.done()])
+            
+            while pending:
+                done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                yield from finished(done)
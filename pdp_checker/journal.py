@@ -0,0 +1,180 @@
+"""Journal de runs: persiste cada resultado de URL en cuanto termina para poder reanudar"""
+
+import hashlib
+import json
+import os
+import re
+from datetime import datetime
+
+# Cabecera de una línea `result` tal como la escribe `record`: url y estado sin
+# decodificar el `data` que viene detrás
+RESULT_PREFIX_RE = re.compile(
+    r'^\{"event": "result", "role": "(?:[^"\\]|\\.)*", "url": ("(?:[^"\\]|\\.)*"), "status": "(\w+)"'
+)
+
+
+def new_run_id(all_urls):
+    """Id legible y único: fecha + hash corto de las URLs"""
+    digest = hashlib.sha1('\n'.join(url for _, url in all_urls).encode('utf-8')).hexdigest()[:6]
+    return f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{digest}"
+
+
+class RunJournal:
+    """Fichero JSONL append-only con la definición del run y un registro por URL
+    
+    La primera línea (`event: start`) guarda las URLs y sus roles; cada línea
+    posterior (`event: result`) guarda el resultado de una URL. Si una URL
+    aparece varias veces (reintentos en otra sesión), vale el último registro.
+    """
+    
+    def __init__(self, runs_dir, run_id):
+        self.runs_dir = runs_dir
+        self.run_id = run_id
+        self.path = os.path.join(runs_dir, f"run_{run_id}.jsonl")
+        self.all_urls = []
+        self.results = {}
+        self.created_at = None
+    
+    @classmethod
+    def create(cls, runs_dir, all_urls, run_id=None):
+        """Crea un journal nuevo con la lista de URLs del run"""
+        journal = cls(runs_dir, run_id or new_run_id(all_urls))
+        journal.all_urls = list(all_urls)
+        journal.created_at = datetime.now().isoformat()
+        
+        os.makedirs(runs_dir, exist_ok=True)
+        journal._append({
+            'event': 'start',
+            'run_id': journal.run_id,
+            'created_at': journal.created_at,
+            'urls': [[role, url] for role, url in journal.all_urls]
+        })
+        return journal
+    
+    @classmethod
+    def load(cls, runs_dir, run_id):
+        """Carga un journal existente"""
+        journal = cls(runs_dir, run_id)
+        
+        with open(journal.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Línea truncada por una interrupción
+                    continue
+                
+                if record.get('event') == 'start':
+                    journal.all_urls = [tuple(item) for item in record.get('urls', [])]
+                    journal.created_at = record.get('created_at')
+                elif record.get('event') == 'result':
+                    journal.results[record['url']] = record
+        
+        return journal
+    
+    @classmethod
+    def read_urls(cls, runs_dir, run_id):
+        """Solo la lista (role, url) del run, sin cargar los resultados"""
+        with open(cls(runs_dir, run_id).path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get('event') == 'start':
+                    return [tuple(item) for item in record.get('urls', [])]
+        return []
+    
+    def record(self, result):
+        """Guarda el resultado de una URL (dict de `iter_url_results`)"""
+        record = {
+            'event': 'result',
+            'role': result['role'],
+            'url': result['url'],
+            'status': 'ok' if result['data'] else 'failed',
+            'data': result['data'],
+            'recorded_at': datetime.now().isoformat()
+        }
+        self.results[result['url']] = record
+        self._append(record)
+    
+    @classmethod
+    def read_summary(cls, runs_dir, run_id):
+        """Lo mismo que `load(...).summary()` pero sin decodificar los datos de cada resultado"""
+        journal = cls(runs_dir, run_id)
+        statuses = {}
+        with open(journal.path, encoding='utf-8') as f:
+            for line in f:
+                match = RESULT_PREFIX_RE.match(line)
+                # Una línea truncada no termina en `}`: se ignora, igual que en `load`
+                if match and line.rstrip().endswith('}'):
+                    statuses[json.loads(match.group(1))] = match.group(2)
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get('event') == 'start':
+                    journal.all_urls = [tuple(item) for item in record.get('urls', [])]
+                    journal.created_at = record.get('created_at')
+                elif record.get('event') == 'result':
+                    statuses[record['url']] = record.get('status')
+        return journal._summarize(statuses)
+    
+    def completed(self, url):
+        """Datos ya extraídos de una URL, o None si está pendiente o falló"""
+        record = self.results.get(url)
+        if record and record.get('status') == 'ok':
+            return record.get('data')
+        return None
+    
+    def pending_urls(self):
+        """URLs sin resultado correcto (pendientes o fallidas)"""
+        return [(role, url) for role, url in self.all_urls if self.completed(url) is None]
+    
+    def summary(self):
+        """Contadores del run para mostrar en listados"""
+        return self._summarize({url: record.get('status') for url, record in self.results.items()})
+    
+    def _summarize(self, statuses):
+        ok = sum(1 for _, url in self.all_urls if statuses.get(url) == 'ok')
+        failed = sum(1 for _, url in self.all_urls if url in statuses and statuses[url] != 'ok')
+        return {
+            'run_id': self.run_id,
+            'created_at': self.created_at,
+            'total': len(self.all_urls),
+            'ok': ok,
+            'failed': failed,
+            'pending': len(self.all_urls) - ok - failed
+        }
+    
+    def _append(self, record):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            f.flush()
+
+
+def list_runs(runs_dir, only_incomplete=False, limit=None):
+    """
+    Resúmenes de los runs guardados, del más reciente al más antiguo
+    
+    Con `limit` solo se leen los `limit` journals más recientes.
+    """
+    if not os.path.isdir(runs_dir):
+        return []
+    
+    names = sorted(
+        (name for name in os.listdir(runs_dir) if name.startswith('run_') and name.endswith('.jsonl')),
+        reverse=True
+    )
+    runs = []
+    for name in names[:limit]:
+        try:
+            summary = RunJournal.read_summary(runs_dir, name[len('run_'):-len('.jsonl')])
+        except OSError:
+            continue
+        if only_incomplete and summary['ok'] == summary['total']:
+            continue
+        runs.append(summary)
+    
+    return runs
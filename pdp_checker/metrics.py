@@ -0,0 +1,256 @@
+"""
+Métricas acumuladas de salud del scraping, en formato de texto de Prometheus
+
+A diferencia de las trazas (`trace.py`), que describen un run, estas métricas se
+acumulan mientras vive el proceso: peticiones por dominio y código de estado,
+reintentos, escaladas anti-bloqueo, llamadas a ZenRows, bytes descargados y
+latencias de descarga y extracción. Se exponen en un endpoint HTTP (`serve`) o se
+escriben a un fichero (`write`) para el textfile collector de node_exporter.
+
+Ejemplos de alertas: `rate(pdp_requests_total{status="403"}[15m]) /
+rate(pdp_requests_total[15m])` por dominio, o el p95 de
+`pdp_extraction_seconds_bucket` para dimensionar el pool de workers.
+"""
+
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Límites (segundos) de los histogramas de latencia
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """Contador monótono con etiquetas"""
+    
+    kind = 'counter'
+    
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values = {}
+    
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labels)
+        self.values[key] = self.values.get(key, 0) + amount
+    
+    def render(self):
+        lines = []
+        for key, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Histograma de buckets acumulados con etiquetas"""
+    
+    kind = 'histogram'
+    
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self.values = {}
+    
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labels)
+        counts, total = self.values.get(key, ([0] * len(self.buckets), 0.0))
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+        self.values[key] = (counts, total + value)
+    
+    def render(self):
+        lines = []
+        for key, (counts, total) in sorted(self.values.items()):
+            for bound, count in zip(self.buckets, counts):
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(round(total, 6))}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {counts[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    """Conjunto de métricas con un único lock; `render()` da el texto de Prometheus"""
+    
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.metrics = []
+        self._lock = threading.Lock()
+    
+    def counter(self, name, help, labels=()):
+        metric = Counter(name, help, labels)
+        self.metrics.append(metric)
+        return metric
+    
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help, labels, buckets)
+        self.metrics.append(metric)
+        return metric
+    
+    def inc(self, metric, amount=1, **labels):
+        if not self.enabled:
+            return
+        with self._lock:
+            metric.inc(amount, **labels)
+    
+    def observe(self, metric, value, **labels):
+        if not self.enabled:
+            return
+        with self._lock:
+            metric.observe(value, **labels)
+    
+    def render(self):
+        lines = []
+        with self._lock:
+            for metric in self.metrics:
+                lines.append(f"# HELP {metric.name} {metric.help}")
+                lines.append(f"# TYPE {metric.name} {metric.kind}")
+                lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+    
+    def write(self, path):
+        """Escribe las métricas de forma atómica (para el textfile collector)"""
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+    
+    def serve(self, port, host='127.0.0.1'):
+        """Sirve `/metrics` en un hilo; devuelve el servidor (`server.shutdown()` lo para)"""
+        registry = self
+        
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+            
+            def do_GET(self):
+                if urlparse(self.path).path not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+        
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+class ScrapeMetrics(MetricsRegistry):
+    """Métricas de descarga y extracción de fichas y búsquedas, por dominio"""
+    
+    def __init__(self, enabled=True):
+        super().__init__(enabled)
+        self.requests = self.counter(
+            'pdp_requests_total', "Peticiones HTTP por dominio y código de estado ('error' si no hubo respuesta)",
+            ('domain', 'status')
+        )
+        self.downloaded = self.counter('pdp_downloaded_bytes_total', "Bytes descargados por dominio", ('domain',))
+        self.zenrow = self.counter('pdp_zenrow_requests_total', "Llamadas a la API de ZenRows por código de estado", ('status',))
+        self.retries = self.counter('pdp_retries_total', "URLs reintentadas tras una extracción fallida", ('domain',))
+        self.escalations = self.counter(
+            'pdp_escalations_total', "Reintentos con otras cabeceras tras un 403, por estrategia", ('domain', 'strategy')
+        )
+        self.extractions = self.counter(
+            'pdp_extractions_total', "Extracciones por dominio y resultado (ok, unchanged, cached, failed)",
+            ('domain', 'result')
+        )
+        self.fetch_seconds = self.histogram('pdp_fetch_seconds', "Duración de cada petición HTTP", ('domain',))
+        self.extraction_seconds = self.histogram(
+            'pdp_extraction_seconds', "Duración de la extracción completa de una URL (descarga incluida)", ('domain',)
+        )
+    
+    def record_response(self, url, response, seconds, zenrow=False):
+        """Petición completada (`response` de `requests`) o fallida sin respuesta (`None`)"""
+        if not self.enabled:
+            return
+        domain = urlparse(url).netloc
+        status = response.status_code if response is not None else 'error'
+        with self._lock:
+            self.requests.inc(domain=domain, status=status)
+            self.fetch_seconds.observe(seconds, domain=domain)
+            if response is not None:
+                self.downloaded.inc(len(response.content), domain=domain)
+            if zenrow:
+                self.zenrow.inc(status=status)
+    
+    def record_retry(self, url):
+        self.inc(self.retries, domain=urlparse(url).netloc)
+    
+    def record_escalation(self, url, strategy):
+        self.inc(self.escalations, domain=urlparse(url).netloc, strategy=strategy)
+    
+    def record_extraction(self, url, result, seconds):
+        if not self.enabled:
+            return
+        domain = urlparse(url).netloc
+        with self._lock:
+            self.extractions.inc(domain=domain, result=result)
+            self.extraction_seconds.observe(seconds, domain=domain)
+    
+    def domain_summary(self):
+        """Filas por dominio: peticiones, % de 403, reintentos, escaladas, bytes y extracciones"""
+        rows = {}
+        
+        def row(domain):
+            return rows.setdefault(domain, {
+                'domain': domain, 'requests': 0, 'blocked': 0, 'blocked_pct': 0.0, 'errors': 0, 'retries': 0,
+                'escalations': 0, 'bytes': 0, 'extractions': 0, 'failed': 0
+            })
+        
+        with self._lock:
+            for (domain, status), count in self.requests.values.items():
+                row(domain)['requests'] += count
+                if status == '403':
+                    row(domain)['blocked'] += count
+                elif status == 'error' or status.startswith(('4', '5')):
+                    row(domain)['errors'] += count
+            for (domain,), count in self.retries.values.items():
+                row(domain)['retries'] += count
+            for (domain, _), count in self.escalations.values.items():
+                row(domain)['escalations'] += count
+            for (domain,), count in self.downloaded.values.items():
+                row(domain)['bytes'] += count
+            for (domain, result), count in self.extractions.values.items():
+                row(domain)['extractions'] += count
+                if result == 'failed':
+                    row(domain)['failed'] += count
+        
+        for values in rows.values():
+            if values['requests']:
+                values['blocked_pct'] = round(100 * values['blocked'] / values['requests'], 1)
+        return sorted(rows.values(), key=lambda values: -values['requests'])
+
+
+# Métricas desactivadas por defecto de los analizadores
+NULL_METRICS = ScrapeMetrics(enabled=False)
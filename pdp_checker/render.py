@@ -0,0 +1,121 @@
+"""Renderizado de imágenes estáticas (nubes de palabras) en segundo plano y con caché"""
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import io
+import json
+import threading
+
+# WordCloud es opcional
+try:
+    from wordcloud import WordCloud
+    WORDCLOUD_AVAILABLE = True
+except ImportError:
+    WORDCLOUD_AVAILABLE = False
+
+# Límites de tamaño y resolución de cualquier imagen renderizada
+MAX_WIDTH = 1600
+MAX_HEIGHT = 1000
+MAX_WORDS = 200
+
+
+def render_wordcloud_png(frequencies, width=800, height=400, max_words=100,
+                         background='white', colormap='viridis'):
+    """PNG de una nube de palabras a partir de pares (término, frecuencia)"""
+    wordcloud = WordCloud(
+        width=max(100, min(int(width), MAX_WIDTH)),
+        height=max(100, min(int(height), MAX_HEIGHT)),
+        max_words=max(1, min(int(max_words), MAX_WORDS)),
+        background_color=background,
+        colormap=colormap
+    )
+    wordcloud.generate_from_frequencies(dict(frequencies))
+    
+    # Directamente a PIL: sin matplotlib, que no es seguro fuera del hilo principal
+    buffer = io.BytesIO()
+    wordcloud.to_image().save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+
+class ImageRenderService:
+    """Cola de renderizado en hilos de fondo con caché de PNG por contenido
+    
+    `request()` devuelve al momento la key de la imagen: si ya está en caché no
+    hace nada más y, si no, encarga el render (una sola vez aunque se pida
+    varias veces). `get()` devuelve los bytes cuando están listos. Las imágenes
+    se guardan por hash de los datos y opciones, con expulsión LRU.
+    """
+    
+    def __init__(self, max_workers=1, max_entries=64):
+        self.max_entries = max_entries
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='pdp-render')
+        self._images = OrderedDict()
+        self._pending = {}
+        self._errors = {}
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def make_key(kind, data, options):
+        """Hash estable de tipo de imagen, datos y opciones"""
+        payload = json.dumps([kind, data, options], sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+    
+    def request(self, kind, render, data, **options):
+        """Encarga `render(data, **options)` si la imagen no está ya hecha o en curso"""
+        key = self.make_key(kind, data, options)
+        
+        with self._lock:
+            if key in self._images:
+                self._images.move_to_end(key)
+                return key
+            if key in self._pending:
+                return key
+            self._errors.pop(key, None)
+            self._pending[key] = self._executor.submit(self._render, key, render, data, options)
+        
+        return key
+    
+    def request_wordcloud(self, frequencies, **options):
+        """Nube de palabras de un Counter o de pares (término, frecuencia)"""
+        if hasattr(frequencies, 'most_common'):
+            frequencies = frequencies.most_common(MAX_WORDS)
+        data = [[term, count] for term, count in list(frequencies)[:MAX_WORDS]]
+        return self.request('wordcloud', render_wordcloud_png, data, **options)
+    
+    def get(self, key):
+        """Bytes PNG de la imagen, o None si aún no está lista"""
+        with self._lock:
+            return self._images.get(key)
+    
+    def error(self, key):
+        """Mensaje de error si el render falló"""
+        with self._lock:
+            return self._errors.get(key)
+    
+    def wait(self, key, timeout=None):
+        """Espera como mucho `timeout` segundos a que la imagen esté lista"""
+        with self._lock:
+            future = self._pending.get(key)
+        if future is not None:
+            try:
+                future.result(timeout=timeout)
+            except Exception:
+                pass
+        return self.get(key)
+    
+    def _render(self, key, render, data, options):
+        try:
+            image = render(data, **options)
+        except Exception as e:
+            with self._lock:
+                self._errors[key] = str(e)
+                self._pending.pop(key, None)
+            return
+        
+        with self._lock:
+            self._images[key] = image
+            self._images.move_to_end(key)
+            while len(self._images) > self.max_entries:
+                self._images.popitem(last=False)
+            self._pending.pop(key, None)
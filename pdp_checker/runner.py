@@ -0,0 +1,199 @@
+"""Ejecución de un análisis de URLs: lectura de entradas, fetch + extracción y agrupación"""
+
+import re
+import time
+from datetime import datetime
+from urllib.parse import urlparse
+
+from pdp_checker.canonical import dedupe_urls
+from pdp_checker.trace import NULL_TRACER
+
+# Roles válidos de una URL dentro de un análisis
+ROLES = ('reference', 'competitor')
+
+# `rol,url`, `rol;url` o `rol url`
+ROLE_LINE_RE = re.compile(r'^(reference|competitor)\s*[,;\s]\s*(\S+)$', re.IGNORECASE)
+
+
+def parse_url_lines(text, default_role='competitor'):
+    """
+    Convierte un listado de URLs en una lista de tuplas (role, url)
+    
+    Cada línea puede ser una URL sola (rol por defecto) o `rol,url` / `rol url`
+    con rol `reference` o `competitor`; las líneas que no son URLs (cabeceras,
+    comentarios) se ignoran.
+    Solo se conserva la primera URL de referencia. Las URLs se devuelven en su
+    forma canónica y sin repetidas (ver `canonical.dedupe_urls`).
+    """
+    all_urls = []
+    has_reference = False
+    
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        
+        match = ROLE_LINE_RE.match(line)
+        if match:
+            role, url = match.group(1).lower(), match.group(2)
+        else:
+            role, url = default_role, line
+        
+        if not url.startswith(('http://', 'https://')):
+            continue
+        
+        if role == 'reference':
+            if has_reference:
+                role = 'competitor'
+            has_reference = True
+        
+        all_urls.append((role, url))
+    
+    all_urls, _ = dedupe_urls(all_urls)
+    # La referencia siempre va primero
+    all_urls.sort(key=lambda item: item[0] != 'reference')
+    return all_urls
+
+
+def read_url_file(path, default_role='competitor'):
+    """Lee un fichero de URLs (ver `parse_url_lines`)"""
+    with open(path, encoding='utf-8') as f:
+        return parse_url_lines(f.read(), default_role)
+
+
+def iter_url_results(analyzer, all_urls, delay=2.0, aggressive_mode=False, retry_403=True,
+                     rotate_headers=False, use_zenrow=False, on_retry=None, journal=None,
+                     sleep=time.sleep):
+    """
+    Procesa las URLs en orden y entrega un resultado por URL en cuanto termina
+    
+    Aplica el delay entre peticiones y, si `retry_403` está activo, un segundo
+    intento con rotación de headers para las URLs que fallan. Con `journal`, cada
+    resultado se persiste al terminar y las URLs ya completadas en ese run se
+    entregan desde el journal sin volver a pedirlas.
+    
+    Yields:
+        dict: {'index', 'role', 'url', 'data', 'resumed'} con `data` None si la extracción falló
+    """
+    fetched_any = False
+    
+    for i, (url_type, url) in enumerate(all_urls):
+        if journal is not None:
+            data = journal.completed(url)
+            # Una extracción guardada con otro plan de campos se vuelve a hacer
+            if data is not None and analyzer.covers(data):
+                yield {'index': i, 'role': url_type, 'url': url, 'data': data, 'resumed': True}
+                continue
+        
+        if fetched_any:
+            sleep(delay * 1.5 if aggressive_mode else delay)
+        fetched_any = True
+        
+        data = analyzer.extract_content_from_url(url, rotate_headers, use_zenrow)
+        
+        # Retry si está habilitado
+        if not data and retry_403:
+            if on_retry:
+                on_retry(i, url_type, url)
+            sleep(5)
+            analyzer.metrics.record_retry(url)
+            data = analyzer.extract_content_from_url(url, True, use_zenrow)
+        
+        result = {'index': i, 'role': url_type, 'url': url, 'data': data, 'resumed': False}
+        if journal is not None:
+            journal.record(result)
+        
+        yield result
+
+
+def fetch_with_retry(analyzer, url, domain_limiter, retry=True, use_zenrow=False):
+    """Extrae `url` con una plaza de su dominio; si falla, reintenta una vez rotando cabeceras"""
+    domain = urlparse(url).netloc
+    with domain_limiter.slot(domain):
+        data = analyzer.extract_content_from_url(url, use_zenrow=use_zenrow)
+    if not data and retry:
+        analyzer.metrics.record_retry(url)
+        with domain_limiter.slot(domain):
+            data = analyzer.extract_content_from_url(url, rotate_headers=True, use_zenrow=use_zenrow)
+    return data
+
+
+def split_results(results):
+    """
+    Agrupa los resultados en (reference_data, competitor_data, all_data)
+    
+    `all_data` contiene la referencia (si existe) seguida de la competencia.
+    """
+    reference_data = None
+    competitor_data = []
+    
+    for result in results:
+        if not result['data']:
+            continue
+        if result['role'] == 'reference':
+            reference_data = result['data']
+        else:
+            competitor_data.append(result['data'])
+    
+    all_data = ([reference_data] if reference_data else []) + competitor_data
+    return reference_data, competitor_data, all_data
+
+
+class AnalysisRun:
+    """Resultado completo de un análisis de URLs, independiente de la interfaz
+    
+    Se guarda en la sesión para volver a pintar los resultados sin repetir el
+    scraping cuando cambia cualquier widget. Los análisis y tablas derivados se
+    calculan bajo demanda con `memo` y se guardan con el run.
+    """
+    
+    def __init__(self, run_id, results, total=None, cache_hits=0, tracer=None):
+        self.run_id = run_id
+        self.results = list(results)
+        self.reference_data, self.competitor_data, self.all_data = split_results(self.results)
+        self.total = len(self.results) if total is None else total
+        self.cache_hits = cache_hits
+        self.created_at = datetime.now().isoformat()
+        self.tracer = tracer or NULL_TRACER
+        # La extracción ha terminado: el run se guarda en la sesión y no debe dejar
+        # `tracemalloc` activo para todo el proceso
+        self.tracer.stop_memory()
+        self._memo = {}
+    
+    @property
+    def success_count(self):
+        return len(self.all_data)
+    
+    @property
+    def failed_count(self):
+        return sum(1 for result in self.results if not result['data'])
+    
+    @property
+    def resumed_count(self):
+        return sum(1 for result in self.results if result['resumed'])
+    
+    def memo(self, key, compute):
+        """Calcula `compute()` la primera vez que se pide `key` y lo reutiliza el resto del run"""
+        if key not in self._memo:
+            with self.tracer.span(f"run.{key}"):
+                self._memo[key] = compute()
+        return self._memo[key]
+    
+    def memoized(self, key, default=None):
+        """Valor ya calculado de `key`, sin calcularlo"""
+        return self._memo.get(key, default)
+    
+    def products(self):
+        """(role, product_data) en el orden de `all_data`"""
+        if self.reference_data:
+            yield 'reference', self.reference_data
+        for data in self.competitor_data:
+            yield 'competitor', data
+    
+    def changed_urls(self):
+        """URLs extraídas de nuevo (nuevas o con cambios)"""
+        return [data['url'] for data in self.all_data if data.get('changed') is not False]
+    
+    def unchanged_urls(self):
+        """URLs cuya extracción anterior se reutilizó por huella"""
+        return [data['url'] for data in self.all_data if data.get('changed') is False]
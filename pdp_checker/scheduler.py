@@ -0,0 +1,224 @@
+"""
+Monitorización programada: ejecuta periódicamente los checks de una watchlist
+
+La watchlist es un JSON con una lista de jobs, cada uno con su intervalo:
+    
+    {
+        "jobs": [
+            {"name": "auriculares", "every_minutes": 60,
+             "urls": ["reference,https://mitienda.es/p/1", "https://rival.es/p/9"]},
+            {"name": "sony-xm5", "every_minutes": 240, "country": "es",
+             "queries": ["sony wh-1000xm5"], "our_store": "mitienda", "num_results": 20}
+        ]
+    }
+
+Los resultados se guardan en el `SnapshotStore`, de modo que la interfaz solo
+lee datos ya calculados.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import logging
+import os
+import random
+import time
+from datetime import datetime
+
+from pdp_checker.bulk import BulkShoppingRunner
+from pdp_checker.runner import fetch_with_retry, parse_url_lines
+from pdp_checker.throttle import DomainLimiter, interleave_domains
+
+logger = logging.getLogger('pdp_checker.scheduler')
+
+# Intervalo mínimo entre dos ejecuciones de un mismo job
+MIN_INTERVAL_MINUTES = 5
+
+
+def load_watchlist(path):
+    """Lee y valida una watchlist JSON; devuelve la lista de jobs normalizados"""
+    with open(path, encoding='utf-8') as f:
+        config = json.load(f)
+    
+    jobs = []
+    for position, raw in enumerate(config.get('jobs', []), 1):
+        name = str(raw.get('name') or f"job-{position}")
+        interval = max(float(raw.get('every_minutes', 60)), MIN_INTERVAL_MINUTES) * 60
+        
+        job = {'name': name, 'interval': interval}
+        if raw.get('urls'):
+            lines = raw['urls'] if isinstance(raw['urls'], list) else [raw['urls']]
+            job['kind'] = 'urls'
+            job['urls'] = parse_url_lines('\n'.join(lines))
+        elif raw.get('queries'):
+            queries = raw['queries'] if isinstance(raw['queries'], list) else [raw['queries']]
+            job['kind'] = 'shopping'
+            job['queries'] = [{'query': query, 'sku': ''} if isinstance(query, str) else query for query in queries]
+            job['our_store'] = raw.get('our_store')
+            job['num_results'] = int(raw.get('num_results', 20))
+            job['country'] = raw.get('country', 'es')
+        else:
+            logger.warning("Job '%s' sin URLs ni queries: se ignora", name)
+            continue
+        
+        jobs.append(job)
+    
+    return jobs
+
+
+def job_offset(name, interval):
+    """Desfase estable (0..interval) del job, para no lanzar todos a la vez"""
+    digest = int(hashlib.sha1(name.encode('utf-8')).hexdigest()[:8], 16)
+    return interval * digest / 0xFFFFFFFF
+
+
+class MonitorScheduler:
+    """Planificador de jobs con concurrencia global y por dominio
+    
+    Las URLs y queries de todos los jobs comparten un pool de `max_workers`
+    hilos; además, cada dominio admite como mucho `per_domain` peticiones
+    simultáneas separadas por `delay` segundos. La primera ejecución de cada job
+    se reparte dentro de su intervalo y las siguientes llevan un jitter de
+    ±`jitter` (fracción del intervalo). La hora de la última ejecución de cada
+    job se guarda en `state_path` para que un reinicio no los dispare todos.
+    """
+    
+    def __init__(self, jobs, store, analyzer, max_workers=4, per_domain=1, delay=2.0,
+                 jitter=0.1, state_path=None, clock=time.time, sleep=time.sleep):
+        self.jobs = {job['name']: job for job in jobs}
+        self.store = store
+        self.analyzer = analyzer
+        self.max_workers = max_workers
+        self.domain_limiter = DomainLimiter(per_domain, rate=1.0 / delay if delay else None)
+        self.jitter = jitter
+        self.state_path = state_path
+        self.clock = clock
+        self.sleep = sleep
+        
+        self.last_runs = self._load_state()
+        now = self.clock()
+        self.next_runs = {}
+        for name, job in self.jobs.items():
+            if name in self.last_runs:
+                self.next_runs[name] = self.last_runs[name] + self._jittered(job['interval'])
+            else:
+                self.next_runs[name] = now + job_offset(name, job['interval'])
+        
+        # Jobs en curso: nombre -> (inicio, futures)
+        self._running = {}
+    
+    def run_forever(self, stop_event=None):
+        """Bucle principal; termina cuando se activa `stop_event`"""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while not (stop_event and stop_event.is_set()):
+                self.tick(executor)
+                self.sleep(min(1.0, max(0.1, self._seconds_to_next())))
+            self._drain()
+    
+    def run_once(self):
+        """Ejecuta todos los jobs una vez, ahora, y espera a que terminen"""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for name in self.jobs:
+                self._start(name, executor)
+            self._drain()
+    
+    def tick(self, executor):
+        """Lanza los jobs vencidos y guarda los que han terminado"""
+        now = self.clock()
+        for name, next_run in self.next_runs.items():
+            if next_run <= now and name not in self._running:
+                self._start(name, executor)
+        
+        for name in [name for name, (_, futures) in self._running.items() if all(f.done() for f in futures)]:
+            self._finish(name)
+    
+    def _start(self, name, executor):
+        job = self.jobs[name]
+        started_at = self.clock()
+        logger.info("Lanzando job '%s'", name)
+        
+        if job['kind'] == 'urls':
+            futures = [executor.submit(self._fetch_url, url) for _, url in interleave_domains(job['urls'])]
+        else:
+            runner = BulkShoppingRunner(
+                None,
+                our_store=job['our_store'],
+                num_results=job['num_results'],
+                country=job['country'],
+                metrics=self.analyzer.metrics
+            )
+            domain = f"google.{job['country']}"
+            futures = [executor.submit(self._check_query, runner, domain, item) for item in job['queries']]
+        
+        self._running[name] = (started_at, futures)
+    
+    def _finish(self, name):
+        job = self.jobs[name]
+        started_at, futures = self._running.pop(name)
+        run_id = f"watch-{name}-{datetime.fromtimestamp(started_at).strftime('%Y%m%d-%H%M%S')}"
+        results = [future.result() for future in futures]
+        
+        if job['kind'] == 'urls':
+            # Mismo orden que la watchlist (referencia primero)
+            by_url = {data['url']: data for data in results if data}
+            products = [by_url[url] for _, url in job['urls'] if url in by_url]
+            saved = self.store.save_products(products, run_id=run_id)
+            unchanged = sum(1 for data in products if data.get('changed') is False)
+            logger.info(
+                "Job '%s': %d/%d URLs (%d sin cambios), %d snapshots nuevos",
+                name, len(products), len(job['urls']), unchanged, saved
+            )
+        else:
+            saved = self.store.save_shopping_checks(results, run_id=run_id)
+            failed = sum(1 for row in results if row.get('error'))
+            logger.info("Job '%s': %d queries (%d con error)", name, len(results), failed)
+        
+        self.last_runs[name] = started_at
+        self.next_runs[name] = started_at + self._jittered(job['interval'])
+        self._save_state()
+    
+    def _drain(self):
+        """Espera a los jobs en curso y guarda sus resultados"""
+        for name in list(self._running):
+            for future in self._running[name][1]:
+                future.exception()
+            self._finish(name)
+    
+    def _fetch_url(self, url):
+        """Extrae una URL respetando el límite del dominio; reintenta una vez"""
+        try:
+            return fetch_with_retry(self.analyzer, url, self.domain_limiter)
+        except Exception as e:
+            logger.warning("Error inesperado con %s: %s", url, e)
+            return None
+    
+    def _check_query(self, runner, domain, item):
+        with self.domain_limiter.slot(domain):
+            return runner.check_query(item)
+    
+    def _jittered(self, interval):
+        return interval * (1 + random.uniform(-self.jitter, self.jitter))
+    
+    def _seconds_to_next(self):
+        pending = [self.next_runs[name] for name in self.next_runs if name not in self._running]
+        return min(pending) - self.clock() if pending else 1.0
+    
+    def _load_state(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, encoding='utf-8') as f:
+                return {name: float(value) for name, value in json.load(f).items() if name in self.jobs}
+        except (OSError, ValueError):
+            return {}
+    
+    def _save_state(self):
+        if not self.state_path:
+            return
+        directory = os.path.dirname(self.state_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.last_runs, f)
+        os.replace(tmp_path, self.state_path)
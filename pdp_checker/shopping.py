@@ -0,0 +1,760 @@
+"""Búsqueda y análisis de productos en Google Shopping"""
+
+from collections import Counter, OrderedDict
+import re
+import threading
+import time
+from urllib.parse import parse_qs, quote_plus, urlparse
+
+import requests
+from bs4 import BeautifulSoup, Tag
+
+from pdp_checker.metrics import NULL_METRICS
+from pdp_checker.trace import NULL_TRACER, traced
+
+class QueryResultCache:
+    """Caché en memoria de productos parseados por (query, país, estrategia, página, tamaño)
+    
+    Guarda listas de productos ya extraídas, nunca HTML. Las entradas caducan tras
+    `ttl` segundos y, al superar `max_entries`, se expulsa la menos usada (LRU).
+    """
+    
+    def __init__(self, ttl=1800, max_entries=500):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def make_key(query, country, strategy, page, page_size):
+        """Key determinista: query normalizada, país, estrategia, página y tamaño de página
+        
+        El tamaño forma parte de la key porque la página `page` empieza en el
+        resultado `page * page_size`: con otro tamaño es otra ventana.
+        """
+        normalized_query = ' '.join(query.lower().split())
+        return (normalized_query, country, strategy, page, page_size)
+    
+    def get(self, key):
+        """Devuelve una copia de los productos cacheados o None si no hay entrada válida"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            stored_at, products = entry
+            if time.time() - stored_at > self.ttl:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return [dict(p) for p in products]
+    
+    def set(self, key, products):
+        """Guarda una copia de los productos y expulsa las entradas sobrantes"""
+        with self._lock:
+            self._entries[key] = (time.time(), [dict(p) for p in products])
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        """Vacía la caché"""
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class GoogleShoppingAnalyzer:
+    """Analizador mejorado de Google Shopping con manejo de errores robusto"""
+    
+    # Resultados solicitados por página al paginar
+    PAGE_SIZE = 20
+    
+    # Variantes fijas para la búsqueda regular (cada una se cachea por separado)
+    SHOPPING_TERMS = ("comprar", "precio", "oferta", "barato")
+    
+    # Variantes de SHOPPING_TERMS que se prueban, como mucho, si Shopping da pocos resultados
+    FALLBACK_VARIANTS = 1
+    
+    # Clases de tarjeta y de campos, en orden de prioridad
+    CARD_CLASSES = frozenset([
+        'sh-dgr__content', 'sh-dlr__list-result', 'KZmu8e', 'i0X6df', 'u30d4', 'Rn1jbe', 'xcR77'
+    ])
+    TITLE_CLASSES = ('rgHvZc', 'EI11Pd', 'Xjkr3b')
+    PRICE_CLASSES = ('a8Pemb', 'OFFNJ', 'Nr22bf', 'HRLxBb')
+    SOURCE_CLASSES = ('aULzUe', 'IuHnof', 'vjtvZe')
+    
+    # Extracción genérica
+    PRICE_INDICATOR_RE = re.compile(r'€|EUR|precio|Price')
+    GENERIC_BLOCKS = ['div', 'li', 'article']
+    GENERIC_MAX_CLIMB = 10
+    
+    def __init__(self, use_zenrow=False, cache=None, rate_limiter=None, tracer=None, metrics=None,
+                 fallback_variants=None):
+        self.headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
+            'Accept-Language': 'es-ES,es;q=0.9,en;q=0.8',
+            'Accept-Encoding': 'gzip, deflate, br',
+            'DNT': '1',
+            'Connection': 'keep-alive',
+            'Upgrade-Insecure-Requests': '1'
+        }
+        self.last_error = None
+        self.cache = cache
+        self.cache_hits = 0
+        self.rate_limiter = rate_limiter
+        self.tracer = tracer or NULL_TRACER
+        self.metrics = metrics or NULL_METRICS
+        self.fallback_variants = self.FALLBACK_VARIANTS if fallback_variants is None else fallback_variants
+    
+    def search_products_free(self, query, num_results=20, country='es', max_pages=None):
+        """
+        Busca productos en Google Shopping
+        
+        Returns:
+            tuple: (products_list, error_message)
+                - products_list: Lista de productos encontrados
+                - error_message: None si todo OK, string con error si hubo problemas
+        """
+        try:
+            # Validación de entrada
+            if not query or not query.strip():
+                return [], "Query vacío"
+            
+            products = list(self.iter_products(query, num_results, country, max_pages))
+            return products, self.last_error
+            
+        except Exception as e:
+            error_msg = f"Error general en búsqueda: {str(e)}"
+            return [], error_msg
+    
+    def iter_products(self, query, num_results=20, country='es', max_pages=None, page_size=None):
+        """
+        Recorre las páginas de resultados de forma perezosa y va entregando productos
+        
+        Se detiene al reunir `num_results` productos válidos y sin duplicados, al agotar
+        el presupuesto de páginas o cuando una página no aporta nada nuevo. Los errores
+        quedan en `self.last_error`.
+        
+        Yields:
+            dict: Producto con title, price, source, link, description y method
+        """
+        for products in self.iter_pages(query, num_results, country, max_pages, page_size):
+            yield from products
+    
+    def iter_pages(self, query, num_results=20, country='es', max_pages=None, page_size=None):
+        """
+        Como `iter_products`, pero entrega de una vez los productos nuevos de cada página
+        
+        Útil para refrescar una vista una vez por página y no por producto.
+        
+        Yields:
+            list: Productos nuevos (sin duplicados) de la página, nunca vacía
+        """
+        self.last_error = None
+        self.cache_hits = 0
+        if not query or not query.strip():
+            self.last_error = "Query vacío"
+            return
+        
+        page_size = page_size or self.PAGE_SIZE
+        if max_pages is None:
+            max_pages = max(1, -(-num_results // page_size) + 1)
+        
+        seen = set()
+        errors = []
+        yielded = 0
+        
+        # Método 1: Google Shopping directo, página a página
+        # Método 2: Si falla o pocos resultados, búsqueda regular con `fallback_variants`
+        # variantes; se para en la primera que aporte algún producto
+        strategies = [('shopping', None)] + [
+            ('regular', term) for term in self.SHOPPING_TERMS[:self.fallback_variants]
+        ]
+        for strategy, term in strategies:
+            yielded_before = yielded
+            for page in range(max_pages):
+                products, error = self._fetch_page(query, page_size, country, strategy, term, page)
+                if error:
+                    # Un error en páginas posteriores solo indica fin de resultados
+                    if page == 0:
+                        errors.append(error)
+                    break
+                
+                new_products = []
+                for product in products:
+                    key = self._product_key(product)
+                    if not key or key in seen:
+                        continue
+                    seen.add(key)
+                    new_products.append(product)
+                    if yielded + len(new_products) >= num_results:
+                        break
+                
+                if not new_products:
+                    break
+                yielded += len(new_products)
+                yield new_products
+                if yielded >= num_results:
+                    return
+            
+            if yielded >= 3 or (strategy == 'regular' and yielded > yielded_before):
+                break
+        
+        if errors:
+            self.last_error = '; '.join(errors)
+        elif not yielded:
+            self.last_error = "No se encontraron productos para esta búsqueda"
+    
+    @traced('shopping.page')
+    def _fetch_page(self, query, page_size, country, strategy, term, page):
+        """Obtiene una página de resultados, pasando por la caché si está configurada"""
+        strategy_key = f"{strategy}:{term}" if term else strategy
+        key = QueryResultCache.make_key(query, country, strategy_key, page, page_size)
+        
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.cache_hits += 1
+                return cached, None
+        
+        if self.rate_limiter is not None:
+            self.rate_limiter.wait()
+        
+        start = page * page_size
+        if strategy == 'shopping':
+            products, error = self._search_google_shopping(query, page_size, country, start=start)
+        else:
+            products, error = self._search_google_regular(query, page_size, country, start=start, term=term)
+        
+        # Solo se cachean respuestas correctas
+        if self.cache is not None and not error:
+            self.cache.set(key, products)
+        
+        return products, error
+    
+    def _search_google_shopping(self, query, num_results, country='es', start=0):
+        """
+        Búsqueda en Google Shopping
+        Returns: (products_list, error_message)
+        """
+        try:
+            base_urls = {
+                'es': 'https://www.google.es/search',
+                'com': 'https://www.google.com/search',
+                'mx': 'https://www.google.com.mx/search'
+            }
+            
+            base_url = base_urls.get(country, base_urls['es'])
+            
+            params = {
+                'q': query,
+                'tbm': 'shop',
+                'hl': 'es',
+                'gl': country,
+                'num': min(num_results, 40),  # Tamaño de página; `start` desplaza el resultado inicial
+            }
+            if start:
+                params['start'] = start
+            
+            # Construir URL
+            url = base_url + '?' + '&'.join([f"{k}={quote_plus(str(v))}" for k, v in params.items()])
+            
+            # Hacer request
+            started = time.perf_counter()
+            response = requests.get(url, headers=self.headers, timeout=15)
+            self.tracer.record_response('shopping.fetch', url, response, started)
+            self.metrics.record_response(url, response, time.perf_counter() - started)
+            
+            if response.status_code != 200:
+                return [], f"Error HTTP {response.status_code}"
+            
+            with self.tracer.span('shopping.parse', url):
+                soup = BeautifulSoup(response.content, 'html.parser')
+            
+            # Detectar si Google bloqueó la búsqueda
+            if soup.select_one('div#recaptcha') or 'captcha' in response.text.lower():
+                return [], "Google requiere verificación CAPTCHA"
+            
+            with self.tracer.span('shopping.extract', url):
+                products = self._parse_shopping_results(soup, num_results)
+            
+            if not products:
+                return [], "No se pudieron extraer productos de Google Shopping"
+            
+            return products, None
+            
+        except requests.exceptions.Timeout:
+            return [], "Timeout al conectar con Google"
+        except requests.exceptions.ConnectionError:
+            return [], "Error de conexión con Google"
+        except Exception as e:
+            return [], f"Error en Google Shopping: {str(e)}"
+    
+    def _search_google_regular(self, query, num_results, country='es', start=0, term=None):
+        """
+        Búsqueda alternativa en Google regular
+        Returns: (products_list, error_message)
+        """
+        try:
+            # Modificar query para buscar productos con una variante fija
+            term = term or self.SHOPPING_TERMS[0]
+            shopping_query = f"{query} {term}"
+            
+            base_url = f"https://www.google.{country}/search"
+            params = {
+                'q': shopping_query,
+                'num': num_results,
+                'hl': 'es',
+                'gl': country
+            }
+            if start:
+                params['start'] = start
+            
+            url = base_url + '?' + '&'.join([f"{k}={quote_plus(str(v))}" for k, v in params.items()])
+            
+            started = time.perf_counter()
+            response = requests.get(url, headers=self.headers, timeout=10)
+            self.tracer.record_response('shopping.fetch', url, response, started)
+            self.metrics.record_response(url, response, time.perf_counter() - started)
+            
+            if response.status_code != 200:
+                return [], f"Error HTTP {response.status_code} en búsqueda alternativa"
+            
+            with self.tracer.span('shopping.parse', url):
+                soup = BeautifulSoup(response.content, 'html.parser')
+            with self.tracer.span('shopping.extract', url):
+                products = self._parse_organic_results(soup, num_results)
+            
+            if not products:
+                return [], "No se encontraron resultados comerciales"
+                
+            return products, None
+            
+        except Exception as e:
+            return [], f"Error en búsqueda alternativa: {str(e)}"
+    
+    def _parse_shopping_results(self, soup, num_results):
+        """
+        Parsea una página de resultados de Google Shopping
+        
+        Localiza las tarjetas de producto en un solo recorrido del árbol y extrae cada
+        una una única vez; si no hay tarjetas conocidas recurre a la extracción genérica.
+        """
+        cards = self._find_card_roots(soup, self._is_shopping_card)
+        
+        if not cards:
+            return self._extract_products_generic(soup, num_results)
+        
+        products = []
+        for card in cards:
+            product = self._extract_product_from_element(card)
+            if product and self._is_valid_product(product):
+                products.append(product)
+        
+        return products
+    
+    def _parse_organic_results(self, soup, num_results):
+        """Parsea una página de resultados orgánicos quedándose con los que parecen productos"""
+        products = []
+        
+        # Buscar resultados que parezcan productos
+        result_divs = self._find_card_roots(soup, self._is_organic_result)
+        
+        for div in result_divs[:num_results]:
+            # Título, URL y fuente en un único recorrido del resultado
+            title_elem = link_elem = cite_elem = None
+            for tag in div.find_all(True):
+                if tag.name == 'h3':
+                    title_elem = title_elem or tag
+                elif tag.name == 'a' and tag.has_attr('href'):
+                    link_elem = link_elem or tag
+                elif tag.name == 'cite':
+                    cite_elem = cite_elem or tag
+            
+            if not title_elem:
+                continue
+            
+            title = title_elem.get_text().strip()
+            
+            # Buscar precio en el snippet
+            snippet = div.get_text()
+            price = self._extract_price_from_text(snippet)
+            
+            link = link_elem.get('href', '') if link_elem else ''
+            source = cite_elem.get_text().strip() if cite_elem else 'Tienda online'
+            
+            # Solo agregar si parece un producto (tiene precio o términos comerciales)
+            if price or any(term in snippet.lower() for term in ['€', 'eur', 'precio', 'comprar', 'oferta']):
+                products.append({
+                    'title': title,
+                    'price': price or 'Consultar precio',
+                    'source': self._clean_source(source),
+                    'link': link,
+                    'description': title,
+                    'method': 'Google Search'
+                })
+        
+        return products
+    
+    def _find_card_roots(self, soup, is_card):
+        """
+        Devuelve, en orden de documento, los elementos raíz que cumplen `is_card`
+        
+        Recorre el árbol una sola vez y no desciende dentro de una tarjeta ya
+        encontrada, de modo que las coincidencias anidadas se ignoran.
+        """
+        roots = []
+        stack = [child for child in reversed(soup.contents) if isinstance(child, Tag)]
+        
+        while stack:
+            node = stack.pop()
+            if is_card(node):
+                roots.append(node)
+                continue
+            stack.extend(child for child in reversed(node.contents) if isinstance(child, Tag))
+        
+        return roots
+    
+    def _is_shopping_card(self, tag):
+        """Indica si un elemento es la raíz de una tarjeta de Google Shopping"""
+        if tag.name != 'div':
+            return False
+        if tag.has_attr('data-docid'):
+            return True
+        return any(cls in self.CARD_CLASSES for cls in tag.get('class') or ())
+    
+    def _is_organic_result(self, tag):
+        """Indica si un elemento es un resultado orgánico (div.g)"""
+        return tag.name == 'div' and 'g' in (tag.get('class') or ())
+    
+    def _extract_product_from_element(self, element):
+        """Extrae información del producto de una tarjeta en un único recorrido local"""
+        try:
+            product = {}
+            
+            # Primer candidato de cada selector, indexado por su prioridad
+            titles = {}
+            prices = {}
+            sources = {}
+            link_elem = None
+            
+            for tag in element.find_all(True):
+                classes = tag.get('class') or ()
+                if tag.name == 'h3':
+                    titles.setdefault(0, tag)
+                elif tag.name == 'h4':
+                    titles.setdefault(1, tag)
+                elif tag.name == 'a':
+                    if tag.has_attr('aria-label'):
+                        titles.setdefault(2, tag)
+                    if link_elem is None and tag.has_attr('href'):
+                        link_elem = tag
+                elif tag.name == 'div':
+                    for i, cls in enumerate(self.TITLE_CLASSES):
+                        if cls in classes:
+                            titles.setdefault(3 + i, tag)
+                elif tag.name == 'span':
+                    for i, cls in enumerate(self.PRICE_CLASSES):
+                        if cls in classes:
+                            prices.setdefault(i, tag)
+                    for i, cls in enumerate(self.SOURCE_CLASSES):
+                        if cls in classes:
+                            sources.setdefault(i, tag)
+                elif tag.name == 'cite':
+                    sources.setdefault(len(self.SOURCE_CLASSES), tag)
+            
+            # Título
+            for _, title_elem in sorted(titles.items()):
+                title = title_elem.get_text().strip()
+                if not title and title_elem.get('aria-label'):
+                    title = title_elem.get('aria-label')
+                if title and len(title) > 10:
+                    product['title'] = title[:200]  # Limitar longitud
+                    break
+            
+            # Precio
+            for _, price_elem in sorted(prices.items()):
+                price = price_elem.get_text().strip()
+                if price and ('€' in price or 'EUR' in price or re.search(r'\d', price)):
+                    product['price'] = price[:50]  # Limitar longitud
+                    break
+            
+            # Si no encontramos precio con selectores, buscar en texto
+            if not product.get('price'):
+                text = element.get_text()
+                price = self._extract_price_from_text(text)
+                if price:
+                    product['price'] = price
+            
+            # Tienda/Fuente
+            for _, source_elem in sorted(sources.items()):
+                source = source_elem.get_text().strip()
+                if source:
+                    product['source'] = self._clean_source(source)
+                    break
+            
+            # Link
+            if link_elem:
+                href = link_elem.get('href', '')
+                product['link'] = self._clean_link(href)
+            
+            # Descripción
+            if product.get('title'):
+                product['description'] = product['title']
+                product['method'] = 'Google Shopping'
+            
+            return product if product.get('title') else None
+            
+        except Exception:
+            return None
+    
+    def _extract_products_generic(self, soup, num_results):
+        """
+        Extracción genérica cuando los selectores específicos fallan
+        
+        Parte de los textos con indicadores de precio y sube hasta el bloque más
+        cercano que contenga un título, sin volver a leer bloques ya usados ni
+        bloques que engloben a otro producto.
+        """
+        products = []
+        used = set()        # bloques convertidos en producto
+        covering = set()    # ancestros de bloques usados
+        checked = {}        # bloque -> (título, texto) o None
+        
+        try:
+            for string in soup.find_all(string=self.PRICE_INDICATOR_RE):
+                if string.parent is None or string.parent.name in ('script', 'style'):
+                    continue
+                
+                block = string.find_parent(self.GENERIC_BLOCKS)
+                
+                # Ignorar precios dentro de un producto ya extraído
+                if block is None or any(id(parent) in used for parent in block.parents) or id(block) in used:
+                    continue
+                
+                found = None
+                for _ in range(self.GENERIC_MAX_CLIMB):
+                    if block is None or id(block) in covering:
+                        break
+                    if id(block) not in checked:
+                        checked[id(block)] = self._generic_block_title(block)
+                    found = checked[id(block)]
+                    if found:
+                        break
+                    block = block.find_parent(self.GENERIC_BLOCKS)
+                
+                if not found:
+                    continue
+                
+                used.add(id(block))
+                covering.update(id(parent) for parent in block.parents)
+                
+                title, text = found
+                price = self._extract_price_from_text(text)
+                products.append({
+                    'title': title,
+                    'price': price or 'Ver precio',
+                    'source': 'Tienda online',
+                    'link': '#',
+                    'description': title,
+                    'method': 'Generic extraction'
+                })
+                
+                if len(products) >= num_results:
+                    break
+            
+        except Exception:
+            pass
+        
+        return products
+    
+    def _generic_block_title(self, block):
+        """Devuelve (título, texto) si el bloque parece un producto, o None"""
+        text = block.get_text('\n')
+        lines = [line.strip() for line in text.split('\n') if line.strip()]
+        
+        if len(lines) < 2:
+            return None
+        
+        # Primer línea larga como título
+        for line in lines:
+            if 20 < len(line) < 200 and not any(x in line for x in ['€', 'EUR', 'precio']):
+                return line, text
+        
+        return None
+    
+    def _extract_price_from_text(self, text):
+        """Extrae precio de un texto"""
+        if not text:
+            return None
+            
+        # Patrones de precio
+        patterns = [
+            r'(\d{1,5}[,\.]\d{2})\s*€',
+            r'€\s*(\d{1,5}[,\.]\d{2})',
+            r'EUR\s*(\d{1,5}[,\.]\d{2})',
+            r'(\d{1,5})\s*€',
+            r'€\s*(\d{1,5})',
+        ]
+        
+        for pattern in patterns:
+            match = re.search(pattern, text, re.IGNORECASE)
+            if match:
+                return match.group(0).strip()
+        
+        return None
+    
+    def _clean_source(self, source):
+        """Limpia el nombre de la fuente/tienda"""
+        if not source:
+            return 'Tienda online'
+        
+        # Eliminar URLs y caracteres especiales
+        source = re.sub(r'https?://|www\.', '', source)
+        source = source.split('/')[0]
+        source = source.replace('.com', '').replace('.es', '').replace('.org', '')
+        
+        return source.strip() or 'Tienda online'
+    
+    def _clean_link(self, href):
+        """Limpia y procesa links de Google"""
+        if not href:
+            return '#'
+        
+        if href.startswith('/url?'):
+            # Extraer URL real de Google redirect
+            parsed = parse_qs(urlparse(href).query)
+            if 'q' in parsed:
+                return parsed['q'][0]
+            elif 'url' in parsed:
+                return parsed['url'][0]
+        
+        if href.startswith('http'):
+            return href
+        
+        if href.startswith('/'):
+            return 'https://www.google.com' + href
+        
+        return href
+    
+    def _is_valid_product(self, product):
+        """Valida que el producto tenga información mínima"""
+        if not product:
+            return False
+        
+        # Debe tener al menos título
+        if not product.get('title'):
+            return False
+        
+        # El título debe tener longitud razonable
+        title = product.get('title', '')
+        if len(title) < 10 or len(title) > 500:
+            return False
+        
+        # No debe ser un resultado de navegación
+        excluded_terms = ['política', 'privacidad', 'cookies', 'términos', 'condiciones', 'ayuda', 'contacto']
+        if any(term in title.lower() for term in excluded_terms):
+            return False
+        
+        return True
+    
+    def _product_key(self, product):
+        """Crea una key única basada en el título normalizado"""
+        title = product.get('title', '').lower().strip()
+        return ''.join(c for c in title if c.isalnum())[:50]
+    
+    def _remove_duplicates(self, products):
+        """Elimina productos duplicados manteniendo el orden"""
+        seen = set()
+        unique = []
+        
+        for product in products:
+            key = self._product_key(product)
+            
+            if key and key not in seen:
+                seen.add(key)
+                unique.append(product)
+        
+        return unique
+    
+    @traced('shopping.analyze')
+    def analyze_shopping_data(self, products):
+        """Analiza los datos obtenidos"""
+        if not products:
+            return {
+                'total_products': 0,
+                'sources': {},
+                'price_ranges': None,
+                'common_terms': Counter(),
+                'has_data': False
+            }
+        
+        analysis = {
+            'total_products': len(products),
+            'sources': {},
+            'price_ranges': None,
+            'common_terms': Counter(),
+            'has_data': True
+        }
+        
+        # Análisis por fuente
+        for product in products:
+            source = product.get('source', 'Desconocido')
+            analysis['sources'][source] = analysis['sources'].get(source, 0) + 1
+        
+        # Análisis de precios
+        prices = []
+        for product in products:
+            price_text = product.get('price', '')
+            if price_text and price_text not in ['Ver precio', 'Consultar precio', '#']:
+                # Extraer números
+                numbers = re.findall(r'\d+[,.]?\d*', price_text.replace(',', '.'))
+                for num_str in numbers:
+                    try:
+                        price = float(num_str.replace(',', '.'))
+                        if 0.01 < price < 100000:
+                            prices.append(price)
+                            break
+                    except:
+                        continue
+        
+        if prices:
+            analysis['price_ranges'] = {
+                'min': min(prices),
+                'max': max(prices),
+                'avg': sum(prices) / len(prices),
+                'median': sorted(prices)[len(prices)//2] if prices else 0,
+                'count': len(prices)
+            }
+        
+        # Análisis de términos
+        all_text = ' '.join([
+            f"{p.get('title', '')} {p.get('description', '')}"
+            for p in products
+        ])
+        
+        # Tokenización
+        words = re.findall(r'\b[a-záéíóúñü]{3,}\b', all_text.lower())
+        
+        # Filtrar stopwords
+        stopwords = {
+            'para', 'con', 'por', 'del', 'las', 'los', 'una', 'uno',
+            'desde', 'hasta', 'más', 'muy', 'todo', 'todos', 'este',
+            'esta', 'estos', 'estas', 'ese', 'esa', 'esos', 'esas'
+        }
+        
+        filtered = [w for w in words if w not in stopwords]
+        analysis['common_terms'] = Counter(filtered)
+        
+        return analysis
@@ -0,0 +1,302 @@
+"""Almacén local (SQLite) de snapshots de producto con histórico de precio y contenido"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from datetime import datetime
+from urllib.parse import urlparse
+
+from pdp_checker.canonical import canonical_url
+from pdp_checker.fingerprint import FINGERPRINT_BITS, content_hash
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT,
+    url TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    extracted_at TEXT NOT NULL,
+    title TEXT,
+    price_text TEXT,
+    price REAL,
+    content_hash TEXT,
+    body BLOB,
+    UNIQUE (url, extracted_at)
+);
+CREATE INDEX IF NOT EXISTS idx_snapshots_url_time ON snapshots (url, extracted_at);
+CREATE INDEX IF NOT EXISTS idx_snapshots_domain_time ON snapshots (domain, extracted_at);
+CREATE INDEX IF NOT EXISTS idx_snapshots_time ON snapshots (extracted_at);
+
+CREATE TABLE IF NOT EXISTS shopping_checks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT,
+    query TEXT NOT NULL,
+    sku TEXT,
+    checked_at TEXT NOT NULL,
+    products INTEGER,
+    min_price REAL,
+    median_price REAL,
+    max_price REAL,
+    store_count INTEGER,
+    our_position INTEGER,
+    error TEXT,
+    UNIQUE (query, sku, checked_at)
+);
+CREATE INDEX IF NOT EXISTS idx_shopping_checks_query_time ON shopping_checks (query, checked_at);
+"""
+
+# Columnas de `shopping_checks` (mismas claves que las filas del modo catálogo)
+SHOPPING_COLUMNS = (
+    'query', 'sku', 'checked_at', 'products', 'min_price', 'median_price',
+    'max_price', 'store_count', 'our_position', 'error'
+)
+
+# Columnas añadidas tras la primera versión del esquema
+MIGRATIONS = {
+    'fingerprint': 'ALTER TABLE snapshots ADD COLUMN fingerprint INTEGER',
+}
+
+
+def normalize_price(price_text):
+    """
+    Convierte un texto de precio en float
+    
+    Distingue separadores de miles y decimales en formato europeo y anglosajón:
+    "1.299,99 €" -> 1299.99, "$1,299.99" -> 1299.99, "49,99 €" -> 49.99.
+    """
+    if not price_text:
+        return None
+    
+    match = re.search(r'\d[\d.,\s]*', str(price_text))
+    if not match:
+        return None
+    
+    number = re.sub(r'\s', '', match.group()).rstrip('.,')
+    last_comma = number.rfind(',')
+    last_dot = number.rfind('.')
+    
+    if last_comma != -1 and last_dot != -1:
+        # Ambos separadores: el último es el decimal
+        thousands, decimal = ('.', ',') if last_comma > last_dot else (',', '.')
+        number = number.replace(thousands, '').replace(decimal, '.')
+    elif last_comma != -1 or last_dot != -1:
+        sep = ',' if last_comma != -1 else '.'
+        decimals = len(number) - number.rfind(sep) - 1
+        # "1.299", "1,299" o "1.299.000": separador de miles
+        if number.count(sep) > 1 or (decimals == 3 and not number.startswith('0')):
+            number = number.replace(sep, '')
+        else:
+            number = number.replace(sep, '.')
+    
+    try:
+        return float(number)
+    except ValueError:
+        return None
+
+
+class SnapshotStore:
+    """Histórico de `product_data`: una fila por (URL, extracted_at)
+    
+    El cuerpo completo se guarda comprimido (zlib + JSON) junto a las columnas
+    consultables: dominio, título, precio normalizado y hash de contenido. Las
+    escrituras se hacen por lotes, en una sola transacción por run. La tabla
+    `shopping_checks` guarda los resúmenes de Google Shopping del planificador.
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.executescript(SCHEMA)
+            columns = {row['name'] for row in self._conn.execute('PRAGMA table_info(snapshots)')}
+            for column, statement in MIGRATIONS.items():
+                if column not in columns:
+                    self._conn.execute(statement)
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
+    
+    def save_products(self, products, run_id=None):
+        """Guarda un lote de productos en una transacción; devuelve filas insertadas
+        
+        Las URLs se guardan en su forma canónica (ver `canonical.py`), que es la
+        que usan también las consultas por URL.
+        """
+        rows = []
+        for product in products:
+            if not product or not product.get('url'):
+                continue
+            url = canonical_url(product['url'])
+            rows.append((
+                run_id,
+                url,
+                product.get('domain') or urlparse(url).netloc,
+                product.get('extracted_at') or datetime.now().isoformat(),
+                product.get('title', ''),
+                product.get('price', ''),
+                normalize_price(product.get('price')),
+                content_hash(product),
+                zlib.compress(json.dumps(product, ensure_ascii=False).encode('utf-8')),
+                _to_signed(product.get('fingerprint'))
+            ))
+        
+        if not rows:
+            return 0
+        
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                'INSERT OR IGNORE INTO snapshots '
+                '(run_id, url, domain, extracted_at, title, price_text, price, content_hash, body, fingerprint) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                rows
+            )
+            return self._conn.total_changes - before
+    
+    def save_shopping_checks(self, rows, run_id=None):
+        """Guarda filas de resumen de Google Shopping (ver `BulkShoppingRunner.summarize`)"""
+        values = [
+            (run_id,) + tuple(row.get(column) for column in SHOPPING_COLUMNS)
+            for row in rows if row and row.get('query')
+        ]
+        if not values:
+            return 0
+        
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                f"INSERT OR IGNORE INTO shopping_checks (run_id, {', '.join(SHOPPING_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * (len(SHOPPING_COLUMNS) + 1))})",
+                values
+            )
+            return self._conn.total_changes - before
+    
+    def latest_shopping_checks(self, limit=500):
+        """Último resumen guardado de cada query de Google Shopping"""
+        return self._query(
+            f"SELECT c.run_id, {', '.join('c.' + column for column in SHOPPING_COLUMNS)} "
+            'FROM shopping_checks c JOIN ('
+            '  SELECT query, sku, MAX(checked_at) AS last_at FROM shopping_checks GROUP BY query, sku'
+            ') latest ON c.query = latest.query AND c.sku IS latest.sku AND c.checked_at = latest.last_at '
+            'ORDER BY c.query LIMIT ?',
+            (limit,)
+        )
+    
+    def shopping_series(self, query, since=None):
+        """Serie de resúmenes de una query en orden temporal"""
+        sql = f"SELECT {', '.join(SHOPPING_COLUMNS)} FROM shopping_checks WHERE query = ?"
+        params = [query]
+        if since:
+            sql += ' AND checked_at >= ?'
+            params.append(since)
+        return self._query(sql + ' ORDER BY checked_at', params)
+    
+    def latest_snapshot(self, url):
+        """Último `product_data` guardado para una URL, o None"""
+        row = self._query_one(
+            'SELECT body FROM snapshots WHERE url = ? ORDER BY extracted_at DESC LIMIT 1',
+            (canonical_url(url),)
+        )
+        return self._decode(row['body']) if row else None
+    
+    def iter_run_products(self, run_id, chunk_size=500):
+        """`product_data` de un run en orden de guardado, leídos de `chunk_size` en `chunk_size`"""
+        last_id = 0
+        while True:
+            rows = self._query(
+                'SELECT id, body FROM snapshots WHERE run_id = ? AND id > ? ORDER BY id LIMIT ?',
+                (run_id, last_id, chunk_size)
+            )
+            if not rows:
+                return
+            for row in rows:
+                yield self._decode(row['body'])
+            last_id = rows[-1]['id']
+    
+    def latest_fingerprint(self, url):
+        """(huella, product_data) del último snapshot con huella de una URL, o None"""
+        row = self._query_one(
+            'SELECT fingerprint, body FROM snapshots WHERE url = ? AND fingerprint IS NOT NULL '
+            'ORDER BY extracted_at DESC LIMIT 1',
+            (canonical_url(url),)
+        )
+        if not row:
+            return None
+        return _to_unsigned(row['fingerprint']), self._decode(row['body'])
+    
+    def latest_snapshots(self, domain=None, limit=500):
+        """Última fila (sin cuerpo) de cada URL, opcionalmente filtrada por dominio"""
+        sql = (
+            'SELECT s.url, s.domain, s.extracted_at, s.title, s.price_text, s.price, s.content_hash '
+            'FROM snapshots s JOIN ('
+            '  SELECT url, MAX(extracted_at) AS last_at FROM snapshots {where} GROUP BY url'
+            ') latest ON s.url = latest.url AND s.extracted_at = latest.last_at '
+            'ORDER BY s.domain, s.url LIMIT ?'
+        )
+        if domain:
+            return self._query(sql.format(where='WHERE domain = ?'), (domain, limit))
+        return self._query(sql.format(where=''), (limit,))
+    
+    def price_series(self, url, since=None):
+        """Serie (extracted_at, price, price_text) de una URL en orden temporal"""
+        sql = 'SELECT extracted_at, price, price_text FROM snapshots WHERE url = ?'
+        params = [canonical_url(url)]
+        if since:
+            sql += ' AND extracted_at >= ?'
+            params.append(since)
+        return self._query(sql + ' ORDER BY extracted_at', params)
+    
+    def domain_price_series(self, domain, since=None):
+        """Serie (url, extracted_at, price) de todas las URLs de un dominio"""
+        sql = 'SELECT url, extracted_at, price, title FROM snapshots WHERE domain = ?'
+        params = [domain]
+        if since:
+            sql += ' AND extracted_at >= ?'
+            params.append(since)
+        return self._query(sql + ' ORDER BY url, extracted_at', params)
+    
+    def domains(self):
+        """Dominios con snapshots y número de URLs de cada uno"""
+        return self._query(
+            'SELECT domain, COUNT(DISTINCT url) AS urls, MAX(extracted_at) AS last_at '
+            'FROM snapshots GROUP BY domain ORDER BY domain'
+        )
+    
+    def _query(self, sql, params=()):
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params).fetchall()]
+    
+    def _query_one(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()
+    
+    @staticmethod
+    def _decode(body):
+        return json.loads(zlib.decompress(body).decode('utf-8'))
+
+
+def _to_signed(fingerprint):
+    """SQLite guarda enteros de 64 bits con signo"""
+    if fingerprint is None:
+        return None
+    if fingerprint >= 1 << (FINGERPRINT_BITS - 1):
+        fingerprint -= 1 << FINGERPRINT_BITS
+    return fingerprint
+
+
+def _to_unsigned(fingerprint):
+    if fingerprint is None:
+        return None
+    return fingerprint & ((1 << FINGERPRINT_BITS) - 1)
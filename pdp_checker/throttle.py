@@ -0,0 +1,77 @@
+"""Limitación de ritmo de peticiones compartida entre hilos"""
+
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+
+class RateLimiter:
+    """Limitador simple por intervalo mínimo entre peticiones
+    
+    `wait()` bloquea lo necesario para no superar `rate` peticiones por segundo
+    entre todos los hilos que comparten la instancia.
+    """
+    
+    def __init__(self, rate=1.0):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+    
+    def wait(self):
+        """Espera hasta el siguiente hueco disponible"""
+        if not self.interval:
+            return
+        
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class DomainLimiter:
+    """Límite de peticiones simultáneas (y ritmo opcional) por dominio
+    
+    Uso: `with limiter.slot(domain): ...`. Cada dominio tiene su propio semáforo
+    de `max_concurrent` plazas y, si se indica `rate`, su propio `RateLimiter`.
+    """
+    
+    def __init__(self, max_concurrent=1, rate=None):
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.rate = rate
+        self._semaphores = {}
+        self._rate_limiters = {}
+        self._lock = threading.Lock()
+    
+    @contextmanager
+    def slot(self, domain):
+        """Ocupa una plaza del dominio durante el bloque `with`"""
+        with self._lock:
+            semaphore = self._semaphores.get(domain)
+            if semaphore is None:
+                semaphore = self._semaphores[domain] = threading.BoundedSemaphore(self.max_concurrent)
+                self._rate_limiters[domain] = RateLimiter(self.rate)
+            rate_limiter = self._rate_limiters[domain]
+        
+        with semaphore:
+            rate_limiter.wait()
+            yield
+
+
+def interleave_domains(items):
+    """Reordena pares (x, url) alternando dominios para no bloquear el pool en uno solo"""
+    by_domain = {}
+    for item in items:
+        by_domain.setdefault(urlparse(item[1]).netloc, []).append(item)
+    
+    queues = list(by_domain.values())
+    interleaved = []
+    while queues:
+        for queue in queues:
+            interleaved.append(queue.pop(0))
+        queues = [queue for queue in queues if queue]
+    return interleaved
@@ -0,0 +1,336 @@
+"""
+Trazas de latencia por etapa: descarga, parseo, extractores, análisis y búsquedas
+
+Cada registro es un dict `{stage, url, domain, ms, bytes}`. Un `Tracer`
+desactivado devuelve siempre el mismo contexto vacío, así que instrumentar el
+camino caliente no cuesta nada cuando no se usa.
+
+`requests` no separa DNS, conexión TCP y TLS: `fetch.ttfb` es el tiempo hasta
+las cabeceras de la respuesta (incluye esas tres fases) y `fetch.download` el
+resto de la petición (lectura del cuerpo).
+
+Con `memory=True` cada registro lleva además `peak_kb` (pico por encima de la
+memoria al entrar en la etapa) y `retained_kb` (lo que sigue ocupado al salir),
+medidos con `tracemalloc`. `tracemalloc` y su pico son globales del proceso: con
+varios hilos a la vez, el pico de una etapa incluye lo que asignen los demás.
+"""
+
+from collections import deque
+import functools
+import gc
+import json
+import os
+import threading
+import time
+import tracemalloc
+import weakref
+from urllib.parse import urlparse
+
+
+class _Span:
+    """Cronómetro de una etapa; `bytes` se puede rellenar dentro del bloque"""
+    
+    __slots__ = ('tracer', 'stage', 'url', 'bytes', 'started')
+    
+    def __init__(self, tracer, stage, url):
+        self.tracer = tracer
+        self.stage = stage
+        self.url = url
+        self.bytes = None
+    
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        self.tracer.record(self.stage, (time.perf_counter() - self.started) * 1000, self.url, self.bytes)
+        return False
+
+
+class _NullSpan:
+    """Contexto vacío compartido por los tracers desactivados"""
+    
+    __slots__ = ()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        return False
+    
+    def __setattr__(self, name, value):
+        pass
+
+
+class _MemorySpan(_Span):
+    """Cronómetro que además mide el pico y la memoria retenida de la etapa
+    
+    `tracemalloc.reset_peak()` es global, así que al abrir una etapa anidada se
+    guarda en la de fuera el pico que llevaba, y al cerrarla se le pasa el suyo.
+    """
+    
+    __slots__ = ('start_memory', 'carried_peak', 'parent')
+    
+    def __enter__(self):
+        stack = self.tracer._span_stack()
+        current, peak = tracemalloc.get_traced_memory()
+        self.parent = stack[-1] if stack else None
+        if self.parent is not None:
+            self.parent.carried_peak = max(self.parent.carried_peak, peak)
+        tracemalloc.reset_peak()
+        self.start_memory = current
+        self.carried_peak = current
+        stack.append(self)
+        self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        ms = (time.perf_counter() - self.started) * 1000
+        current, peak = tracemalloc.get_traced_memory()
+        peak = max(peak, self.carried_peak)
+        self.tracer._span_stack().pop()
+        if self.parent is not None:
+            self.parent.carried_peak = max(self.parent.carried_peak, peak)
+        self.tracer.record(self.stage, ms, self.url, self.bytes, memory=(peak, current, self.start_memory))
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+# Tracers con memoria vivos; `tracemalloc` se para cuando no queda ninguno
+_memory_lock = threading.Lock()
+_memory_users = 0
+_memory_started = False
+
+
+def _acquire_tracemalloc():
+    global _memory_users, _memory_started
+    with _memory_lock:
+        if not _memory_users and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _memory_started = True
+        _memory_users += 1
+
+
+def _release_tracemalloc():
+    global _memory_users, _memory_started
+    with _memory_lock:
+        _memory_users -= 1
+        if not _memory_users and _memory_started:
+            tracemalloc.stop()
+            _memory_started = False
+
+
+class Tracer:
+    """Registro en memoria (acotado a `max_records`) de la duración de cada etapa
+    
+    Uso: `with tracer.span('parse', url) as span: ...; span.bytes = n`.
+    
+    Con `memory=True` arranca `tracemalloc` (si no estaba activo) hasta
+    `stop_memory()` o hasta que se libere el tracer, mide la memoria de cada etapa
+    y permite vigilar objetos con `watch()` para comprobar que se liberan.
+    """
+    
+    def __init__(self, enabled=True, max_records=100000, memory=False):
+        self.enabled = enabled
+        self.memory = enabled and memory
+        self.records = deque(maxlen=max_records)
+        self.peak_memory = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._watched = deque(maxlen=max_records)
+        self._stopped_memory = None
+        self._release = weakref.finalize(self, _release_tracemalloc) if self.memory else None
+        if self.memory:
+            _acquire_tracemalloc()
+    
+    def stop_memory(self, top=20):
+        """
+        Deja de medir memoria y suelta `tracemalloc` (global del proceso)
+        
+        Antes guarda la memoria actual y los `top` mayores sitios de asignación,
+        que siguen disponibles en `memory_report()` y `top_allocations()`. Hay que
+        llamarlo al terminar el run: un tracer guardado en una sesión no debe
+        mantener `tracemalloc`, y su coste, activo para todo el servidor.
+        """
+        if self._release is None or not self._release.alive:
+            return
+        current = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+        self._stopped_memory = (current, self.top_allocations(top))
+        self._release()
+    
+    def span(self, stage, url=None):
+        if not self.enabled:
+            return _NULL_SPAN
+        if self.memory and self._stopped_memory is None and tracemalloc.is_tracing():
+            return _MemorySpan(self, stage, url)
+        return _Span(self, stage, url)
+    
+    def record(self, stage, ms, url=None, size=None, memory=None):
+        """`memory` es (pico, actual, al entrar) en bytes, de `_MemorySpan`"""
+        if not self.enabled:
+            return
+        record = {
+            'stage': stage,
+            'url': url,
+            'domain': urlparse(url).netloc if url else None,
+            'ms': round(ms, 3),
+            'bytes': size
+        }
+        if memory is not None:
+            peak, current, start = memory
+            record['peak_kb'] = round((peak - start) / 1024, 1)
+            record['retained_kb'] = round((current - start) / 1024, 1)
+        with self._lock:
+            self.records.append(record)
+            if memory is not None:
+                self.peak_memory = max(self.peak_memory, memory[0])
+    
+    def _span_stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+    
+    def watch(self, obj, label=None):
+        """Vigila `obj` (p. ej. un árbol de BeautifulSoup) para saber si se libera"""
+        if not self.memory:
+            return
+        with self._lock:
+            self._watched.append((label, weakref.ref(obj)))
+    
+    def alive(self, collect=False):
+        """Etiquetas de los objetos vigilados que siguen vivos (tras `gc.collect()` con `collect`)"""
+        if collect:
+            gc.collect()
+        with self._lock:
+            return [label for label, ref in self._watched if ref() is not None]
+    
+    def top_allocations(self, limit=10):
+        """Líneas de código con más memoria viva ahora mismo (o al parar): `{site, size_kb, count}`"""
+        if self._stopped_memory is not None:
+            return self._stopped_memory[1][:limit]
+        if not self.memory or not tracemalloc.is_tracing():
+            return []
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'),
+            tracemalloc.Filter(False, '<unknown>'),
+        ])
+        rows = []
+        for stat in snapshot.statistics('lineno')[:limit]:
+            frame = stat.traceback[0]
+            site = os.path.join(*frame.filename.split(os.sep)[-2:])
+            rows.append({
+                'site': f"{site}:{frame.lineno}",
+                'size_kb': round(stat.size / 1024, 1),
+                'count': stat.count
+            })
+        return rows
+    
+    def memory_report(self, top=10):
+        """Pico del run, memoria actual, objetos vigilados aún vivos y mayores sitios de asignación"""
+        if not self.memory:
+            return None
+        if self._stopped_memory is not None:
+            current = self._stopped_memory[0]
+        else:
+            current = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+        alive = self.alive()
+        return {
+            'peak_kb': round(self.peak_memory / 1024, 1),
+            'current_kb': round(current / 1024, 1),
+            'watched': len(self._watched),
+            'alive': len(alive),
+            'alive_after_gc': len(self.alive(collect=True)),
+            'top_allocations': self.top_allocations(top)
+        }
+    
+    def record_response(self, stage, url, response, started):
+        """Tiempo hasta cabeceras, resto de la descarga y bytes de una respuesta de `requests`"""
+        if not self.enabled or response is None:
+            return
+        total = (time.perf_counter() - started) * 1000
+        ttfb = min(response.elapsed.total_seconds() * 1000, total)
+        self.record(f"{stage}.ttfb", ttfb, url)
+        self.record(f"{stage}.download", total - ttfb, url, len(response.content))
+    
+    def clear(self):
+        with self._lock:
+            self.records.clear()
+            self._watched.clear()
+            self.peak_memory = 0
+    
+    def snapshot(self):
+        with self._lock:
+            return list(self.records)
+    
+    def summary(self, by='stage', stage=None):
+        """
+        p50/p95/total (ms) y bytes por etapa, o por (dominio|url, etapa) con `by`
+        
+        Con memoria, cada fila lleva además el mayor `peak_kb` y el `retained_kb`
+        total de la etapa. `stage` limita el resumen a esa etapa.
+        """
+        groups = {}
+        for record in self.snapshot():
+            if stage and record['stage'] != stage:
+                continue
+            key = (record[by] or '-', record['stage']) if by in ('domain', 'url') else (record['stage'],)
+            groups.setdefault(key, []).append(record)
+        
+        rows = []
+        for key, records in sorted(groups.items()):
+            durations = sorted(record['ms'] for record in records)
+            sizes = [record['bytes'] for record in records if record['bytes'] is not None]
+            row = {by: key[0]} if len(key) > 1 else {}
+            row.update({
+                'stage': key[-1],
+                'count': len(durations),
+                'p50_ms': round(percentile(durations, 50), 1),
+                'p95_ms': round(percentile(durations, 95), 1),
+                'total_ms': round(sum(durations), 1),
+                'bytes': sum(sizes) if sizes else None
+            })
+            peaks = [record['peak_kb'] for record in records if 'peak_kb' in record]
+            if peaks:
+                row['peak_kb'] = max(peaks)
+                row['retained_kb'] = round(sum(record['retained_kb'] for record in records if 'retained_kb' in record), 1)
+            rows.append(row)
+        return rows
+    
+    def dump(self, path):
+        """Guarda la traza completa en JSON para analizarla fuera de la app"""
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.to_json())
+    
+    def to_json(self):
+        trace = {'records': self.snapshot(), 'summary': self.summary()}
+        if self.memory:
+            trace['memory'] = self.memory_report()
+        return json.dumps(trace, ensure_ascii=False)
+
+
+# Tracer desactivado por defecto de los analizadores
+NULL_TRACER = Tracer(enabled=False, max_records=0)
+
+
+def traced(stage):
+    """Decorador de métodos: registra su duración en `self.tracer` como `stage`"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.tracer.span(stage):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def percentile(sorted_values, q):
+    """Percentil con interpolación lineal sobre una lista ya ordenada"""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
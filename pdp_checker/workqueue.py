@@ -0,0 +1,380 @@
+"""
+Cola de trabajo para repartir la extracción de URLs entre procesos y máquinas
+
+Los productores encolan URLs y cada worker reclama trabajos con un lease
+(tiempo de visibilidad): si el worker muere, el trabajo vuelve a estar
+disponible al vencer el lease. Cada fallo suma un intento y, al llegar a
+`max_attempts`, el trabajo pasa a la cola de descartados (dead-letter).
+
+`WorkQueue` define la interfaz; `SQLiteWorkQueue` es la implementación local.
+Para otros brokers (Redis, SQS...) basta con implementar los mismos métodos.
+"""
+
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.parse import urlparse
+
+from pdp_checker.canonical import dedupe_urls
+from pdp_checker.throttle import DomainLimiter
+
+logger = logging.getLogger('pdp_checker.workqueue')
+
+# Estados de un trabajo
+PENDING = 'pending'
+LEASED = 'leased'
+DONE = 'done'
+DEAD = 'dead'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    batch TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,
+    lease_until REAL,
+    worker TEXT,
+    last_error TEXT,
+    result BLOB,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs (status, available_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_batch ON jobs (batch, id);
+"""
+
+
+def default_worker_id():
+    """Identificador del worker: host + pid"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class WorkQueue:
+    """Interfaz de una cola de trabajo con leases, reintentos y dead-letter
+    
+    Un trabajo es un dict {'id', 'batch', 'payload', 'attempts'} con `payload`
+    serializable en JSON.
+    """
+    
+    def enqueue(self, payloads, batch='default'):
+        """Añade trabajos; devuelve cuántos se han encolado"""
+        raise NotImplementedError
+    
+    def claim(self, worker_id, lease_seconds=None):
+        """Reclama el siguiente trabajo disponible, o None si no hay ninguno"""
+        raise NotImplementedError
+    
+    def extend_lease(self, job_id, worker_id, lease_seconds=None):
+        """Prolonga el lease de un trabajo en curso; False si ya no es del worker"""
+        raise NotImplementedError
+    
+    def complete(self, job_id, worker_id, result=None):
+        """Marca un trabajo como terminado y guarda su resultado"""
+        raise NotImplementedError
+    
+    def fail(self, job_id, worker_id, error):
+        """Devuelve un trabajo a la cola (o a dead-letter si agotó los intentos)"""
+        raise NotImplementedError
+    
+    def stats(self, batch=None):
+        """Número de trabajos por estado"""
+        raise NotImplementedError
+    
+    def results(self, batch):
+        """(payload, result) de los trabajos terminados de un batch, en orden de encolado"""
+        raise NotImplementedError
+    
+    def dead_letters(self, batch=None):
+        """Trabajos descartados con su último error"""
+        raise NotImplementedError
+    
+    def requeue_dead(self, batch=None):
+        """Vuelve a encolar los trabajos descartados; devuelve cuántos"""
+        raise NotImplementedError
+
+
+class SQLiteWorkQueue(WorkQueue):
+    """Cola sobre un fichero SQLite compartido (WAL)
+    
+    Cada proceso abre su propia conexión; el reclamo de trabajos se hace en una
+    transacción `BEGIN IMMEDIATE`, así que dos workers nunca obtienen el mismo
+    trabajo. Para varias máquinas, el fichero debe estar en un disco compartido
+    con bloqueos fiables; si no, usa otra implementación de `WorkQueue`.
+    """
+    
+    def __init__(self, path, visibility_timeout=300, max_attempts=3, retry_backoff=30):
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.executescript(SCHEMA)
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
+    
+    def enqueue(self, payloads, batch='default'):
+        now = time.time()
+        stamp = datetime.now().isoformat()
+        rows = [(batch, json.dumps(payload, ensure_ascii=False), now, stamp, stamp) for payload in payloads]
+        if not rows:
+            return 0
+        
+        with self._transaction():
+            self._conn.executemany(
+                'INSERT INTO jobs (batch, payload, available_at, created_at, updated_at) VALUES (?, ?, ?, ?, ?)',
+                rows
+            )
+        return len(rows)
+    
+    def claim(self, worker_id, lease_seconds=None):
+        lease_seconds = lease_seconds or self.visibility_timeout
+        now = time.time()
+        
+        with self._transaction():
+            # Leases vencidos que ya agotaron sus intentos: a dead-letter
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, last_error = COALESCE(last_error, 'lease vencido'), updated_at = ? "
+                "WHERE status = ? AND lease_until < ? AND attempts >= ?",
+                (DEAD, datetime.now().isoformat(), LEASED, now, self.max_attempts)
+            )
+            row = self._conn.execute(
+                'SELECT id, batch, payload, attempts FROM jobs '
+                'WHERE (status = ? AND available_at <= ?) OR (status = ? AND lease_until < ?) '
+                'ORDER BY id LIMIT 1',
+                (PENDING, now, LEASED, now)
+            ).fetchone()
+            if row is None:
+                return None
+            
+            self._conn.execute(
+                'UPDATE jobs SET status = ?, attempts = attempts + 1, lease_until = ?, worker = ?, updated_at = ? '
+                'WHERE id = ?',
+                (LEASED, now + lease_seconds, worker_id, datetime.now().isoformat(), row['id'])
+            )
+        
+        return {
+            'id': row['id'],
+            'batch': row['batch'],
+            'payload': json.loads(row['payload']),
+            'attempts': row['attempts'] + 1
+        }
+    
+    def extend_lease(self, job_id, worker_id, lease_seconds=None):
+        lease_seconds = lease_seconds or self.visibility_timeout
+        with self._transaction():
+            cursor = self._conn.execute(
+                'UPDATE jobs SET lease_until = ?, updated_at = ? WHERE id = ? AND status = ? AND worker = ?',
+                (time.time() + lease_seconds, datetime.now().isoformat(), job_id, LEASED, worker_id)
+            )
+        return cursor.rowcount == 1
+    
+    def complete(self, job_id, worker_id, result=None):
+        body = zlib.compress(json.dumps(result, ensure_ascii=False).encode('utf-8'))
+        with self._transaction():
+            cursor = self._conn.execute(
+                'UPDATE jobs SET status = ?, result = ?, lease_until = NULL, last_error = NULL, updated_at = ? '
+                'WHERE id = ? AND status = ? AND worker = ?',
+                (DONE, body, datetime.now().isoformat(), job_id, LEASED, worker_id)
+            )
+        return cursor.rowcount == 1
+    
+    def fail(self, job_id, worker_id, error):
+        with self._transaction():
+            row = self._conn.execute(
+                'SELECT attempts FROM jobs WHERE id = ? AND status = ? AND worker = ?',
+                (job_id, LEASED, worker_id)
+            ).fetchone()
+            if row is None:
+                return False
+            
+            if row['attempts'] >= self.max_attempts:
+                status, available_at = DEAD, time.time()
+            else:
+                # Backoff lineal: cada intento espera un poco más
+                status, available_at = PENDING, time.time() + self.retry_backoff * row['attempts']
+            
+            self._conn.execute(
+                'UPDATE jobs SET status = ?, available_at = ?, lease_until = NULL, last_error = ?, updated_at = ? '
+                'WHERE id = ?',
+                (status, available_at, str(error), datetime.now().isoformat(), job_id)
+            )
+        return True
+    
+    def stats(self, batch=None):
+        sql = 'SELECT status, COUNT(*) AS n FROM jobs'
+        params = ()
+        if batch:
+            sql += ' WHERE batch = ?'
+            params = (batch,)
+        with self._lock:
+            counts = {row['status']: row['n'] for row in self._conn.execute(sql + ' GROUP BY status', params)}
+        return {status: counts.get(status, 0) for status in (PENDING, LEASED, DONE, DEAD)}
+    
+    def results(self, batch):
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT payload, result FROM jobs WHERE batch = ? AND status = ? ORDER BY id',
+                (batch, DONE)
+            ).fetchall()
+        return [
+            (json.loads(row['payload']), json.loads(zlib.decompress(row['result']).decode('utf-8')))
+            for row in rows
+        ]
+    
+    def dead_letters(self, batch=None):
+        sql = 'SELECT id, batch, payload, attempts, last_error, updated_at FROM jobs WHERE status = ?'
+        params = [DEAD]
+        if batch:
+            sql += ' AND batch = ?'
+            params.append(batch)
+        with self._lock:
+            rows = self._conn.execute(sql + ' ORDER BY id', params).fetchall()
+        return [dict(row, payload=json.loads(row['payload'])) for row in rows]
+    
+    def requeue_dead(self, batch=None):
+        sql = 'UPDATE jobs SET status = ?, attempts = 0, available_at = ?, updated_at = ? WHERE status = ?'
+        params = [PENDING, time.time(), datetime.now().isoformat(), DEAD]
+        if batch:
+            sql += ' AND batch = ?'
+            params.append(batch)
+        with self._transaction():
+            cursor = self._conn.execute(sql, params)
+        return cursor.rowcount
+    
+    def _transaction(self):
+        return _ImmediateTransaction(self._conn, self._lock)
+
+
+class _ImmediateTransaction:
+    """`BEGIN IMMEDIATE` ... `COMMIT` (o `ROLLBACK` si hay excepción)"""
+    
+    def __init__(self, conn, lock):
+        self.conn = conn
+        self.lock = lock
+    
+    def __enter__(self):
+        self.lock.acquire()
+        try:
+            self.conn.execute('BEGIN IMMEDIATE')
+        except Exception:
+            self.lock.release()
+            raise
+        return self.conn
+    
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+        finally:
+            self.lock.release()
+
+
+def enqueue_urls(queue, all_urls, batch):
+    """Encola una lista de (role, url) como trabajos de extracción, sin URLs canónicas repetidas"""
+    all_urls, _ = dedupe_urls(all_urls)
+    return queue.enqueue([{'role': role, 'url': url} for role, url in all_urls], batch=batch)
+
+
+def collect_results(queue, batch):
+    """Resultados de un batch con el formato de `iter_url_results` (para `split_results`)"""
+    return [
+        {'index': i, 'role': payload['role'], 'url': payload['url'], 'data': data, 'resumed': False}
+        for i, (payload, data) in enumerate(queue.results(batch))
+    ]
+
+
+def run_worker(queue, analyzer, worker_id=None, store=None, rotate_headers=False, use_zenrow=False,
+               poll_interval=2.0, exit_when_empty=False, stop_event=None, sleep=time.sleep,
+               lease_seconds=300, domain_limiter=None):
+    """
+    Bucle de un worker: reclama, extrae con `extract_content_from_url` y devuelve el resultado
+    
+    Si la extracción falla, el trabajo vuelve a la cola; el reintento usa
+    rotación de headers. Mientras se extrae, el lease se renueva cada tercio de
+    `lease_seconds`, y cada descarga ocupa una plaza de su dominio en
+    `domain_limiter` (por defecto, una a la vez por dominio). Con `store`, cada
+    producto extraído se guarda además en el histórico de snapshots, solo si el
+    trabajo seguía siendo de este worker. Devuelve el número de trabajos procesados.
+    """
+    worker_id = worker_id or default_worker_id()
+    domain_limiter = domain_limiter or DomainLimiter()
+    processed = 0
+    
+    while not (stop_event and stop_event.is_set()):
+        job = queue.claim(worker_id, lease_seconds)
+        if job is None:
+            if exit_when_empty and not _has_pending_work(queue):
+                break
+            sleep(poll_interval)
+            continue
+        
+        url = job['payload']['url']
+        if job['attempts'] > 1:
+            analyzer.metrics.record_retry(url)
+        try:
+            with _renewing_lease(queue, job['id'], worker_id, lease_seconds):
+                with domain_limiter.slot(urlparse(url).netloc):
+                    data = analyzer.extract_content_from_url(url, rotate_headers or job['attempts'] > 1, use_zenrow)
+        except Exception as e:
+            data = None
+            logger.warning("Error inesperado con %s: %s", url, e)
+        
+        if data:
+            if not queue.complete(job['id'], worker_id, data):
+                # El lease venció y otro worker reclamó el trabajo: su resultado es el que cuenta
+                logger.warning("[%s] Lease perdido, se descarta el resultado de %s", worker_id, url)
+            else:
+                if store is not None:
+                    store.save_products([data], run_id=job['batch'])
+                logger.info("[%s] OK %s", worker_id, url)
+        else:
+            queue.fail(job['id'], worker_id, 'extracción fallida')
+            logger.info("[%s] FALLO (intento %d) %s", worker_id, job['attempts'], url)
+        processed += 1
+    
+    return processed
+
+
+@contextmanager
+def _renewing_lease(queue, job_id, worker_id, lease_seconds):
+    """Prolonga el lease de un trabajo cada tercio de `lease_seconds` mientras dura el bloque"""
+    done = threading.Event()
+    
+    def renew():
+        while not done.wait(lease_seconds / 3):
+            if not queue.extend_lease(job_id, worker_id, lease_seconds):
+                return
+    
+    thread = threading.Thread(target=renew, name=f"lease-{job_id}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        done.set()
+        thread.join()
+
+
+def _has_pending_work(queue):
+    """True si quedan trabajos pendientes (p. ej. en backoff) o en curso en otros workers"""
+    stats = queue.stats()
+    return stats[PENDING] > 0 or stats[LEASED] > 0
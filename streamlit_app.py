@@ -1,28 +1,38 @@
 import streamlit as st
-import requests
-from bs4 import BeautifulSoup
 import pandas as pd
-from collections import Counter
 import re
-from urllib.parse import urlparse, quote_plus
 import time
 import nltk
 import matplotlib.pyplot as plt
 import seaborn as sns
 import plotly.express as px
 import plotly.graph_objects as go
+from plotly.subplots import make_subplots
 import warnings
-import json
-import random
 from datetime import datetime
 import os
+import hashlib
+from urllib.parse import urlparse
 
-# Importar wordcloud de forma opcional
-try:
-    from wordcloud import WordCloud
-    WORDCLOUD_AVAILABLE = True
-except ImportError:
-    WORDCLOUD_AVAILABLE = False
+from pdp_checker.analyzer import ExtractionCache, ProductBenchmarkAnalyzer, extraction_plan, format_gaps_report
+from pdp_checker.canonical import dedupe_urls
+from pdp_checker.comparison import MATRIX_ATTRIBUTES, RADAR_ATTRIBUTES, aggregate, incomplete_fields, product_metrics, top_k
+from pdp_checker.deepcrawl import DeepCrawler, select_targets
+from pdp_checker.events import EventSink, LoggingEventSink
+from pdp_checker.export import EXPORT_FORMATS, available_formats, export_products
+from pdp_checker.frontier import CategoryFrontier
+from pdp_checker.journal import RunJournal, list_runs, new_run_id
+from pdp_checker.runner import AnalysisRun, iter_url_results
+from pdp_checker.shopping import GoogleShoppingAnalyzer, QueryResultCache
+from pdp_checker.store import SnapshotStore
+from pdp_checker.metrics import ScrapeMetrics
+from pdp_checker.trace import Tracer
+from pdp_checker.bulk import BulkShoppingRunner, parse_queries, RESULT_COLUMNS as BULK_RESULT_COLUMNS
+from pdp_checker.render import WORDCLOUD_AVAILABLE, ImageRenderService
+
+
+# Directorio donde se guardan los runs (progreso, journals)
+RUNS_DIR = os.environ.get("PDP_RUNS_DIR", "runs")
 
 # Suprimir advertencias
 warnings.filterwarnings('ignore')
@@ -164,7 +174,6 @@ def main():
     # Configuración avanzada
     st.sidebar.subheader("🔧 Configuración Avanzada")
     
-    top_n = st.sidebar.slider("📊 Top N resultados", 5, 50, 20)
     delay = st.sidebar.slider("⏱️ Delay entre requests (seg)", 0.5, 5.0, 2.0, 0.5)
     
     st.sidebar.markdown("**🛡️ Anti-detección:**")
@@ -183,6 +192,25 @@ def main():
             st.sidebar.warning("⚠️ Ingresa tu clave API de ZenRows para habilitar la función")
             use_zenrow = False
     
+    reuse_unchanged = st.sidebar.checkbox(
+        "♻️ Reutilizar páginas sin cambios",
+        value=True,
+        help="Si el texto de una página apenas ha cambiado desde el último análisis, se reutiliza su extracción anterior"
+    )
+    
+    trace_latency = st.sidebar.checkbox(
+        "⏱️ Diagnóstico de latencias",
+        value=False,
+        help="Registra cuánto tarda cada etapa (descarga, parseo, extractores, análisis) por URL"
+    )
+    
+    profile_memory = st.sidebar.checkbox(
+        "🧠 Perfil de memoria",
+        value=False,
+        help="Mide con tracemalloc el pico y la memoria retenida por etapa y URL. Hace el análisis bastante más lento"
+    )
+    trace_enabled = trace_latency or profile_memory
+    
     if aggressive_mode:
         delay = max(delay, 3.0)
     
@@ -225,9 +253,8 @@ https://www.aliexpress.com/item/1005001234567890.html""",
             st.warning("pccomponentes.com")
         
         # Validación de URLs
+        all_urls = []
         if urls_input.strip() or reference_url.strip():
-            all_urls = []
-            
             if reference_url.strip() and reference_url.startswith(('http://', 'https://')):
                 all_urls.append(('reference', reference_url.strip()))
             
@@ -237,8 +264,13 @@ https://www.aliexpress.com/item/1005001234567890.html""",
                     if url.startswith(('http://', 'https://')):
                         all_urls.append(('competitor', url))
             
+            # Misma ficha con otro tracking, afiliado o host móvil: se descarga una vez
+            all_urls, duplicate_count = dedupe_urls(all_urls)
+            
             if all_urls:
                 st.success(f"✅ {len(all_urls)} URLs válidas detectadas")
+                if duplicate_count:
+                    st.caption(f"🔗 {duplicate_count} URL(s) repetidas descartadas (mismo producto tras normalizar la URL)")
         
         # Botón de análisis
         col1, col2, col3 = st.columns([1, 2, 1])
@@ -250,8 +282,82 @@ https://www.aliexpress.com/item/1005001234567890.html""",
                 disabled=not (urls_input.strip() or reference_url.strip())
             )
         
-        if analyze_button:
-            analyzer = ProductBenchmarkAnalyzer(use_zenrow=use_zenrow, zenrow_api_key=zenrow_api_key)
+        # Reanudar un run interrumpido (recarga de página, sesión caída...)
+        resume_button = False
+        incomplete_runs = get_incomplete_runs()
+        if incomplete_runs:
+            with st.expander(f"🔁 Reanudar análisis interrumpido ({len(incomplete_runs)})"):
+                run_labels = {
+                    f"{run['run_id']} · {run['ok']}/{run['total']} completadas, {run['failed']} fallidas": run['run_id']
+                    for run in incomplete_runs[:20]
+                }
+                selected_run = st.selectbox("Run guardado", list(run_labels))
+                st.caption("Solo se procesarán las URLs pendientes o fallidas")
+                resume_button = st.button("🔁 Reanudar run", use_container_width=True)
+        
+        # Fichas descubiertas desde listados de la competencia, sin pegarlas a mano
+        with st.expander("🕸️ Descubrir fichas desde páginas de categoría"):
+            category_input = st.text_area(
+                "URLs de categoría o listado (una por línea):",
+                placeholder="https://www.tienda.com/audio/auriculares",
+                help="Se siguen la paginación y las tarjetas de producto de cada listado"
+            )
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                category_pages = st.number_input("Listados máximos", min_value=1, max_value=100, value=10)
+            with col2:
+                category_products = st.number_input("Fichas máximas", min_value=1, max_value=500, value=50)
+            with col3:
+                follow_subcategories = st.checkbox("Seguir subcategorías", value=False)
+            
+            category_seeds = [
+                line.strip() for line in category_input.splitlines()
+                if line.strip().startswith(('http://', 'https://'))
+            ]
+            if st.button("🕸️ Descubrir y analizar", use_container_width=True, disabled=not category_seeds):
+                render_category_crawl(
+                    category_seeds,
+                    max_pages=int(category_pages),
+                    max_products=int(category_products),
+                    subcategories=follow_subcategories,
+                    reuse_unchanged=reuse_unchanged,
+                    use_zenrow=use_zenrow,
+                    zenrow_api_key=zenrow_api_key,
+                    delay=delay,
+                    tracer=Tracer(memory=profile_memory) if trace_enabled else None
+                )
+        
+        if analyze_button and not all_urls:
+            st.error("❌ No hay ninguna URL válida: cada línea debe empezar por http:// o https://")
+        
+        if (analyze_button and all_urls) or resume_button:
+            # Journal del run: cada URL se guarda en cuanto termina
+            if resume_button:
+                journal = RunJournal.load(RUNS_DIR, run_labels[selected_run])
+                all_urls = journal.all_urls
+            else:
+                journal = RunJournal.create(RUNS_DIR, all_urls)
+            st.session_state['run_id'] = journal.run_id
+            tracer = Tracer(memory=profile_memory) if trace_enabled else None
+            
+            analyzer = ProductBenchmarkAnalyzer(
+                use_zenrow=use_zenrow,
+                zenrow_api_key=zenrow_api_key,
+                events=StreamlitEventSink(),
+                fingerprints=get_snapshot_store() if reuse_unchanged else None,
+                cache=get_extraction_cache(),
+                fields=extraction_plan(
+                    name for name, enabled in [
+                        ('terms', analyze_terms),
+                        ('filters', analyze_filters),
+                        ('features', analyze_features),
+                        ('gaps', analyze_gaps),
+                        ('pricing', analyze_pricing)
+                    ] if enabled
+                ),
+                tracer=tracer,
+                metrics=get_scrape_metrics()
+            )
             
             # Progreso
             st.markdown("### 🔄 Procesando URLs...")
@@ -267,262 +373,96 @@ https://www.aliexpress.com/item/1005001234567890.html""",
             with col3:
                 total_metric = st.metric("📊 Total", len(all_urls))
             
-            reference_data = None
-            competitor_data = []
+            st.caption(f"🗂️ Run `{journal.run_id}`")
+            
+            results = []
             failed_count = 0
             success_count = 0
             
+            def show_retry(i, url_type, url):
+                status_text.markdown(f'🔄 **Reintentando...**')
+            
+            status_text.markdown(f'🔍 **Procesando {all_urls[0][0]} 1/{len(all_urls)}**  \n`{all_urls[0][1][:70]}...`')
+            
             # Procesar cada URL
-            for i, (url_type, url) in enumerate(all_urls):
-                status_text.markdown(f'🔍 **Procesando {url_type} {i+1}/{len(all_urls)}**  \n`{url[:70]}...`')
-                
-                if i > 0:
-                    time.sleep(delay * 1.5 if aggressive_mode else delay)
+            for result in iter_url_results(
+                analyzer,
+                all_urls,
+                delay=delay,
+                aggressive_mode=aggressive_mode,
+                retry_403=retry_403,
+                rotate_headers=rotate_headers,
+                use_zenrow=use_zenrow,
+                on_retry=show_retry,
+                journal=journal
+            ):
+                results.append(result)
+                i = result['index']
                 
-                data = analyzer.extract_content_from_url(url, rotate_headers, use_zenrow)
-                
-                if data:
-                    if url_type == 'reference':
-                        reference_data = data
-                    else:
-                        competitor_data.append(data)
+                if result['data']:
                     success_count += 1
                     success_metric.metric("✅ Exitosos", success_count)
                 else:
                     failed_count += 1
                     failed_metric.metric("❌ Fallidos", failed_count)
-                    
-                    # Retry si está habilitado
-                    if retry_403:
-                        status_text.markdown(f'🔄 **Reintentando...**')
-                        time.sleep(5)
-                        retry_data = analyzer.extract_content_from_url(url, True, use_zenrow)
-                        if retry_data:
-                            if url_type == 'reference':
-                                reference_data = retry_data
-                            else:
-                                competitor_data.append(retry_data)
-                            success_count += 1
-                            failed_count -= 1
-                            success_metric.metric("✅ Exitosos", success_count)
-                            failed_metric.metric("❌ Fallidos", failed_count)
                 
                 progress_bar.progress((i + 1) / len(all_urls))
+                if i + 1 < len(all_urls):
+                    next_type, next_url = all_urls[i + 1]
+                    status_text.markdown(f'🔍 **Procesando {next_type} {i+2}/{len(all_urls)}**  \n`{next_url[:70]}...`')
             
             status_text.markdown('✅ **Análisis completado**')
             
-            # Guardar datos en session state
-            st.session_state['reference_data'] = reference_data
-            st.session_state['competitor_data'] = competitor_data
-            st.session_state['all_data'] = [reference_data] if reference_data else [] + competitor_data
-            
-            if not st.session_state['all_data']:
-                st.error("❌ No se pudo extraer información de ninguna URL.")
-                return
-            
-            # Mensaje de éxito
-            st.markdown(f"""
-            <div class="success-message">
-                <strong>🎉 ¡Análisis completado!</strong><br>
-                Se procesaron <strong>{success_count}</strong> de <strong>{len(all_urls)}</strong> productos
-            </div>
-            """, unsafe_allow_html=True)
-            
-            # Pestañas de resultados
-            result_tabs = st.tabs([
-                "📊 Resumen", 
-                "🎯 Análisis de GAPS",
-                "🔤 Términos", 
-                "🎛️ Filtros", 
-                "⭐ Características",
-                "💰 Precios",
-                "📈 Visualizaciones",
-                "💾 Exportar"
-            ])
+            run = AnalysisRun(
+                journal.run_id,
+                results,
+                total=len(all_urls),
+                cache_hits=analyzer.cache_hits,
+                tracer=tracer
+            )
             
-            with result_tabs[0]:  # Resumen
-                st.header("📊 Resumen del Análisis")
-                
-                # Métricas principales
-                col1, col2, col3, col4 = st.columns(4)
-                
-                all_data = st.session_state['all_data']
-                
-                with col1:
-                    st.metric("🔗 Productos Analizados", len(all_data))
-                
-                with col2:
-                    total_features = sum(len(data.get('features', [])) for data in all_data)
-                    st.metric("⭐ Total Características", total_features)
-                
-                with col3:
-                    total_specs = sum(len(data.get('specifications', {})) for data in all_data)
-                    st.metric("🔧 Total Especificaciones", total_specs)
-                
-                with col4:
-                    products_with_price = sum(1 for data in all_data if data.get('price'))
-                    st.metric("💰 Con Precio", products_with_price)
-                
-                # Tabla resumen
-                summary_data = []
-                for i, data in enumerate(all_data):
-                    is_reference = (i == 0 and reference_data)
-                    summary_data.append({
-                        'Tipo': '🎯 Referencia' if is_reference else f'🔍 Competidor {i}',
-                        'Dominio': data.get('domain', 'N/A'),
-                        'Título': data.get('title', 'Sin título')[:60] + '...',
-                        'Precio': data.get('price', 'N/A'),
-                        'Características': len(data.get('features', [])),
-                        'Especificaciones': len(data.get('specifications', {})),
-                        'Filtros': len(data.get('filters', []))
-                    })
-                
-                df_summary = pd.DataFrame(summary_data)
-                st.dataframe(df_summary, use_container_width=True, hide_index=True)
+            if run.resumed_count:
+                st.info(f"🔁 {run.resumed_count} URL(s) recuperadas del run guardado sin volver a descargarlas")
+            if run.cache_hits:
+                st.caption(f"⚡ {run.cache_hits} URL(s) servidas desde la caché compartida (extraídas hace menos de {get_extraction_cache().ttl // 60} min)")
+            
+            # Informe de páginas cambiadas frente a las reutilizadas por huella
+            unchanged_urls = run.unchanged_urls()
+            if unchanged_urls:
+                changed_urls = run.changed_urls()
+                st.info(
+                    f"♻️ {len(unchanged_urls)} página(s) sin cambios desde el último análisis; "
+                    f"{len(changed_urls)} con cambios o nuevas"
+                )
+                with st.expander("Ver páginas cambiadas / sin cambios"):
+                    st.dataframe(
+                        pd.DataFrame(
+                            [{'URL': url, 'Estado': '🆕 Cambiada'} for url in changed_urls] +
+                            [{'URL': url, 'Estado': '♻️ Sin cambios'} for url in unchanged_urls]
+                        ),
+                        use_container_width=True,
+                        hide_index=True
+                    )
             
-            with result_tabs[1]:  # Análisis de GAPS
-                st.header("🎯 Análisis de GAPS")
-                
-                if reference_data and competitor_data:
-                    gaps = analyzer.analyze_gaps(reference_data, competitor_data)
-                    
-                    # Características únicas de la competencia
-                    if gaps['unique_competitor_features']:
-                        st.subheader("⚡ Características que tiene la competencia")
-                        st.markdown('<div class="warning-message">', unsafe_allow_html=True)
-                        st.markdown("**Oportunidades de mejora detectadas:**")
-                        for feature in gaps['unique_competitor_features'][:10]:
-                            st.markdown(f"• {feature}")
-                        st.markdown('</div>', unsafe_allow_html=True)
-                    
-                    # Especificaciones faltantes
-                    if gaps['missing_specs']:
-                        st.subheader("📋 Especificaciones faltantes")
-                        cols = st.columns(3)
-                        for i, spec in enumerate(gaps['missing_specs'][:12]):
-                            cols[i % 3].warning(f"📌 {spec}")
-                    
-                    # Filtros que usa la competencia
-                    if gaps['missing_filters']:
-                        st.subheader("🎛️ Filtros adicionales en competencia")
-                        st.info("Considera añadir estos filtros a tu tienda:")
-                        filter_df = pd.DataFrame(
-                            {'Filtro': gaps['missing_filters'][:20]},
-                            index=range(1, min(21, len(gaps['missing_filters'])+1))
-                        )
-                        st.dataframe(filter_df, use_container_width=True)
-                    
-                    # Análisis de precio
-                    if gaps['price_difference']:
-                        st.subheader("💰 Análisis de Precio")
-                        price_data = gaps['price_difference']
-                        
-                        col1, col2, col3 = st.columns(3)
-                        with col1:
-                            st.metric("Tu Precio", f"{price_data['reference']:.2f}€")
-                        with col2:
-                            st.metric("Promedio Competencia", f"{price_data['competitors_avg']:.2f}€")
-                        with col3:
-                            diff_color = "🟢" if price_data['difference'] < 0 else "🔴"
-                            st.metric(
-                                "Diferencia",
-                                f"{abs(price_data['difference']):.2f}€",
-                                f"{diff_color} {abs(price_data['percentage']):.1f}%"
-                            )
-                        
-                        if price_data['percentage'] > 20:
-                            st.warning("⚠️ Tu precio es significativamente mayor que la competencia")
-                        elif price_data['percentage'] < -20:
-                            st.info("💡 Tu precio es muy competitivo, podrías considerar ajustarlo")
-                
-                else:
-                    st.info("💡 Añade una URL de referencia y URLs de competencia para ver el análisis de gaps")
+            # Histórico persistente: una escritura por lotes por run
+            get_snapshot_store().save_products(run.all_data, run_id=run.run_id)
+            get_incomplete_runs.clear()
             
-            # Resto de pestañas con análisis tradicionales...
-            with result_tabs[2]:  # Términos
-                if analyze_terms:
-                    st.header("🔤 Términos Más Relevantes")
-                    terms = analyzer.analyze_terms(all_data)
-                    top_terms = terms.most_common(top_n)
-                    
-                    if top_terms:
-                        df_terms = pd.DataFrame(top_terms, columns=['Término', 'Frecuencia'])
-                        
-                        fig = px.bar(
-                            df_terms, 
-                            x='Frecuencia', 
-                            y='Término',
-                            orientation='h',
-                            color='Frecuencia',
-                            color_continuous_scale='viridis',
-                            title="Términos clave más frecuentes"
-                        )
-                        fig.update_layout(height=600, yaxis={'categoryorder':'total ascending'})
-                        st.plotly_chart(fig, use_container_width=True)
+            # Guardar el run en session state: los reruns siguientes solo lo vuelven a pintar
+            st.session_state['url_run'] = run
+            st.session_state['reference_data'] = run.reference_data
+            st.session_state['competitor_data'] = run.competitor_data
+            st.session_state['all_data'] = run.all_data
             
-            with result_tabs[7]:  # Exportar
-                st.header("💾 Exportar Resultados")
-                
-                # Preparar datos para exportación
-                export_data = []
-                
-                for i, data in enumerate(all_data):
-                    is_reference = (i == 0 and reference_data)
-                    export_data.append({
-                        'Tipo': 'Referencia' if is_reference else 'Competidor',
-                        'URL': data.get('url', ''),
-                        'Dominio': data.get('domain', ''),
-                        'Título': data.get('title', ''),
-                        'Descripción': data.get('description', '')[:500],
-                        'Precio': data.get('price', ''),
-                        'Características': ' | '.join(data.get('features', [])),
-                        'Especificaciones': json.dumps(data.get('specifications', {}), ensure_ascii=False),
-                        'Filtros': ' | '.join(data.get('filters', [])),
-                        'Categorías': ' | '.join(data.get('categories', [])),
-                        'Fecha_Extracción': data.get('extracted_at', '')
-                    })
-                
-                df_export = pd.DataFrame(export_data)
-                
-                # Botón de descarga
-                csv = df_export.to_csv(index=False, encoding='utf-8')
-                
-                col1, col2 = st.columns(2)
-                
-                with col1:
-                    st.download_button(
-                        label="📥 Descargar Análisis Completo (CSV)",
-                        data=csv,
-                        file_name=f"analisis_competitivo_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                        mime="text/csv",
-                        use_container_width=True
-                    )
-                
-                with col2:
-                    # Exportar solo gaps si existe
-                    if reference_data and competitor_data:
-                        gaps = analyzer.analyze_gaps(reference_data, competitor_data)
-                        gaps_text = f"""ANÁLISIS DE GAPS - {datetime.now().strftime('%Y-%m-%d %H:%M')}
-                        
-CARACTERÍSTICAS ÚNICAS DE COMPETENCIA:
-{chr(10).join('• ' + f for f in gaps['unique_competitor_features'][:20])}
-
-ESPECIFICACIONES FALTANTES:
-{chr(10).join('• ' + s for s in gaps['missing_specs'][:20])}
-
-FILTROS ADICIONALES EN COMPETENCIA:
-{chr(10).join('• ' + f for f in gaps['missing_filters'][:20])}
-
-ANÁLISIS DE PRECIO:
-{json.dumps(gaps['price_difference'], indent=2) if gaps['price_difference'] else 'No disponible'}
-"""
-                        st.download_button(
-                            label="📥 Descargar Análisis de GAPS (TXT)",
-                            data=gaps_text,
-                            file_name=f"gaps_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt",
-                            mime="text/plain",
-                            use_container_width=True
-                        )
+            if not run.all_data:
+                st.error("❌ No se pudo extraer información de ninguna URL.")
+        
+        # Resultados del último run, sin volver a tocar la red
+        url_run = st.session_state.get('url_run')
+        if url_run and url_run.all_data:
+            render_url_results(url_run, analyze_terms=analyze_terms, show_wordcloud=show_wordcloud)
+    
+        render_scrape_health(get_scrape_metrics())
     
     with tab2:  # Google Shopping
         st.header("🛒 Análisis con Google Shopping")
@@ -534,13 +474,69 @@ ANÁLISIS DE PRECIO:
             help="Describe el producto para buscar en el mercado"
         )
         
-        num_results = st.slider("Número de resultados", 5, 30, 15)
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            num_results = st.slider("Número de resultados", 5, 200, 15)
+        with col2:
+            max_pages = st.number_input(
+                "Páginas máximas",
+                min_value=1,
+                max_value=20,
+                value=max(2, -(-num_results // GoogleShoppingAnalyzer.PAGE_SIZE) + 1),
+                help="Presupuesto de páginas de resultados a recorrer"
+            )
+        
+        deep_crawl = st.checkbox(
+            "🔎 Analizar también las fichas de producto",
+            value=False,
+            help="Descarga en paralelo las fichas de las tiendas de los resultados y las lleva a la pestaña de Comparación"
+        )
+        if deep_crawl:
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                top_per_store = st.number_input("Fichas por tienda", min_value=1, max_value=10, value=2)
+            with col2:
+                crawl_budget = st.number_input(
+                    "Máximo de fichas", min_value=1, max_value=100, value=20,
+                    help="Presupuesto total de descargas de fichas"
+                )
+            with col3:
+                crawl_store = st.text_input(
+                    "Tu tienda (opcional)", placeholder="pccomponentes",
+                    help="Su primera ficha será la referencia del análisis de gaps"
+                )
         
         if st.button("🔍 Buscar en Google Shopping", type="primary", disabled=not search_query):
-                shopping_analyzer = GoogleShoppingAnalyzer()
+                shopping_tracer = Tracer(memory=profile_memory) if trace_enabled else None
+                shopping_analyzer = GoogleShoppingAnalyzer(
+                    cache=get_shopping_cache(), tracer=shopping_tracer, metrics=get_scrape_metrics()
+                )
+                
+                # Mostrar filas a medida que llegan las páginas (un refresco por página)
+                products = []
+                live_status = st.empty()
+                live_table = st.empty()
                 
                 with st.spinner("Buscando productos en Google Shopping..."):
-                    products, error = shopping_analyzer.search_products_free(search_query, num_results)
+                    for page in shopping_analyzer.iter_pages(search_query, num_results, max_pages=int(max_pages)):
+                        products.extend(page)
+                        live_status.caption(f"🔄 {len(products)}/{num_results} productos recibidos...")
+                        live_table.dataframe(
+                            pd.DataFrame([{
+                                'Título': p.get('title', '')[:80],
+                                'Precio': p.get('price', 'N/A'),
+                                'Tienda': p.get('source', 'N/A')
+                            } for p in products]),
+                            use_container_width=True,
+                            hide_index=True
+                        )
+                error = shopping_analyzer.last_error
+                live_status.empty()
+                if shopping_analyzer.cache_hits:
+                    st.caption(f"⚡ {shopping_analyzer.cache_hits} página(s) servidas desde caché")
+                if shopping_tracer is not None:
+                    shopping_tracer.stop_memory()
+                    render_trace_diagnostics(shopping_tracer, f"shopping-{int(time.time())}")
 
                 if error:
                     st.warning(f"⚠️ {error}")
@@ -548,6 +544,20 @@ ANÁLISIS DE PRECIO:
                 if products:
                     st.success(f"✅ Se encontraron {len(products)} productos")
                     
+                    if deep_crawl:
+                        render_deep_crawl(
+                            products,
+                            shopping_analyzer,
+                            top_per_store=int(top_per_store),
+                            budget=int(crawl_budget),
+                            our_store=crawl_store,
+                            reuse_unchanged=reuse_unchanged,
+                            use_zenrow=use_zenrow,
+                            zenrow_api_key=zenrow_api_key,
+                            delay=delay,
+                            tracer=Tracer(memory=profile_memory) if trace_enabled else None
+                        )
+                    
                     # Análisis de datos
                     analysis = shopping_analyzer.analyze_shopping_data(products)
                     
@@ -831,159 +841,138 @@ ANÁLISIS DE PRECIO:
                         # Botón para ir a análisis de URLs
                         if st.button("Ir a Análisis de URLs →"):
                             st.info("👆 Usa la pestaña 'Análisis de URLs' arriba")
-       
-    with tab3:  # Comparación
-        st.header("📈 Comparación Visual")
         
-        if 'all_data' in st.session_state and st.session_state['all_data']:
-            all_data = st.session_state['all_data']
-            
-            # Crear comparación visual
-            st.subheader("🔍 Matriz de Comparación")
-            
-            comparison_matrix = []
-            for data in all_data:
-                comparison_matrix.append({
-                    'Producto': data.get('title', 'Sin título')[:50],
-                    'Precio': 1 if data.get('price') else 0,
-                    'Descripción': len(data.get('description', '')) > 100,
-                    'Características': len(data.get('features', [])),
-                    'Especificaciones': len(data.get('specifications', {})),
-                    'Imágenes': len(data.get('images', [])),
-                    'Categorías': len(data.get('categories', []))
-                })
-            
-            df_comparison = pd.DataFrame(comparison_matrix)
-            
-            # Heatmap de características
-            fig = px.imshow(
-                df_comparison.set_index('Producto').T,
-                labels=dict(x="Productos", y="Atributos", color="Valor"),
-                aspect="auto",
-                color_continuous_scale="RdYlGn",
-                title="Mapa de Calor - Completitud de Información"
+        # Modo catálogo
+        st.markdown("---")
+        with st.expander("📦 Modo catálogo: analizar una lista de queries/SKUs"):
+            st.markdown(
+                "Sube un fichero `.txt` (una búsqueda por línea) o `.csv` con columnas "
+                "`query` y `sku`. El progreso se guarda al terminar cada query: si se "
+                "interrumpe, vuelve a subir el mismo fichero para reanudar."
             )
-            # Ajustar el ángulo de las etiquetas del eje x
-            fig.update_xaxes(tickangle=45)
-            st.plotly_chart(fig, use_container_width=True)
             
-            # Gráfico de radar para comparación
-            if len(all_data) <= 5:  # Solo mostrar radar si hay 5 o menos productos
-                st.subheader("🎯 Comparación Radar")
+            queries_file = st.file_uploader("Fichero de queries", type=['txt', 'csv'])
+            
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                our_store = st.text_input("Nuestra tienda", placeholder="pccomponentes")
+            with col2:
+                bulk_workers = st.slider("Hilos en paralelo", 1, 8, 3)
+            with col3:
+                bulk_rate = st.slider("Peticiones por segundo", 0.2, 5.0, 1.0, 0.2)
+            
+            bulk_queries = []
+            if queries_file is not None:
+                queries_content = queries_file.getvalue().decode('utf-8', errors='ignore')
+                bulk_queries = parse_queries(queries_content)
+                st.success(f"✅ {len(bulk_queries)} queries detectadas")
+            
+            if st.button("📦 Analizar catálogo", disabled=not bulk_queries):
+                # El id del run depende del contenido: el mismo fichero reanuda el mismo run
+                run_id = hashlib.sha1(queries_content.encode('utf-8')).hexdigest()[:12]
+                runner = BulkShoppingRunner(
+                    os.path.join(RUNS_DIR, f"bulk_{run_id}.jsonl"),
+                    our_store=our_store,
+                    num_results=num_results,
+                    max_workers=bulk_workers,
+                    requests_per_second=bulk_rate,
+                    cache=get_shopping_cache(),
+                    metrics=get_scrape_metrics()
+                )
                 
-                categories = ['Características', 'Especificaciones', 'Imágenes', 'Categorías', 'Filtros']
+                already_done = len(runner.load_progress())
+                if already_done:
+                    st.info(f"🔄 Reanudando run `{run_id}`: {already_done} queries ya guardadas")
                 
-                fig = go.Figure()
+                bulk_progress = st.progress(0)
+                bulk_status = st.empty()
                 
-                for i, data in enumerate(all_data):
-                    values = [
-                        len(data.get('features', [])),
-                        len(data.get('specifications', {})),
-                        len(data.get('images', [])),
-                        len(data.get('categories', [])),
-                        len(data.get('filters', []))
-                    ]
-                    
-                    fig.add_trace(go.Scatterpolar(
-                        r=values,
-                        theta=categories,
-                        fill='toself',
-                        name=f"Producto {i+1}"
-                    ))
+                def show_bulk_progress(row, completed, total):
+                    bulk_progress.progress(completed / total)
+                    bulk_status.markdown(f"🔍 **{completed}/{total}** · `{row['query'][:60]}`")
                 
-                fig.update_layout(
-                    polar=dict(
-                        radialaxis=dict(
-                            visible=True,
-                            range=[0, max([
-                                max(len(d.get('features', [])), 
-                                    len(d.get('specifications', {})),
-                                    len(d.get('images', [])),
-                                    len(d.get('categories', [])),
-                                    len(d.get('filters', [])))
-                                for d in all_data
-                            ])]
-                        )
-                    ),
-                    showlegend=True,
-                    title="Comparación de Completitud por Producto"
-                )
+                bulk_rows = runner.run(bulk_queries, on_result=show_bulk_progress)
+                bulk_progress.progress(1.0)
+                bulk_status.markdown('✅ **Catálogo completado**')
                 
-                st.plotly_chart(fig, use_container_width=True)
-            
-            # Insights automáticos
-            st.subheader("💡 Insights Automáticos")
-            
-            insights = []
-            
-            # Análisis de completitud
-            completeness_scores = []
-            for data in all_data:
-                score = 0
-                score += 1 if data.get('title') else 0
-                score += 1 if data.get('description') else 0
-                score += 1 if data.get('price') else 0
-                score += min(len(data.get('features', [])) / 5, 1)
-                score += min(len(data.get('specifications', {})) / 5, 1)
-                score += min(len(data.get('images', [])) / 3, 1)
-                completeness_scores.append(score / 6 * 100)
-            
-            best_product_idx = completeness_scores.index(max(completeness_scores))
-            worst_product_idx = completeness_scores.index(min(completeness_scores))
-            
-            insights.append(f"📊 **Producto más completo**: Producto {best_product_idx + 1} ({completeness_scores[best_product_idx]:.1f}% completitud)")
-            insights.append(f"⚠️ **Producto menos completo**: Producto {worst_product_idx + 1} ({completeness_scores[worst_product_idx]:.1f}% completitud)")
-            
-            # Análisis de precios
-            prices = []
-            for data in all_data:
-                if data.get('price'):
-                    price_match = re.search(r'[\d,]+\.?\d*', data.get('price', '').replace(',', ''))
-                    if price_match:
-                        try:
-                            prices.append(float(price_match.group()))
-                        except:
-                            pass
-            
-            if prices:
-                avg_price = sum(prices) / len(prices)
-                insights.append(f"💰 **Precio promedio**: {avg_price:.2f}€")
-                insights.append(f"💵 **Rango de precios**: {min(prices):.2f}€ - {max(prices):.2f}€")
-            
-            # Mostrar insights
-            for insight in insights:
-                st.info(insight)
-            
-            # Recomendaciones
-            st.subheader("🎯 Recomendaciones")
-            
-            recommendations = []
-            
-            if 'reference_data' in st.session_state and st.session_state['reference_data']:
-                ref_data = st.session_state['reference_data']
-                ref_score = completeness_scores[0]
+                df_bulk = pd.DataFrame(bulk_rows, columns=BULK_RESULT_COLUMNS).rename(columns={
+                    'query': 'Query',
+                    'sku': 'SKU',
+                    'products': 'Productos',
+                    'min_price': 'Precio mín.',
+                    'median_price': 'Precio mediano',
+                    'max_price': 'Precio máx.',
+                    'store_count': 'Tiendas',
+                    'our_position': 'Nuestra posición',
+                    'error': 'Error',
+                    'checked_at': 'Fecha'
+                })
+                st.dataframe(df_bulk, use_container_width=True, hide_index=True)
                 
-                if ref_score < 70:
-                    recommendations.append("🔴 **Urgente**: Tu producto tiene poca información. Añade más descripciones y características.")
-                elif ref_score < 85:
-                    recommendations.append("🟡 **Importante**: Tu producto está bien pero puede mejorar. Considera añadir más especificaciones técnicas.")
-                else:
-                    recommendations.append("🟢 **Excelente**: Tu producto tiene información muy completa.")
+                st.download_button(
+                    label="📥 Descargar catálogo (CSV)",
+                    data=df_bulk.to_csv(index=False, encoding='utf-8'),
+                    file_name=f"catalogo_{run_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                    mime="text/csv",
+                    use_container_width=True
+                )
+       
+    with tab3:  # Comparación
+        st.header("📈 Comparación Visual")
+        
+        url_run = st.session_state.get('url_run')
+        if url_run and url_run.all_data:
+            render_comparison_tab(url_run)
+        
+        else:
+            st.info("👆 Primero realiza un análisis en la pestaña 'Análisis de URLs' (o de fichas desde Google Shopping) para ver comparaciones.")
+        
+        # Histórico de snapshots guardados
+        with st.expander("📜 Histórico de precios"):
+            snapshot_store = get_snapshot_store()
+            stored_domains = snapshot_store.domains()
+            
+            if stored_domains:
+                domain = st.selectbox(
+                    "Dominio",
+                    [d['domain'] for d in stored_domains],
+                    format_func=lambda d: f"{d} ({next(x['urls'] for x in stored_domains if x['domain'] == d)} URLs)"
+                )
+                series = pd.DataFrame(snapshot_store.domain_price_series(domain))
+                series = series.dropna(subset=['price'])
                 
-                if not ref_data.get('price'):
-                    recommendations.append("💰 **Precio**: Considera mostrar el precio claramente en la página del producto.")
+                if not series.empty:
+                    series['extracted_at'] = pd.to_datetime(series['extracted_at'])
+                    series['Producto'] = series['title'].fillna('').str[:40]
+                    fig = px.line(
+                        series,
+                        x='extracted_at',
+                        y='price',
+                        color='Producto',
+                        markers=True,
+                        labels={'extracted_at': 'Fecha', 'price': 'Precio'},
+                        title=f"Evolución de precios en {domain}"
+                    )
+                    st.plotly_chart(fig, use_container_width=True)
                 
-                if len(ref_data.get('images', [])) < 3:
-                    recommendations.append("📸 **Imágenes**: Añade más imágenes del producto (mínimo 3-5).")
-            
-            if not recommendations:
-                recommendations.append("💡 Añade una URL de referencia para obtener recomendaciones personalizadas.")
-            
-            for rec in recommendations:
-                st.markdown(rec)
+                st.dataframe(
+                    pd.DataFrame(snapshot_store.latest_snapshots(domain)).drop(columns=['content_hash']),
+                    use_container_width=True,
+                    hide_index=True
+                )
+            else:
+                st.info("Aún no hay snapshots guardados. Cada análisis se añade al histórico.")
         
-        else:
-            st.info("👆 Primero realiza un análisis en la pestaña 'Análisis de URLs' para ver comparaciones.")
+        with st.expander("🕒 Monitorización programada (Google Shopping)"):
+            shopping_checks = get_snapshot_store().latest_shopping_checks()
+            
+            if shopping_checks:
+                st.dataframe(pd.DataFrame(shopping_checks), use_container_width=True, hide_index=True)
+            else:
+                st.info(
+                    "Sin resultados programados todavía. Lanza el planificador con "
+                    "`python -m pdp_checker schedule watchlist.json`."
+                )
     
     # Footer con información adicional
     st.markdown("---")
@@ -995,1122 +984,797 @@ ANÁLISIS DE PRECIO:
     </div>
     """, unsafe_allow_html=True)
 
-class GoogleShoppingAnalyzer:
-    """Analizador mejorado de Google Shopping con manejo de errores robusto"""
-    
-    def __init__(self, use_zenrow=False):
-        self.headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
-            'Accept-Language': 'es-ES,es;q=0.9,en;q=0.8',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'DNT': '1',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1'
-        }
-        self.last_error = None
+# Secciones de resultados de un run de URLs
+RESULT_SECTIONS = [
+    "📊 Resumen", 
+    "🎯 Análisis de GAPS",
+    "🔤 Términos", 
+    "🎛️ Filtros", 
+    "⭐ Características",
+    "💰 Precios",
+    "📈 Visualizaciones",
+    "💾 Exportar"
+]
+
+@st.fragment
+def render_url_results(run, analyze_terms=True, show_wordcloud=False):
+    """
+    Pinta los resultados de un run
     
-    def search_products_free(self, query, num_results=20, country='es'):
-        """
-        Busca productos en Google Shopping
-        
-        Returns:
-            tuple: (products_list, error_message)
-                - products_list: Lista de productos encontrados
-                - error_message: None si todo OK, string con error si hubo problemas
-        """
-        try:
-            products = []
-            self.last_error = None
-            
-            # Validación de entrada
-            if not query or not query.strip():
-                return [], "Query vacío"
-            
-            # Método 1: Google Shopping directo
-            products, error = self._search_google_shopping(query, num_results, country)
-            
-            # Método 2: Si falla o pocos resultados, búsqueda regular
-            if error or len(products) < 3:
-                alt_products, alt_error = self._search_google_regular(query, num_results, country)
-                products.extend(alt_products)
-                if error and alt_error:
-                    error = f"{error}; {alt_error}"
-                elif alt_error:
-                    error = alt_error
-            
-            # Eliminar duplicados
-            unique_products = self._remove_duplicates(products)
-            
-            # Si no hay productos, reportar error
-            if not unique_products and not error:
-                error = "No se encontraron productos para esta búsqueda"
-            
-            return unique_products[:num_results], error
-            
-        except Exception as e:
-            error_msg = f"Error general en búsqueda: {str(e)}"
-            return [], error_msg
-    
-    def _search_google_shopping(self, query, num_results, country='es'):
-        """
-        Búsqueda en Google Shopping
-        Returns: (products_list, error_message)
-        """
-        try:
-            base_urls = {
-                'es': 'https://www.google.es/search',
-                'com': 'https://www.google.com/search',
-                'mx': 'https://www.google.com.mx/search'
-            }
-            
-            base_url = base_urls.get(country, base_urls['es'])
-            
-            params = {
-                'q': query,
-                'tbm': 'shop',
-                'hl': 'es',
-                'gl': country,
-                'num': min(num_results * 2, 40),  # Pedir más para compensar filtrados
-            }
-            
-            # Construir URL
-            from urllib.parse import quote_plus
-            url = base_url + '?' + '&'.join([f"{k}={quote_plus(str(v))}" for k, v in params.items()])
-            
-            # Hacer request
-            response = requests.get(url, headers=self.headers, timeout=15)
-            
-            if response.status_code != 200:
-                return [], f"Error HTTP {response.status_code}"
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            products = []
-            
-            # Detectar si Google bloqueó la búsqueda
-            if soup.select_one('div#recaptcha') or 'captcha' in response.text.lower():
-                return [], "Google requiere verificación CAPTCHA"
-            
-            # Selectores actualizados
-            product_selectors = [
-                'div[data-docid]',
-                'div.sh-dgr__content',
-                'div.sh-dlr__list-result',
-                'div.KZmu8e',
-                'div.i0X6df',
-                'div.u30d4',
-                'div.Rn1jbe',
-                'div.xcR77'
-            ]
-            
-            found_any = False
-            for selector in product_selectors:
-                elements = soup.select(selector)
-                if elements:
-                    found_any = True
-                    for element in elements:
-                        product = self._extract_product_from_element(element)
-                        if product and self._is_valid_product(product):
-                            products.append(product)
-            
-            # Si no encontramos elementos específicos, buscar de forma genérica
-            if not found_any:
-                generic_products = self._extract_products_generic(soup, num_results)
-                products.extend(generic_products)
-            
-            if not products:
-                return [], "No se pudieron extraer productos de Google Shopping"
-            
-            return products, None
-            
-        except requests.exceptions.Timeout:
-            return [], "Timeout al conectar con Google"
-        except requests.exceptions.ConnectionError:
-            return [], "Error de conexión con Google"
-        except Exception as e:
-            return [], f"Error en Google Shopping: {str(e)}"
-    
-    def _search_google_regular(self, query, num_results, country='es'):
-        """
-        Búsqueda alternativa en Google regular
-        Returns: (products_list, error_message)
-        """
-        try:
-            # Modificar query para buscar productos
-            shopping_terms = ["comprar", "precio", "oferta", "barato"]
-            import random
-            term = random.choice(shopping_terms)
-            shopping_query = f"{query} {term}"
-            
-            base_url = f"https://www.google.{country}/search"
-            params = {
-                'q': shopping_query,
-                'num': num_results,
-                'hl': 'es',
-                'gl': country
-            }
-            
-            from urllib.parse import quote_plus
-            url = base_url + '?' + '&'.join([f"{k}={quote_plus(str(v))}" for k, v in params.items()])
-            
-            response = requests.get(url, headers=self.headers, timeout=10)
-            
-            if response.status_code != 200:
-                return [], f"Error HTTP {response.status_code} en búsqueda alternativa"
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            products = []
-            
-            # Buscar resultados que parezcan productos
-            result_divs = soup.select('div.g')
-            
-            for div in result_divs[:num_results]:
-                # Extraer título
-                title_elem = div.select_one('h3')
-                if not title_elem:
-                    continue
-                    
-                title = title_elem.get_text().strip()
-                
-                # Buscar precio en el snippet
-                snippet = div.get_text()
-                price = self._extract_price_from_text(snippet)
-                
-                # Extraer URL
-                link_elem = div.select_one('a[href]')
-                link = link_elem.get('href', '') if link_elem else ''
-                
-                # Extraer fuente
-                cite_elem = div.select_one('cite')
-                source = cite_elem.get_text().strip() if cite_elem else 'Tienda online'
-                
-                # Solo agregar si parece un producto (tiene precio o términos comerciales)
-                if price or any(term in snippet.lower() for term in ['€', 'eur', 'precio', 'comprar', 'oferta']):
-                    products.append({
-                        'title': title,
-                        'price': price or 'Consultar precio',
-                        'source': self._clean_source(source),
-                        'link': link,
-                        'description': title,
-                        'method': 'Google Search'
-                    })
-            
-            if not products:
-                return [], "No se encontraron resultados comerciales"
-                
-            return products, None
-            
-        except Exception as e:
-            return [], f"Error en búsqueda alternativa: {str(e)}"
+    Solo se calcula y dibuja la sección seleccionada; cada análisis se hace la
+    primera vez que se abre su sección y queda memoizado en el run.
+    """
+    st.markdown(f"""
+    <div class="success-message">
+        <strong>🎉 ¡Análisis completado!</strong><br>
+        Se procesaron <strong>{run.success_count}</strong> de <strong>{run.total}</strong> productos
+        · run <code>{run.run_id}</code>
+    </div>
+    """, unsafe_allow_html=True)
     
-    def _extract_product_from_element(self, element):
-        """Extrae información del producto de un elemento HTML"""
-        try:
-            product = {}
-            
-            # Título
-            title_selectors = ['h3', 'h4', 'a[aria-label]', 'div.rgHvZc', 'div.EI11Pd', 'div.Xjkr3b']
-            for selector in title_selectors:
-                title_elem = element.select_one(selector)
-                if title_elem:
-                    title = title_elem.get_text().strip()
-                    if not title and title_elem.get('aria-label'):
-                        title = title_elem.get('aria-label')
-                    if title and len(title) > 10:
-                        product['title'] = title[:200]  # Limitar longitud
-                        break
-            
-            # Precio
-            price_selectors = ['span.a8Pemb', 'span.OFFNJ', 'span.Nr22bf', 'span.HRLxBb']
-            for selector in price_selectors:
-                price_elem = element.select_one(selector)
-                if price_elem:
-                    price = price_elem.get_text().strip()
-                    if price and ('€' in price or 'EUR' in price or re.search(r'\d', price)):
-                        product['price'] = price[:50]  # Limitar longitud
-                        break
-            
-            # Si no encontramos precio con selectores, buscar en texto
-            if not product.get('price'):
-                text = element.get_text()
-                price = self._extract_price_from_text(text)
-                if price:
-                    product['price'] = price
-            
-            # Tienda/Fuente
-            source_selectors = ['span.aULzUe', 'span.IuHnof', 'span.vjtvZe', 'cite']
-            for selector in source_selectors:
-                source_elem = element.select_one(selector)
-                if source_elem:
-                    source = source_elem.get_text().strip()
-                    if source:
-                        product['source'] = self._clean_source(source)
-                        break
-            
-            # Link
-            link_elem = element.select_one('a[href]')
-            if link_elem:
-                href = link_elem.get('href', '')
-                product['link'] = self._clean_link(href)
-            
-            # Descripción
-            if product.get('title'):
-                product['description'] = product['title']
-                product['method'] = 'Google Shopping'
-            
-            return product if product.get('title') else None
-            
-        except Exception:
-            return None
+    if run.tracer.enabled:
+        render_trace_diagnostics(run.tracer, run.run_id)
     
-    def _extract_products_generic(self, soup, num_results):
-        """Extracción genérica cuando los selectores específicos fallan"""
-        products = []
-        
-        try:
-            # Buscar divs que contengan precios
-            all_elements = soup.find_all(['div', 'li', 'article'], limit=100)
-            
-            for element in all_elements:
-                text = element.get_text()
-                
-                # Si contiene indicadores de precio
-                if any(indicator in text for indicator in ['€', 'EUR', 'precio', 'Price']):
-                    lines = [line.strip() for line in text.split('\n') if line.strip()]
-                    
-                    if len(lines) < 2:
-                        continue
-                    
-                    # Primer línea larga como título
-                    title = None
-                    for line in lines:
-                        if 20 < len(line) < 200 and not any(x in line for x in ['€', 'EUR', 'precio']):
-                            title = line
-                            break
-                    
-                    if title:
-                        price = self._extract_price_from_text(text)
-                        products.append({
-                            'title': title,
-                            'price': price or 'Ver precio',
-                            'source': 'Tienda online',
-                            'link': '#',
-                            'description': title,
-                            'method': 'Generic extraction'
-                        })
-                        
-                        if len(products) >= num_results:
-                            break
-            
-        except Exception:
-            pass
-        
-        return products
+    section = st.radio(
+        "Sección",
+        RESULT_SECTIONS,
+        horizontal=True,
+        label_visibility="collapsed",
+        key=f"section_{run.run_id}"
+    )
     
-    def _extract_price_from_text(self, text):
-        """Extrae precio de un texto"""
-        if not text:
-            return None
-            
-        # Patrones de precio
-        patterns = [
-            r'(\d{1,5}[,\.]\d{2})\s*€',
-            r'€\s*(\d{1,5}[,\.]\d{2})',
-            r'EUR\s*(\d{1,5}[,\.]\d{2})',
-            r'(\d{1,5})\s*€',
-            r'€\s*(\d{1,5})',
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                return match.group(0).strip()
-        
-        return None
+    if section == "📊 Resumen":
+        render_summary_tab(run)
+    elif section == "🎯 Análisis de GAPS":
+        render_gaps_tab(run)
+    elif section == "🔤 Términos":
+        if analyze_terms:
+            render_terms_tab(run, show_wordcloud=show_wordcloud)
+    elif section == "💾 Exportar":
+        render_export_tab(run)
+
+def render_deep_crawl(products, shopping_analyzer, top_per_store, budget, our_store, reuse_unchanged,
+                      use_zenrow, zenrow_api_key, delay, tracer=None):
+    """
+    Extrae en paralelo las fichas de los resultados de Shopping y las guarda como run
     
-    def _clean_source(self, source):
-        """Limpia el nombre de la fuente/tienda"""
-        if not source:
-            return 'Tienda online'
-        
-        # Eliminar URLs y caracteres especiales
-        source = re.sub(r'https?://|www\.', '', source)
-        source = source.split('/')[0]
-        source = source.replace('.com', '').replace('.es', '').replace('.org', '')
-        
-        return source.strip() or 'Tienda online'
+    Los resultados se pintan según llegan; al terminar, el run sustituye al de la
+    pestaña de URLs y queda disponible en la de Comparación.
+    """
+    targets = select_targets(products, shopping_analyzer._clean_link, top_per_store, budget, our_store)
+    if not targets:
+        st.warning("⚠️ Ningún resultado enlaza directamente a la ficha de una tienda")
+        return
     
-    def _clean_link(self, href):
-        """Limpia y procesa links de Google"""
-        if not href:
-            return '#'
-        
-        if href.startswith('/url?'):
-            # Extraer URL real de Google redirect
-            import urllib.parse
-            parsed = urllib.parse.parse_qs(urllib.parse.urlparse(href).query)
-            if 'q' in parsed:
-                return parsed['q'][0]
-            elif 'url' in parsed:
-                return parsed['url'][0]
-        
-        if href.startswith('http'):
-            return href
-        
-        if href.startswith('/'):
-            return 'https://www.google.com' + href
-        
-        return href
+    st.markdown(f"### 🔎 Analizando {len(targets)} fichas de {len({t['store'] for t in targets})} tiendas...")
+    journal = RunJournal.create(RUNS_DIR, [(target['role'], target['url']) for target in targets])
     
-    def _is_valid_product(self, product):
-        """Valida que el producto tenga información mínima"""
-        if not product:
-            return False
-        
-        # Debe tener al menos título
-        if not product.get('title'):
-            return False
-        
-        # El título debe tener longitud razonable
-        title = product.get('title', '')
-        if len(title) < 10 or len(title) > 500:
-            return False
-        
-        # No debe ser un resultado de navegación
-        excluded_terms = ['política', 'privacidad', 'cookies', 'términos', 'condiciones', 'ayuda', 'contacto']
-        if any(term in title.lower() for term in excluded_terms):
-            return False
-        
-        return True
+    # Los hilos de extracción no pueden escribir en la página: sus avisos van al log
+    analyzer = ProductBenchmarkAnalyzer(
+        use_zenrow=use_zenrow,
+        zenrow_api_key=zenrow_api_key,
+        events=LoggingEventSink(),
+        fingerprints=get_snapshot_store() if reuse_unchanged else None,
+        cache=get_extraction_cache(),
+        tracer=tracer,
+        metrics=get_scrape_metrics()
+    )
+    crawler = DeepCrawler(analyzer, max_workers=4, per_domain=1, delay=delay, use_zenrow=use_zenrow)
     
-    def _remove_duplicates(self, products):
-        """Elimina productos duplicados manteniendo el orden"""
-        seen = set()
-        unique = []
-        
-        for product in products:
-            # Crear key única basada en título normalizado
-            title = product.get('title', '').lower().strip()
-            key = ''.join(c for c in title if c.isalnum())[:50]
-            
-            if key and key not in seen:
-                seen.add(key)
-                unique.append(product)
-        
-        return unique
-    
-    def analyze_shopping_data(self, products):
-        """Analiza los datos obtenidos"""
-        if not products:
-            return {
-                'total_products': 0,
-                'sources': {},
-                'price_ranges': None,
-                'common_terms': Counter(),
-                'has_data': False
-            }
-        
-        analysis = {
-            'total_products': len(products),
-            'sources': {},
-            'price_ranges': None,
-            'common_terms': Counter(),
-            'has_data': True
-        }
-        
-        # Análisis por fuente
-        for product in products:
-            source = product.get('source', 'Desconocido')
-            analysis['sources'][source] = analysis['sources'].get(source, 0) + 1
-        
-        # Análisis de precios
-        prices = []
-        for product in products:
-            price_text = product.get('price', '')
-            if price_text and price_text not in ['Ver precio', 'Consultar precio', '#']:
-                # Extraer números
-                numbers = re.findall(r'\d+[,.]?\d*', price_text.replace(',', '.'))
-                for num_str in numbers:
-                    try:
-                        price = float(num_str.replace(',', '.'))
-                        if 0.01 < price < 100000:
-                            prices.append(price)
-                            break
-                    except:
-                        continue
-        
-        if prices:
-            analysis['price_ranges'] = {
-                'min': min(prices),
-                'max': max(prices),
-                'avg': sum(prices) / len(prices),
-                'median': sorted(prices)[len(prices)//2] if prices else 0,
-                'count': len(prices)
-            }
-        
-        # Análisis de términos
-        all_text = ' '.join([
-            f"{p.get('title', '')} {p.get('description', '')}"
-            for p in products
-        ])
-        
-        # Tokenización
-        words = re.findall(r'\b[a-záéíóúñü]{3,}\b', all_text.lower())
-        
-        # Filtrar stopwords
-        stopwords = {
-            'para', 'con', 'por', 'del', 'las', 'los', 'una', 'uno',
-            'desde', 'hasta', 'más', 'muy', 'todo', 'todos', 'este',
-            'esta', 'estos', 'estas', 'ese', 'esa', 'esos', 'esas'
+    progress_bar = st.progress(0)
+    live_table = st.empty()
+    results = []
+    rows = []
+    
+    for result in crawler.iter_results(targets, journal=journal):
+        results.append(result)
+        data = result['data'] or {}
+        rows.append({
+            'Tienda': targets[result['index']]['store'],
+            'Rol': '🎯 Referencia' if result['role'] == 'reference' else 'Competidor',
+            'Título': (data.get('title') or result['listing'].get('title', ''))[:80],
+            'Precio Shopping': result['listing'].get('price', 'N/A'),
+            'Precio ficha': data.get('price') or 'N/A',
+            'Estado': '✅' if result['data'] else '❌'
+        })
+        progress_bar.progress(len(results) / len(targets))
+        live_table.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+    
+    run = AnalysisRun(
+        journal.run_id,
+        sorted(results, key=lambda result: result['index']),
+        total=len(targets),
+        cache_hits=analyzer.cache_hits,
+        tracer=tracer
+    )
+    publish_run(run)
+    
+    if run.all_data:
+        st.success(
+            f"✅ {run.success_count} de {run.total} fichas extraídas (run `{run.run_id}`). "
+            "Los resultados están en la pestaña de Comparación"
+        )
+    else:
+        st.error("❌ No se pudo extraer información de ninguna ficha.")
+    if tracer is not None:
+        render_trace_diagnostics(tracer, run.run_id)
+
+def render_category_crawl(seeds, max_pages, max_products, subcategories, reuse_unchanged,
+                          use_zenrow, zenrow_api_key, delay, tracer=None):
+    """
+    Recorre listados de categoría y extrae las fichas según aparecen
+    
+    Igual que `render_deep_crawl`, el run resultante sustituye al de la pestaña
+    de URLs.
+    """
+    analyzer = ProductBenchmarkAnalyzer(
+        use_zenrow=use_zenrow,
+        zenrow_api_key=zenrow_api_key,
+        events=LoggingEventSink(),
+        fingerprints=get_snapshot_store() if reuse_unchanged else None,
+        cache=get_extraction_cache(),
+        tracer=tracer,
+        metrics=get_scrape_metrics()
+    )
+    frontier = CategoryFrontier(
+        analyzer,
+        max_pages=max_pages,
+        max_products=max_products,
+        subcategories=subcategories,
+        delay=delay,
+        use_zenrow=use_zenrow
+    )
+    
+    status_text = st.empty()
+    progress_bar = st.progress(0)
+    live_table = st.empty()
+    results = []
+    rows = []
+    
+    for result in frontier.iter_results(seeds):
+        results.append(result)
+        data = result['data'] or {}
+        rows.append({
+            'Listado': result['listing'].split(urlparse(result['listing']).netloc, 1)[-1][:60],
+            'Título': (data.get('title') or result['url'])[:80],
+            'Precio': data.get('price') or 'N/A',
+            'Estado': '✅' if result['data'] else '❌'
+        })
+        stats = frontier.stats
+        status_text.markdown(
+            f"🕸️ **{stats['pages']} listados · {stats['products']} fichas descubiertas · {len(results)} extraídas**"
+        )
+        progress_bar.progress(min(1.0, len(results) / max_products))
+        live_table.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+    progress_bar.progress(1.0)
+    
+    stats = frontier.stats
+    if not results:
+        st.warning(
+            f"⚠️ No se encontraron fichas en {stats['pages']} listado(s) "
+            f"({stats['failed_pages']} no se pudieron descargar)"
+        )
+        return
+    
+    run = AnalysisRun(
+        new_run_id([('category', seed) for seed in seeds]),
+        sorted(results, key=lambda result: result['index']),
+        total=len(results),
+        cache_hits=analyzer.cache_hits,
+        tracer=tracer
+    )
+    publish_run(run)
+    st.caption(f"🔗 {stats['duplicates']} enlace(s) repetidos descartados")
+
+def publish_run(run):
+    """Guarda los snapshots de un run y lo deja en la sesión para las pestañas de resultados"""
+    get_snapshot_store().save_products(run.all_data, run_id=run.run_id)
+    get_incomplete_runs.clear()
+    
+    st.session_state['run_id'] = run.run_id
+    st.session_state['url_run'] = run
+    st.session_state['reference_data'] = run.reference_data
+    st.session_state['competitor_data'] = run.competitor_data
+    st.session_state['all_data'] = run.all_data
+
+def render_trace_diagnostics(tracer, name):
+    """Expander con p50/p95 por etapa y por dominio, la memoria si se mide y la traza en JSON"""
+    with st.expander("⏱️ Diagnóstico de latencias y memoria" if tracer.memory else "⏱️ Diagnóstico de latencias"):
+        by_stage = tracer.summary()
+        if not by_stage:
+            st.info("Todavía no hay tiempos registrados")
+            return
+        
+        columns = {
+            'domain': 'Dominio', 'stage': 'Etapa', 'count': 'N', 'p50_ms': 'p50 (ms)',
+            'p95_ms': 'p95 (ms)', 'total_ms': 'Total (ms)', 'bytes': 'Bytes',
+            'url': 'URL', 'peak_kb': 'Pico (KB)', 'retained_kb': 'Retenida (KB)'
         }
+        st.markdown("**Por etapa**")
+        st.dataframe(pd.DataFrame(by_stage).rename(columns=columns), use_container_width=True, hide_index=True)
+        
+        st.markdown("**Por dominio**")
+        st.dataframe(
+            pd.DataFrame(tracer.summary(by='domain')).rename(columns=columns),
+            use_container_width=True,
+            hide_index=True
+        )
         
-        filtered = [w for w in words if w not in stopwords]
-        analysis['common_terms'] = Counter(filtered)
+        if tracer.memory:
+            render_memory_diagnostics(tracer, name, columns)
         
-        return analysis
+        st.download_button(
+            label="📥 Descargar traza (JSON)",
+            data=tracer.to_json(),
+            file_name=f"traza_{name}.json",
+            mime="application/json",
+            key=f"trace_{name}"
+        )
 
+def render_memory_diagnostics(tracer, name, columns):
+    """Pico del run, memoria por URL, árboles HTML sin liberar y mayores sitios de asignación"""
+    alive = len(tracer.alive())
+    leaked = len(tracer.alive(collect=True))
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Pico de memoria", f"{tracer.peak_memory / 1024 ** 2:.1f} MB")
+    col2.metric("Árboles HTML pendientes de gc", alive, help="Se liberan en la siguiente pasada del recolector")
+    col3.metric("Árboles HTML retenidos", leaked, help="Siguen vivos tras gc.collect(): algo conserva una referencia")
+    
+    st.markdown("**Memoria por URL**")
+    by_url = tracer.summary(by='url', stage='url.total')
+    st.dataframe(
+        pd.DataFrame(by_url, columns=['url', 'peak_kb', 'retained_kb', 'total_ms']).rename(columns=columns),
+        use_container_width=True,
+        hide_index=True
+    )
+    
+    if st.toggle("Mostrar los mayores sitios de asignación", key=f"allocations_{name}"):
+        st.dataframe(
+            pd.DataFrame(tracer.top_allocations(15)).rename(
+                columns={'site': 'Línea', 'size_kb': 'Tamaño (KB)', 'count': 'Bloques'}
+            ),
+            use_container_width=True,
+            hide_index=True
+        )
 
-def fetch_html_via_zenrow(url, api_key):
-    """Obtiene el HTML de una página utilizando la API de Zenrow."""
-    if not api_key:
-        return None
+def render_scrape_health(metrics):
+    """Expander con peticiones, bloqueos y reintentos por dominio acumulados por el proceso"""
+    rows = metrics.domain_summary()
+    if not rows:
+        return
+    
+    with st.expander("📡 Salud del scraping por dominio (todas las sesiones)"):
+        st.dataframe(
+            pd.DataFrame(rows).rename(columns={
+                'domain': 'Dominio', 'requests': 'Peticiones', 'blocked': '403', 'blocked_pct': '% 403',
+                'errors': 'Otros errores', 'retries': 'Reintentos', 'escalations': 'Escaladas',
+                'bytes': 'Bytes', 'extractions': 'Extracciones', 'failed': 'Fallidas'
+            }),
+            use_container_width=True,
+            hide_index=True
+        )
+        st.download_button(
+            label="📥 Descargar métricas (Prometheus)",
+            data=metrics.render(),
+            file_name="pdp_metrics.prom",
+            mime="text/plain",
+            key="scrape_metrics"
+        )
 
-    zenrow_url = (
-        f"https://api.zenrows.com/v1/?url={quote_plus(url)}&apikey={api_key}"
-        "&render=true&autoparse=false"
+def run_gaps(run):
+    """Gaps del run (memoizados)"""
+    return run.memo(
+        'gaps',
+        lambda: get_text_analyzer().analyze_gaps(run.reference_data, run.competitor_data)
     )
-    try:
-        response = requests.get(zenrow_url, timeout=30)
-        response.raise_for_status()
-        return response.text
-    except requests.exceptions.HTTPError:
-        st.warning(
-            f"Zenrow status {response.status_code} for {url[:50]}..."
-        )
-    except requests.RequestException as e:
-        st.warning(f"Error usando Zenrow: {e}")
-    return None
+
+def run_terms(run):
+    """Términos del run (memoizados)"""
+    return run.memo('terms', lambda: get_text_analyzer().analyze_terms(run.all_data))
+
+@st.fragment
+def render_summary_tab(run):
+    """Pestaña Resumen"""
+    st.header("📊 Resumen del Análisis")
+    
+    # Métricas principales
+    col1, col2, col3, col4 = st.columns(4)
+    
+    all_data = run.all_data
+    
+    with col1:
+        st.metric("🔗 Productos Analizados", len(all_data))
+    
+    with col2:
+        total_features = sum(len(data.get('features', [])) for data in all_data)
+        st.metric("⭐ Total Características", total_features)
+    
+    with col3:
+        total_specs = sum(len(data.get('specifications', {})) for data in all_data)
+        st.metric("🔧 Total Especificaciones", total_specs)
+    
+    with col4:
+        products_with_price = sum(1 for data in all_data if data.get('price'))
+        st.metric("💰 Con Precio", products_with_price)
+    
+    # Tabla resumen
+    df_summary = run.memo('summary_table', lambda: build_summary_table(run))
+    st.dataframe(df_summary, use_container_width=True, hide_index=True)
+
+def build_summary_table(run):
+    """Tabla de la pestaña Resumen"""
+    summary_data = []
+    for i, data in enumerate(run.all_data):
+        is_reference = (i == 0 and run.reference_data)
+        # Los campos no extraídos (análisis desactivado) quedan vacíos, no a 0
+        not_extracted = set(data.get('not_extracted', []))
+        summary_data.append({
+            'Tipo': '🎯 Referencia' if is_reference else f'🔍 Competidor {i}',
+            'Dominio': data.get('domain', 'N/A'),
+            'Título': data.get('title', 'Sin título')[:60] + '...',
+            'Precio': data.get('price', 'N/A'),
+            'Características': None if 'features' in not_extracted else len(data.get('features', [])),
+            'Especificaciones': None if 'specifications' in not_extracted else len(data.get('specifications', {})),
+            'Filtros': None if 'filters' in not_extracted else len(data.get('filters', []))
+        })
+    
+    return pd.DataFrame(summary_data)
+
+@st.fragment
+def render_gaps_tab(run):
+    """Pestaña Análisis de GAPS"""
+    st.header("🎯 Análisis de GAPS")
+    
+    if run.reference_data and run.competitor_data:
+        gaps = run_gaps(run)
+        
+        # Características únicas de la competencia
+        if gaps['unique_competitor_features']:
+            st.subheader("⚡ Características que tiene la competencia")
+            st.markdown('<div class="warning-message">', unsafe_allow_html=True)
+            st.markdown("**Oportunidades de mejora detectadas:**")
+            for feature in gaps['unique_competitor_features'][:10]:
+                st.markdown(f"• {feature}")
+            st.markdown('</div>', unsafe_allow_html=True)
+        
+        # Especificaciones faltantes
+        if gaps['missing_specs']:
+            st.subheader("📋 Especificaciones faltantes")
+            cols = st.columns(3)
+            for i, spec in enumerate(gaps['missing_specs'][:12]):
+                cols[i % 3].warning(f"📌 {spec}")
+        
+        # Filtros que usa la competencia
+        if gaps['missing_filters']:
+            st.subheader("🎛️ Filtros adicionales en competencia")
+            st.info("Considera añadir estos filtros a tu tienda:")
+            filter_df = pd.DataFrame(
+                {'Filtro': gaps['missing_filters'][:20]},
+                index=range(1, min(21, len(gaps['missing_filters'])+1))
+            )
+            st.dataframe(filter_df, use_container_width=True)
         
-class ProductBenchmarkAnalyzer:
-    def __init__(self, use_zenrow=False, zenrow_api_key=None):
-        """Inicializa el analizador con stopwords mejoradas"""
-        try:
-            # Stopwords básicas en español e inglés
-            spanish_stopwords = set([
-                'el', 'la', 'de', 'que', 'y', 'a', 'en', 'un', 'es', 'se', 'no', 'te', 'lo', 
-                'le', 'da', 'su', 'por', 'son', 'con', 'para', 'al', 'del', 'las', 'una', 
-                'su', 'me', 'si', 'tu', 'más', 'muy', 'pero', 'como', 'son', 'los', 'este',
-                'esta', 'esto', 'ese', 'esa', 'esos', 'esas', 'tiene', 'ser', 'hacer',
-                'estar', 'todo', 'todos', 'toda', 'todas', 'cuando', 'donde', 'como',
-                'porque', 'aunque', 'desde', 'hasta', 'entre', 'sobre', 'bajo', 'sin'
-            ])
+        # Análisis de precio
+        if gaps['price_difference']:
+            st.subheader("💰 Análisis de Precio")
+            price_data = gaps['price_difference']
             
-            english_stopwords = set([
-                'the', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 
-                'by', 'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 
-                'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should', 'may', 
-                'might', 'must', 'can', 'this', 'that', 'these', 'those', 'all', 'any', 
-                'some', 'each', 'every', 'both', 'either', 'neither', 'one', 'two', 'three'
-            ])
-            
-            # Palabras relacionadas con e-commerce que NO queremos analizar
-            ecommerce_stopwords = set([
-                'añadir', 'carrito', 'comprar', 'compra', 'pedido', 'envio', 'envío', 
-                'entrega', 'prevista', 'generado', 'stock', 'disponible', 'agotado',
-                'precio', 'oferta', 'descuento', 'rebaja', 'promocion', 'promoción',
-                'gratis', 'gratuito', 'iva', 'incluido', 'excluido', 'gastos',
-                'valoracion', 'valoración', 'opinion', 'opinión', 'comentario',
-                'puntuacion', 'puntuación', 'estrella', 'estrellas', 'valorar',
-                'recomendar', 'recomiendo', 'cliente', 'clientes', 'usuario', 'usuarios',
-                'cada', 'solo', 'sólo', 'solamente', 'únicamente', 'también', 'además',
-                'producto', 'productos', 'articulo', 'artículo', 'item', 'items',
-                'marca', 'modelo', 'referencia', 'codigo', 'código', 'sku',
-                'categoria', 'categoría', 'seccion', 'sección', 'departamento',
-                'buscar', 'busqueda', 'búsqueda', 'filtrar', 'filtro', 'filtros',
-                'ordenar', 'clasificar', 'mostrar', 'ver', 'todos', 'todas',
-                'inicio', 'home', 'tienda', 'shop', 'store', 'online',
-                'web', 'website', 'pagina', 'página', 'sitio', 'portal',
-                'cookies', 'politica', 'política', 'privacidad', 'terminos', 'términos',
-                'condiciones', 'legal', 'aviso', 'contacto', 'ayuda', 'soporte'
-            ])
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Tu Precio", f"{price_data['reference']:.2f}€")
+            with col2:
+                st.metric("Promedio Competencia", f"{price_data['competitors_avg']:.2f}€")
+            with col3:
+                diff_color = "🟢" if price_data['difference'] < 0 else "🔴"
+                st.metric(
+                    "Diferencia",
+                    f"{abs(price_data['difference']):.2f}€",
+                    f"{diff_color} {abs(price_data['percentage']):.1f}%"
+                )
             
-            try:
-                nltk_spanish = set(nltk.corpus.stopwords.words('spanish'))
-                nltk_english = set(nltk.corpus.stopwords.words('english'))
-                self.stop_words = spanish_stopwords | english_stopwords | ecommerce_stopwords | nltk_spanish | nltk_english
-            except:
-                self.stop_words = spanish_stopwords | english_stopwords | ecommerce_stopwords
-                
-        except:
-            # Fallback mínimo
-            self.stop_words = set(['el', 'la', 'de', 'que', 'y', 'a', 'en', 'the', 'and', 'or', 'añadir', 'carrito', 'entrega', 'envio'])
+            if price_data['percentage'] > 20:
+                st.warning("⚠️ Tu precio es significativamente mayor que la competencia")
+            elif price_data['percentage'] < -20:
+                st.info("💡 Tu precio es muy competitivo, podrías considerar ajustarlo")
+    
+    else:
+        st.info("💡 Añade una URL de referencia y URLs de competencia para ver el análisis de gaps")
 
-        self.use_zenrow = use_zenrow
-        self.zenrow_api_key = zenrow_api_key or os.environ.get("ZENROW_API_KEY")
-        
-        self.results = []
-        self.headers_options = [
-            {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
-                'Accept-Language': 'es-ES,es;q=0.9,en;q=0.8',
-                'Accept-Encoding': 'gzip, deflate, br',
-                'DNT': '1',
-                'Connection': 'keep-alive',
-                'Upgrade-Insecure-Requests': '1'
-            },
-            {
-                'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.0 Safari/605.1.15',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-                'Accept-Language': 'es-es',
-                'Accept-Encoding': 'gzip, deflate, br',
-                'Connection': 'keep-alive'
-            },
-            {
-                'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-                'Accept-Language': 'es,en-US;q=0.7,en;q=0.3',
-                'Accept-Encoding': 'gzip, deflate',
-                'Connection': 'keep-alive'
-            }
-        ]
+@st.fragment
+def render_terms_tab(run, show_wordcloud=False):
+    """Pestaña Términos; el Top N solo redibuja esta pestaña"""
+    st.header("🔤 Términos Más Relevantes")
+    top_n = st.slider("📊 Top N resultados", 5, 50, 20, key=f"top_n_{run.run_id}")
+    
+    top_terms = run_terms(run).most_common(top_n)
+    
+    if top_terms:
+        st.plotly_chart(build_terms_chart(tuple(top_terms)), use_container_width=True)
         
-    def extract_content_from_url(self, url, rotate_headers=False, use_zenrow=False):
-        """Extrae contenido relevante de una URL de producto"""
-        try:
-            if use_zenrow is None:
-                use_zenrow = self.use_zenrow
+        if show_wordcloud:
+            render_wordcloud(run)
 
-            # Seleccionar headers
-            if rotate_headers:
-                headers = random.choice(self.headers_options)
-            else:
-                headers = self.headers_options[0]
+# Cada cuánto se vuelve a mirar si la nube de palabras ya está lista
+WORDCLOUD_POLL_SECONDS = 1.0
 
-            # Usar session para mantener cookies
-            session = requests.Session()
-            session.headers.update(headers)
+def render_wordcloud(run):
+    """
+    Nube de palabras del run, renderizada en segundo plano
+    
+    La imagen depende solo de los términos del run (no del Top N), así que
+    cambiar otros widgets o volver a abrir la pestaña reutiliza el PNG ya hecho.
+    """
+    service = get_render_service()
+    key = service.request_wordcloud(run_terms(run), width=1000, height=450)
+    
+    image = service.get(key)
+    if image is not None:
+        st.image(image, caption="Nube de términos", use_container_width=True)
+    elif service.error(key):
+        st.warning(f"⚠️ No se pudo generar la nube de palabras: {service.error(key)}")
+    else:
+        poll_wordcloud(key)
 
-            if use_zenrow and self.zenrow_api_key:
-                zenrow_url = f"https://api.zenrows.com/v1/?url={quote_plus(url)}&apikey={self.zenrow_api_key}"
-                response = session.get(zenrow_url, timeout=20, allow_redirects=True)
-            else:
-                response = session.get(url, timeout=20, allow_redirects=True)
+@st.fragment(run_every=WORDCLOUD_POLL_SECONDS)
+def poll_wordcloud(key):
+    """
+    Aviso mientras se genera la nube; solo este fragmento se repite hasta que está lista
+    
+    Cada sondeo reejecuta únicamente el fragmento. La app entera se reejecuta
+    una sola vez por imagen, al llegar, para que el fragmento deje de pintarse
+    y de sondear; si aun así vuelve a ejecutarse, pinta la imagen él mismo.
+    """
+    service = get_render_service()
+    image = service.get(key)
+    if image is None and not service.error(key):
+        st.info("☁️ Generando nube de palabras...")
+        return
+    
+    reloaded = st.session_state.setdefault('wordcloud_reloaded', set())
+    if key not in reloaded:
+        reloaded.add(key)
+        st.rerun(scope="app")
+    if image is not None:
+        st.image(image, caption="Nube de términos", use_container_width=True)
+    else:
+        st.warning(f"⚠️ No se pudo generar la nube de palabras: {service.error(key)}")
 
-                # Si obtenemos 403, intentamos estrategias adicionales
-                if response.status_code == 403:
-                    # Estrategia 1: Headers mínimos
-                    minimal_headers = {
-                        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/121.0'
-                    }
-                    session.headers.clear()
-                    session.headers.update(minimal_headers)
-                    time.sleep(3)
-                    response = session.get(url, timeout=20, allow_redirects=True)
+@st.cache_data(show_spinner=False)
+def build_terms_chart(top_terms):
+    """Gráfico de barras de términos (memoizado por contenido)"""
+    df_terms = pd.DataFrame(list(top_terms), columns=['Término', 'Frecuencia'])
+    
+    fig = px.bar(
+        df_terms, 
+        x='Frecuencia', 
+        y='Término',
+        orientation='h',
+        color='Frecuencia',
+        color_continuous_scale='viridis',
+        title="Términos clave más frecuentes"
+    )
+    fig.update_layout(height=600, yaxis={'categoryorder':'total ascending'})
+    return fig
 
-                    # Estrategia 2: Si sigue fallando, probar con otro user-agent
-                    if response.status_code == 403:
-                        session.headers.update({
-                            'User-Agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.0 Mobile/15E148 Safari/604.1'
-                        })
-                        time.sleep(5)
-                        response = session.get(url, timeout=20, allow_redirects=True)
+# Ficheros exportados desde la interfaz
+EXPORTS_DIR = os.path.join(RUNS_DIR, 'exports')
 
-            response.raise_for_status()
+EXPORT_LABELS = {
+    'csv.gz': "CSV (gzip)",
+    'jsonl': "JSONL (fichas completas)",
+    'parquet': "Parquet"
+}
 
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Extraer información del producto
-            product_data = {
-                'url': url,
-                'domain': urlparse(url).netloc,
-                'title': self._extract_title(soup),
-                'description': self._extract_description(soup),
-                'features': self._extract_features(soup),
-                'specifications': self._extract_specifications(soup),
-                'price': self._extract_price(soup),
-                'filters': self._extract_filters(soup),
-                'categories': self._extract_categories(soup),
-                'images': self._extract_images(soup),
-                'extracted_at': datetime.now().isoformat()
-            }
-            
-            return product_data
-            
-        except requests.exceptions.HTTPError as e:
-            if e.response.status_code == 403:
-                domain = urlparse(url).netloc
-                st.warning(f"🚫 Acceso denegado a {domain}")
-                self._suggest_alternatives(domain)
-            else:
-                st.warning(f"⚠️ Error HTTP {e.response.status_code} con {url[:50]}...")
-            return None
-        except requests.exceptions.RequestException as e:
-            st.warning(f"⚠️ Error de conexión con {url[:50]}...: {str(e)}")
-            return None
-        except Exception as e:
-            st.warning(f"⚠️ Error procesando {url[:50]}...: {str(e)}")
-            return None   
-    def _suggest_alternatives(self, domain):
-        """Sugiere alternativas para sitios bloqueados"""
-        alternatives = {
-            'mediamarkt': "💡 **Alternativa para MediaMarkt:** Busca el mismo producto en Amazon o eBay",
-            'pccomponentes': "💡 **Alternativa para PCComponentes:** Prueba con Amazon o tiendas especializadas",
-            'elcorteingles': "💡 **Alternativa para El Corte Inglés:** Busca en Amazon o tiendas del fabricante"
-        }
-        
-        for site, message in alternatives.items():
-            if site in domain.lower():
-                st.info(message)
-                break
-    
-    def _extract_title(self, soup):
-        """Extrae el título del producto"""
-        selectors = [
-            'h1[class*="title"]',
-            'h1[class*="product"]',
-            '[data-testid*="title"]',
-            '[class*="product-title"]',
-            '[class*="product-name"]',
-            '[id*="title"]',
-            'h1',
-            'title'
-        ]
-        
-        for selector in selectors:
-            elements = soup.select(selector)
-            for element in elements:
-                text = element.get_text().strip()
-                if text and len(text) > 5 and len(text) < 300:
-                    return text
-        return ""
-    
-    def _extract_description(self, soup):
-        """Extrae la descripción del producto enfocándose en contenido relevante"""
-        description = ""
-        
-        # Selectores específicos para descripciones de producto
-        description_selectors = [
-            '[class*="product-description"]',
-            '[class*="description"]',
-            '[class*="summary"]',
-            '[class*="overview"]',
-            '[class*="details"]',
-            '[data-testid*="description"]',
-            '[class*="product-info"]',
-            '[class*="caracteristicas"]',
-            'meta[name="description"]'
-        ]
-        
-        # Elementos a excluir
-        excluded_classes = [
-            'nav', 'menu', 'header', 'footer', 'sidebar', 'cart', 'carrito',
-            'checkout', 'payment', 'shipping', 'delivery', 'price', 'precio',
-            'review', 'opinion', 'rating', 'valoracion', 'breadcrumb'
-        ]
-        
-        for selector in description_selectors:
-            if 'meta' in selector:
-                element = soup.select_one(selector)
-                if element:
-                    desc = element.get('content', '')
-                    if desc and len(desc) > 30:
-                        description += desc + " "
-            else:
-                elements = soup.select(selector)
-                for element in elements:
-                    # Verificar que no sea un elemento excluido
-                    element_class = element.get('class', [])
-                    element_id = element.get('id', '')
-                    
-                    is_excluded = any(
-                        excluded in str(element_class).lower() or 
-                        excluded in element_id.lower() 
-                        for excluded in excluded_classes
-                    )
-                    
-                    if not is_excluded:
-                        text = element.get_text().strip()
-                        if text and len(text) > 30 and len(text) < 3000:
-                            if not self._is_ecommerce_text(text):
-                                description += text + " "
-        
-        return description.strip()
+@st.fragment
+def render_export_tab(run):
+    """
+    Pestaña Exportar
     
-    def _is_ecommerce_text(self, text):
-        """Detecta si un texto es relacionado con e-commerce y no con producto"""
-        text_lower = text.lower()
-        
-        # Patrones que indican texto de e-commerce
-        ecommerce_patterns = [
-            'añadir al carrito', 'comprar ahora', 'envío gratis',
-            'opiniones de', 'valoraciones de', 'política de',
-            'mi cuenta', 'iniciar sesión', 'comparar producto',
-            'stock disponible', 'descuento del', 'gastos de envío'
-        ]
-        
-        pattern_count = sum(1 for pattern in ecommerce_patterns if pattern in text_lower)
-        
-        # Si más del 30% del texto son palabras de e-commerce, lo descartamos
-        words = text_lower.split()
-        ecommerce_word_count = sum(1 for word in words if word in self.stop_words)
-        ecommerce_ratio = ecommerce_word_count / len(words) if words else 0
-        
-        return pattern_count > 2 or ecommerce_ratio > 0.3
+    Los ficheros solo se generan al pulsar el botón: se escriben por bloques en
+    disco (sin DataFrame ni CSV completo en memoria) y se sirven desde ahí.
+    """
+    st.header("💾 Exportar Resultados")
     
-    def _extract_features(self, soup):
-        """Extrae características y features del producto"""
-        features = []
-        
-        # Buscar listas de características
-        feature_selectors = [
-            '[class*="feature"] li',
-            '[class*="benefit"] li',
-            '[class*="highlight"] li',
-            '[class*="spec"] li',
-            'ul[class*="feature"] li',
-            '.features li',
-            '.benefits li',
-            'div[class*="feature"]'
-        ]
-        
-        for selector in feature_selectors:
-            elements = soup.select(selector)
-            for element in elements:
-                text = element.get_text().strip()
-                if (text and 
-                    len(text) > 10 and 
-                    len(text) < 500 and 
-                    not re.match(r'^\d+$', text) and
-                    not text.lower().startswith(('http', 'www', 'mailto'))):
-                    features.append(text)
-        
-        # Eliminar duplicados manteniendo orden
-        seen = set()
-        unique_features = []
-        for feature in features:
-            if feature.lower() not in seen:
-                seen.add(feature.lower())
-                unique_features.append(feature)
-        
-        return unique_features[:50]
+    col1, col2 = st.columns(2)
     
-    def _extract_specifications(self, soup):
-        """Extrae especificaciones técnicas"""
-        specs = {}
-        
-        # Buscar tablas de especificaciones
-        spec_selectors = [
-            'table[class*="spec"]',
-            'table[class*="detail"]',
-            'table[class*="tech"]',
-            'dl[class*="spec"]',
-            'table'
-        ]
-        
-        for selector in spec_selectors:
-            elements = soup.select(selector)
-            for element in elements:
-                if element.name == 'table':
-                    rows = element.find_all('tr')
-                    for row in rows:
-                        cells = row.find_all(['td', 'th'])
-                        if len(cells) >= 2:
-                            key = cells[0].get_text().strip()
-                            value = cells[1].get_text().strip()
-                            if key and value and len(key) < 100 and len(value) < 200:
-                                specs[key] = value
-                elif element.name == 'dl':
-                    dts = element.find_all('dt')
-                    dds = element.find_all('dd')
-                    for dt, dd in zip(dts, dds):
-                        key = dt.get_text().strip()
-                        value = dd.get_text().strip()
-                        if key and value:
-                            specs[key] = value
-        
-        return specs
-    
-    def _extract_price(self, soup):
-        """Extrae información de precio"""
-        price_selectors = [
-            '[class*="price"]',
-            '[class*="cost"]',
-            '[class*="amount"]',
-            '[data-testid*="price"]',
-            '[id*="price"]',
-            'span[itemprop="price"]',
-            'meta[itemprop="price"]'
-        ]
-        
-        for selector in price_selectors:
-            elements = soup.select(selector)
-            for element in elements:
-                if element.name == 'meta':
-                    price = element.get('content', '')
-                    if price:
-                        return price
-                else:
-                    text = element.get_text().strip()
-                    # Buscar patrones de precio
-                    price_patterns = [
-                        r'[€$£¥]\s*[\d,]+\.?\d*',
-                        r'[\d,]+\.?\d*\s*[€$£¥]',
-                        r'[\d,]+\.?\d*\s*EUR?'
-                    ]
-                    
-                    for pattern in price_patterns:
-                        price_match = re.search(pattern, text, re.IGNORECASE)
-                        if price_match:
-                            return price_match.group().strip()
-        
-        return ""
+    with col1:
+        fmt = st.selectbox(
+            "Formato",
+            available_formats(),
+            format_func=EXPORT_LABELS.get,
+            key=f"export_format_{run.run_id}"
+        )
+        memo_key = f"export_{fmt}"
+        
+        if st.button("⚙️ Generar exportación", key=f"export_build_{run.run_id}", use_container_width=True):
+            with st.spinner("Generando exportación..."):
+                run.memo(memo_key, lambda: export_run(run, fmt))
+        
+        path = run.memoized(memo_key)
+        if path and os.path.exists(path):
+            with open(path, 'rb') as f:
+                st.download_button(
+                    label=f"📥 Descargar Análisis Completo ({EXPORT_LABELS[fmt]})",
+                    data=f,
+                    file_name=os.path.basename(path),
+                    mime=EXPORT_FORMATS[fmt],
+                    use_container_width=True
+                )
     
-    def _extract_filters(self, soup):
-        """Extrae filtros disponibles en la página"""
-        filters = []
-        
-        filter_selectors = [
-            '[class*="filter"] a',
-            '[class*="facet"] a',
-            'select option',
-            '[type="checkbox"] + label',
-            '[class*="refinement"]'
-        ]
-        
-        for selector in filter_selectors:
-            elements = soup.select(selector)
-            for element in elements:
-                text = element.get_text().strip()
-                if (text and 
-                    len(text) > 2 and 
-                    len(text) < 80 and
-                    not text.lower().startswith(('http', 'www')) and
-                    not re.match(r'^\d+$', text)):
-                    filters.append(text)
-        
-        return list(set(filters))[:100]
+    with col2:
+        # Exportar solo gaps si existe
+        if run.reference_data and run.competitor_data:
+            st.markdown("**Informe de GAPS**")
+            if st.button("⚙️ Generar informe de GAPS", key=f"gaps_build_{run.run_id}", use_container_width=True):
+                run.memo('gaps_report', lambda: format_gaps_report(run_gaps(run)))
+            
+            gaps_text = run.memoized('gaps_report')
+            if gaps_text:
+                st.download_button(
+                    label="📥 Descargar Análisis de GAPS (TXT)",
+                    data=gaps_text,
+                    file_name=f"gaps_{run.run_id}.txt",
+                    mime="text/plain",
+                    use_container_width=True
+                )
+
+def export_run(run, fmt):
+    """Escribe el run en disco con el formato indicado y devuelve la ruta"""
+    path = os.path.join(EXPORTS_DIR, f"analisis_competitivo_{run.run_id}.{fmt}")
+    export_products(run.products(), path, fmt)
+    return path
+
+# Hasta cuántos productos se dibujan uno a uno en la matriz y en un solo radar
+MATRIX_MAX_PRODUCTS = 30
+RADAR_MAX_PRODUCTS = 5
+
+@st.fragment
+def render_comparison_tab(run):
+    """
+    Pestaña Comparación
     
-    def _extract_categories(self, soup):
-        """Extrae categorías del producto"""
-        categories = []
-        
-        category_selectors = [
-            '[class*="breadcrumb"] a',
-            '[class*="category"] a',
-            '.breadcrumb a',
-            'nav[aria-label*="breadcrumb"] a'
-        ]
-        
-        for selector in category_selectors:
-            elements = soup.select(selector)
-            for element in elements:
-                text = element.get_text().strip()
-                if (text and 
-                    text.lower() not in ['home', 'inicio', 'tienda'] and
-                    len(text) > 2 and 
-                    len(text) < 50):
-                    categories.append(text)
-        
-        return categories
+    Con muchos productos, la matriz se agrega por dominio o rango de precio, el
+    precio frente a completitud usa WebGL y los radares muestran solo el top-K
+    en pequeños múltiplos. Métricas y figuras se memoizan en el run.
+    """
+    metrics = run.memo('comparison_metrics', lambda: product_metrics(run.all_data))
     
-    def _extract_images(self, soup):
-        """Extrae URLs de imágenes del producto"""
-        images = []
-        
-        image_selectors = [
-            'img[class*="product"]',
-            'img[data-testid*="product"]',
-            '[class*="gallery"] img',
-            '[class*="image"] img',
-            'picture img'
-        ]
-        
-        for selector in image_selectors:
-            elements = soup.select(selector)
-            for element in elements:
-                src = element.get('src') or element.get('data-src')
-                if src and not any(x in src.lower() for x in ['placeholder', 'loading', 'spinner']):
-                    images.append(src)
-        
-        return list(set(images))[:10]
+    # Crear comparación visual
+    st.subheader("🔍 Matriz de Comparación")
     
-    def analyze_terms(self, all_data):
-        """Analiza los términos más frecuentes enfocándose en características de producto"""
-        all_text = ""
-        
-        for data in all_data:
-            # Priorizar título y características
-            title_text = data.get('title', '')
-            features_text = " ".join(data.get('features', []))
-            specs_keys = " ".join(data.get('specifications', {}).keys())
-            specs_values = " ".join(data.get('specifications', {}).values())
-            
-            # Dar más peso a características técnicas
-            all_text += f" {title_text} {features_text} {features_text} {specs_keys} {specs_values} "
-            
-            # Agregar descripción filtrada
-            description = data.get('description', '')
-            if description:
-                sentences = description.split('.')
-                for sentence in sentences:
-                    if self._is_product_relevant_sentence(sentence):
-                        all_text += sentence + " "
-        
-        # Limpiar y tokenizar texto
-        words = re.findall(r'\b[a-záéíóúñüA-ZÁÉÍÓÚÑÜ]{3,}\b', all_text.lower())
-        
-        # Filtrar palabras relevantes
-        filtered_words = []
-        for word in words:
-            if (word not in self.stop_words and 
-                len(word) >= 3 and 
-                not word.isdigit() and
-                self._is_product_term(word)):
-                filtered_words.append(word)
-        
-        return Counter(filtered_words)
+    if len(metrics) <= MATRIX_MAX_PRODUCTS:
+        fig = run.memo('comparison_heatmap', lambda: build_comparison_heatmap(metrics.set_index('Título')[MATRIX_ATTRIBUTES]))
+        st.plotly_chart(fig, use_container_width=True)
+    else:
+        group_by = st.radio(
+            "Agrupar por",
+            ['Dominio', 'Rango de precio'],
+            horizontal=True,
+            key=f"comparison_group_{run.run_id}"
+        )
+        grouped = run.memo(f'comparison_grouped_{group_by}', lambda: aggregate(metrics, by=group_by))
+        st.caption(f"{len(metrics)} productos agregados en {len(grouped)} grupos (media por grupo)")
+        fig = run.memo(
+            f'comparison_heatmap_{group_by}',
+            lambda: build_comparison_heatmap(grouped[MATRIX_ATTRIBUTES], x_label=group_by)
+        )
+        st.plotly_chart(fig, use_container_width=True)
+        st.dataframe(grouped, use_container_width=True)
     
-    def _is_product_relevant_sentence(self, sentence):
-        """Determina si una oración es relevante para el producto"""
-        sentence_lower = sentence.lower().strip()
-        
-        # Frases que indican características técnicas
-        positive_indicators = [
-            'características', 'especificaciones', 'incluye', 'cuenta con',
-            'tecnología', 'material', 'diseño', 'tamaño', 'dimensiones',
-            'memoria', 'procesador', 'pantalla', 'batería', 'compatible'
-        ]
-        
-        # Frases no relevantes
-        negative_indicators = [
-            'añadir', 'carrito', 'comprar', 'precio', 'envío',
-            'opinión', 'valoración', 'stock', 'oferta', 'cliente'
-        ]
-        
-        positive_score = sum(1 for indicator in positive_indicators if indicator in sentence_lower)
-        negative_score = sum(1 for indicator in negative_indicators if indicator in sentence_lower)
-        
-        return positive_score > negative_score and len(sentence.strip()) > 20
-    
-    def _is_product_term(self, word):
-        """Determina si una palabra es relevante para describir productos"""
-        irrelevant_terms = {
-            'página', 'sitio', 'web', 'usuario', 'cliente', 'cuenta',
-            'compra', 'pedido', 'pago', 'envío', 'precio', 'oferta',
-            'opinión', 'valoración', 'comentario', 'estrella'
-        }
-        
-        return word not in irrelevant_terms
+    # Precio frente a completitud (WebGL: fluido con cientos de puntos)
+    if metrics['Precio (€)'].notna().any():
+        fig = run.memo('comparison_scatter', lambda: build_price_completeness_scatter(metrics))
+        st.plotly_chart(fig, use_container_width=True)
     
-    def analyze_filters(self, all_data):
-        """Analiza los filtros más comunes"""
-        all_filters = []
-        
-        for data in all_data:
-            all_filters.extend(data.get('filters', []))
-        
-        return Counter(all_filters)
+    # Gráfico de radar para comparación
+    st.subheader("🎯 Comparación Radar")
+    if len(metrics) <= RADAR_MAX_PRODUCTS:
+        fig = run.memo('comparison_radar', lambda: build_radar_chart(metrics))
+    else:
+        k = st.slider("Top productos por completitud", 2, 12, 6, key=f"radar_k_{run.run_id}")
+        fig = run.memo(
+            f'comparison_radar_top_{k}',
+            lambda: build_radar_small_multiples(top_k(metrics, k, keep_first=bool(run.reference_data)))
+        )
+    st.plotly_chart(fig, use_container_width=True)
     
-    def analyze_features(self, all_data):
-        """Analiza las características más mencionadas"""
-        all_features = []
-        
-        for data in all_data:
-            all_features.extend(data.get('features', []))
-        
-        # Extraer palabras clave de las características
-        feature_words = []
-        for feature in all_features:
-            words = re.findall(r'\b[a-záéíóúñüA-ZÁÉÍÓÚÑÜ]{3,}\b', feature.lower())
-            words = [word for word in words if word not in self.stop_words]
-            feature_words.extend(words)
-        
-        return Counter(feature_words)
-    
-    def analyze_gaps(self, reference_data, comparison_data):
-        """Analiza gaps entre producto de referencia y competencia"""
-        gaps = {
-            'missing_features': [],
-            'missing_specs': [],
-            'missing_filters': [],
-            'unique_competitor_features': [],
-            'price_difference': None,
-            'category_differences': []
-        }
-        
-        if not reference_data or not comparison_data:
-            return gaps
-        
-        # Analizar características faltantes
-        ref_features = set([f.lower() for f in reference_data.get('features', [])])
-        
-        for comp_data in comparison_data:
-            comp_features = set([f.lower() for f in comp_data.get('features', [])])
-            
-            # Características que tiene la competencia pero no la referencia
-            unique_comp = comp_features - ref_features
-            gaps['unique_competitor_features'].extend(list(unique_comp))
-            
-            # Características que tiene la referencia pero no la competencia
-            missing = ref_features - comp_features
-            gaps['missing_features'].extend(list(missing))
-        
-        # Analizar especificaciones faltantes
-        ref_specs = set(reference_data.get('specifications', {}).keys())
-        
-        for comp_data in comparison_data:
-            comp_specs = set(comp_data.get('specifications', {}).keys())
-            missing_specs = ref_specs - comp_specs
-            gaps['missing_specs'].extend(list(missing_specs))
-        
-        # Analizar filtros
-        ref_filters = set(reference_data.get('filters', []))
-        all_comp_filters = set()
-        
-        for comp_data in comparison_data:
-            all_comp_filters.update(comp_data.get('filters', []))
-        
-        gaps['missing_filters'] = list(all_comp_filters - ref_filters)
+    # Insights automáticos
+    st.subheader("💡 Insights Automáticos")
+    
+    insights = []
+    
+    # Análisis de completitud
+    completeness_scores = metrics['Completitud'].tolist()
+    best_product_idx = completeness_scores.index(max(completeness_scores))
+    worst_product_idx = completeness_scores.index(min(completeness_scores))
+    
+    insights.append(f"📊 **Producto más completo**: Producto {best_product_idx + 1} ({completeness_scores[best_product_idx]:.1f}% completitud)")
+    insights.append(f"⚠️ **Producto menos completo**: Producto {worst_product_idx + 1} ({completeness_scores[worst_product_idx]:.1f}% completitud)")
+    
+    # Análisis de precios
+    prices = metrics['Precio (€)'].dropna()
+    if not prices.empty:
+        insights.append(f"💰 **Precio promedio**: {prices.mean():.2f}€")
+        insights.append(f"💵 **Rango de precios**: {prices.min():.2f}€ - {prices.max():.2f}€")
+    
+    # Mostrar insights
+    for insight in insights:
+        st.info(insight)
+    
+    # Recomendaciones
+    st.subheader("🎯 Recomendaciones")
+    
+    recommendations = []
+    
+    if run.reference_data:
+        ref_data = run.reference_data
+        ref_score = completeness_scores[0]
+        # Solo se recomienda sobre lo extraído: un campo no analizado no está vacío
+        not_extracted = set(ref_data.get('not_extracted') or ())
+        to_complete = ", ".join(incomplete_fields(ref_data))
+        
+        if ref_score < 70:
+            recommendations.append(f"🔴 **Urgente**: Tu producto tiene poca información. Completa: {to_complete}.")
+        elif ref_score < 85:
+            recommendations.append(f"🟡 **Importante**: Tu producto está bien pero puede mejorar. Completa: {to_complete}.")
+        else:
+            recommendations.append("🟢 **Excelente**: Tu producto tiene información muy completa.")
         
-        # Analizar diferencias de precio
-        ref_price = self._extract_price_value(reference_data.get('price', ''))
-        if ref_price:
-            comp_prices = []
-            for comp_data in comparison_data:
-                comp_price = self._extract_price_value(comp_data.get('price', ''))
-                if comp_price:
-                    comp_prices.append(comp_price)
-            
-            if comp_prices:
-                avg_comp_price = sum(comp_prices) / len(comp_prices)
-                gaps['price_difference'] = {
-                    'reference': ref_price,
-                    'competitors_avg': avg_comp_price,
-                    'difference': ref_price - avg_comp_price,
-                    'percentage': ((ref_price - avg_comp_price) / avg_comp_price) * 100
-                }
+        if 'price' not in not_extracted and not ref_data.get('price'):
+            recommendations.append("💰 **Precio**: Considera mostrar el precio claramente en la página del producto.")
         
-        # Eliminar duplicados
-        gaps['missing_features'] = list(set(gaps['missing_features']))
-        gaps['missing_specs'] = list(set(gaps['missing_specs']))
-        gaps['unique_competitor_features'] = list(set(gaps['unique_competitor_features']))
+        if 'images' not in not_extracted and len(ref_data.get('images', [])) < 3:
+            recommendations.append("📸 **Imágenes**: Añade más imágenes del producto (mínimo 3-5).")
         
-        return gaps
+        if not_extracted:
+            recommendations.append("ℹ️ Los campos no analizados en este run no cuentan en la completitud ni en estas recomendaciones.")
     
-    def _extract_price_value(self, price_text):
-        """Extrae el valor numérico del precio"""
-        if not price_text:
-            return None
-        
-        # Buscar números en el texto del precio
-        price_match = re.search(r'[\d,]+\.?\d*', price_text.replace(',', ''))
-        if price_match:
-            try:
-                return float(price_match.group())
-            except:
-                return None
-        return None
+    if not recommendations:
+        recommendations.append("💡 Añade una URL de referencia para obtener recomendaciones personalizadas.")
+    
+    for rec in recommendations:
+        st.markdown(rec)
+
+def build_comparison_heatmap(matrix, x_label="Productos"):
+    """Mapa de calor de completitud (filas del DataFrame = columnas del mapa)"""
+    fig = px.imshow(
+        matrix.T,
+        labels=dict(x=x_label, y="Atributos", color="Valor"),
+        aspect="auto",
+        color_continuous_scale="RdYlGn",
+        title="Mapa de Calor - Completitud de Información"
+    )
+    # Las celdas de campos no extraídos quedan en blanco con N/A
+    if matrix.isna().to_numpy().any():
+        fig.update_traces(text=matrix.T.isna().replace({True: 'N/A', False: ''}).to_numpy(), texttemplate="%{text}")
+    # Ajustar el ángulo de las etiquetas del eje x
+    fig.update_xaxes(tickangle=45)
+    return fig
+
+def build_price_completeness_scatter(metrics):
+    """Precio frente a completitud, un punto por producto (Scattergl)"""
+    priced = metrics.dropna(subset=['Precio (€)'])
+    fig = go.Figure()
+    for domain, group in priced.groupby('Dominio'):
+        fig.add_trace(go.Scattergl(
+            x=group['Precio (€)'],
+            y=group['Completitud'],
+            mode='markers',
+            name=domain,
+            text=group['Título'],
+            hovertemplate="%{text}<br>%{x:.2f}€ · %{y:.0f}%<extra></extra>"
+        ))
+    fig.update_layout(
+        title="Precio vs. completitud de la ficha",
+        xaxis_title="Precio (€)",
+        yaxis_title="Completitud (%)",
+        showlegend=priced['Dominio'].nunique() <= 20
+    )
+    return fig
+
+def build_radar_chart(metrics):
+    """Un radar con todos los productos (pocos productos)"""
+    fig = go.Figure()
+    
+    for _, row in metrics.iterrows():
+        fig.add_trace(go.Scatterpolar(
+            r=[row[attribute] for attribute in RADAR_ATTRIBUTES],
+            theta=RADAR_ATTRIBUTES,
+            fill='toself',
+            name=row['Producto']
+        ))
+    
+    fig.update_layout(
+        polar=dict(
+            radialaxis=dict(
+                visible=True,
+                range=[0, max(1, metrics[RADAR_ATTRIBUTES].max().max())]
+            )
+        ),
+        showlegend=True,
+        title="Comparación de Completitud por Producto"
+    )
+    return fig
+
+def build_radar_small_multiples(metrics, cols=3):
+    """Un radar pequeño por producto, con la misma escala en todos"""
+    rows = -(-len(metrics) // cols)
+    fig = make_subplots(
+        rows=rows,
+        cols=cols,
+        specs=[[{'type': 'polar'}] * cols for _ in range(rows)],
+        subplot_titles=[f"{row['Producto']}: {row['Título'][:25]}" for _, row in metrics.iterrows()]
+    )
+    radial_max = max(1, metrics[RADAR_ATTRIBUTES].max().max())
+    
+    for i, (_, row) in enumerate(metrics.iterrows()):
+        fig.add_trace(
+            go.Scatterpolar(
+                r=[row[attribute] for attribute in RADAR_ATTRIBUTES],
+                theta=RADAR_ATTRIBUTES,
+                fill='toself',
+                name=row['Producto'],
+                showlegend=False
+            ),
+            row=i // cols + 1,
+            col=i % cols + 1
+        )
+    
+    fig.update_polars(radialaxis=dict(visible=True, range=[0, radial_max]))
+    fig.update_annotations(font_size=11)
+    fig.update_layout(height=320 * rows, title="Top productos por completitud")
+    return fig
+
+@st.cache_resource
+def get_text_analyzer():
+    """Analizador sin configuración de red, para los análisis de texto de los runs guardados"""
+    return ProductBenchmarkAnalyzer()
+
+@st.cache_resource
+def get_snapshot_store():
+    """Almacén de snapshots compartido por todas las sesiones"""
+    return SnapshotStore(os.path.join(RUNS_DIR, 'snapshots.db'))
+
+# Journals que se leen para ofrecer reanudar (los más recientes)
+RESUMABLE_RUNS_SCANNED = 50
+
+@st.cache_data(ttl=60, show_spinner=False)
+def get_incomplete_runs():
+    """Runs recientes sin terminar; se refresca al acabar un run o cada minuto"""
+    return list_runs(RUNS_DIR, only_incomplete=True, limit=RESUMABLE_RUNS_SCANNED)
+
+class StreamlitEventSink(EventSink):
+    """Muestra los avisos del motor en la interfaz de Streamlit"""
+    
+    def warning(self, message):
+        st.warning(message)
+    
+    def info(self, message):
+        st.info(message)
+
+@st.cache_resource
+def get_extraction_cache():
+    """Extracciones de URLs compartidas entre sesiones (con deduplicación en vuelo)"""
+    return ExtractionCache()
+
+@st.cache_resource
+def get_render_service():
+    """Renderizado de imágenes en segundo plano, con caché compartida entre sesiones"""
+    return ImageRenderService()
+
+@st.cache_resource
+def get_shopping_cache():
+    """Caché de Google Shopping compartida entre sesiones y reruns"""
+    return QueryResultCache()
+
+@st.cache_resource
+def get_scrape_metrics():
+    """Métricas de scraping del proceso (todas las sesiones); con `PDP_METRICS_PORT` se sirven en /metrics"""
+    metrics = ScrapeMetrics()
+    port = os.environ.get('PDP_METRICS_PORT')
+    if port:
+        metrics.serve(int(port), os.environ.get('PDP_METRICS_HOST', '127.0.0.1'))
+    return metrics
 
 
 if __name__ == "__main__":